@@ -1,18 +1,26 @@
 import tkinter as tk
 from tkinter import messagebox
 import time
-import board
-import adafruit_dht
-import RPi.GPIO as GPIO
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'production', 'src'))
+import hardware
+
+# Backend de hardware: TEIKIT_HW=sim para ejecutar sin Raspberry Pi
+hw = hardware.get_backend()
+GPIO = hw.GPIO
 
 # Configuración de los pines
-DHT_SENSOR_PIN = board.D5  # Pin para el sensor DHT22
-device_file = '/sys/bus/w1/devices/28-3de10457e49d/w1_slave'  # Ruta del sensor DS18B20
+DHT_SENSOR_PIN = 'D5'  # Pin para el sensor DHT22
+PAD_SERIAL = '28-3de10457e49d'  # Sensor DS18B20
+if hw.name == 'sim':
+    hw.w1.add_device(PAD_SERIAL)  # El bus simulado arranca vacío
+device_file = hw.w1_slave_path(PAD_SERIAL)
 
 RELAY_PIN = 18  # Pin GPIO que controla el relé
 
 # Configuración del sensor DHT22
-dht_sensor = adafruit_dht.DHT22(DHT_SENSOR_PIN)
+dht_sensor = hw.dht22(DHT_SENSOR_PIN)
 
 # Configuración de GPIO
 GPIO.setmode(GPIO.BCM)
@@ -29,13 +37,12 @@ def read_humidity_and_temp():
 
 def read_pad_temperature():
     try:
-        with open(device_file, 'r') as f:
-            lines = f.readlines()
-            temp_output = lines[1].find('t=')
-            if temp_output != -1:
-                temp_string = lines[1].strip()[temp_output + 2:]
-                temp_celsius = float(temp_string) / 1000.0
-                return temp_celsius
+        lines = hw.read_w1(device_file)
+        temp_output = lines[1].find('t=')
+        if temp_output != -1:
+            temp_string = lines[1].strip()[temp_output + 2:]
+            temp_celsius = float(temp_string) / 1000.0
+            return temp_celsius
     except Exception as e:
         print(f"Error reading pad temperature: {e}")
         return None
@@ -1,39 +1,45 @@
 import time
 import os
-import glob
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'production', 'src'))
+import hardware
+from ds18b20 import DS18B20
+from w1devices import discover
 
-# Configuración de los archivos del sensor DS18B20
-os.system('modprobe w1-gpio')
-os.system('modprobe w1-therm')
+# Backend de hardware: TEIKIT_HW=sim para ejecutar sin Raspberry Pi
+hw = hardware.get_backend()
 
-# Ruta al archivo del sensor DS18B20
-base_dir = '/sys/bus/w1/devices/'
-device_folder = glob.glob(base_dir + '28*')[0]
-device_file = device_folder + '/w1_slave'
+# Sonda DS18B20: la primera conectada. Los módulos w1 solo se cargan si el bus aún no existe
+serials = discover(hw)
+if not serials and hw.name == 'real' and not os.path.isdir(hw.w1_dir):
+    os.system('modprobe w1-gpio')
+    os.system('modprobe w1-therm')
+    serials = discover(hw)
+if serials:
+    serial = serials[0]
+elif hw.name == 'sim':
+    # El bus simulado arranca vacío: se conecta la sonda de siempre
+    serial = '28-3de10457e49d'
+    hw.w1.add_device(serial)
+else:
+    sys.exit(f"No hay ninguna sonda DS18B20 en {hw.w1_dir}")
 
-def read_temp_raw():
-    """Lee los datos crudos del sensor DS18B20"""
-    with open(device_file, 'r') as f:
-        lines = f.readlines()
-    return lines
+# Resolución de 9 a 12 bits: a 11 bits la conversión tarda ~375 ms en vez de ~750 ms
+probe = DS18B20(hw, serial, resolution=11)
+probe.configure()
 
 def read_temp():
-    """Lee la temperatura del sensor DS18B20"""
-    lines = read_temp_raw()
-    while lines[0].strip()[-3:] != 'YES':
-        time.sleep(0.2)
-        lines = read_temp_raw()
-    equals_pos = lines[1].find('t=')
-    if equals_pos != -1:
-        temp_string = lines[1][equals_pos + 2:]
-        temp_c = float(temp_string) / 1000.0
-        return temp_c
+    """Lee la temperatura del sensor DS18B20 (None si el CRC no es válido)"""
+    return probe.read()
 
 def main():
     print("Starting temperature readings. Press Ctrl+C to exit.")
     while True:
         temperature = read_temp()
-        print(f"Temperature: {temperature:.2f}°C")
+        if temperature is None:
+            print(f"Lectura inválida (errores de CRC: {probe.crc_errors})")
+        else:
+            print(f"Temperature: {temperature:.2f}°C")
         time.sleep(2)  # Esperar 2 segundos antes de la siguiente lectura
 
 if __name__ == "__main__":
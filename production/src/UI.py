@@ -1,188 +1,321 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-import RPi.GPIO as GPIO
-import board
-import adafruit_dht
-from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.style as mplstyle
+import math
 import os
+import queue
 import time
-start_time = time.time()
 
-# Configuración de estilo de matplotlib
-mplstyle.use('seaborn-v0_8-dark-palette')
-plt.rcParams.update({'axes.facecolor': 'white', 'figure.facecolor': 'white', 'axes.edgecolor': 'gray'})
+from controller import LockerController
+from metrics import STAGE_SECONDS, LoopTimer
+from render import RenderScheduler
 
-# Pines y sensores
-DHT_SENSOR_PIN = board.D5
-DS18B20_DEVICE_FILE = '/sys/bus/w1/devices/28-3de10457e49d/w1_slave'
-FAN_PIN, LOCK_PIN, HEATING_PAD_PIN = 22, 17, 27
+# Intervalo (ms) de drenado de la cola del muestreador en Tk
+DRAIN_INTERVAL_MS = 250
+# Dibujo del gráfico: fotogramas por segundo como máximo y segundos sin tocar la pantalla para dejar de dibujar
+RENDER_MAX_FPS = 2
+DISPLAY_IDLE_S = 300
+# Vistas del gráfico: (etiqueta, segundos, segundos por unidad del eje x, unidad); la primera es la inicial
+CHART_VIEWS = (("50 s", 50, 1, "s"), ("1 h", 3600, 60, "min"), ("24 h", 86400, 3600, "h"), ("7 d", 7 * 86400, 3600, "h"))
 
-dht_sensor = adafruit_dht.DHT22(DHT_SENSOR_PIN)
-GPIO.setmode(GPIO.BCM)
-GPIO.setup([FAN_PIN, LOCK_PIN, HEATING_PAD_PIN], GPIO.OUT)
-GPIO.output(FAN_PIN, GPIO.HIGH)
-GPIO.output(LOCK_PIN, GPIO.LOW)
-GPIO.output(HEATING_PAD_PIN, GPIO.HIGH)
+# Segundos que la cerradura queda abierta con el botón "Abrir"
+LOCK_OPEN_SECONDS = 5
 
-# Datos
-time_data, humidity_data, temperature_data, pad_temperature_data = [], [], [], []
+# Texto de cada estado de actuador
+ACTUATOR_TEXT = {
+    ('fan', 'on'): "🌀 Ventilador: [ENCENDIDO]", ('fan', 'off'): "🌀 Ventilador: [APAGADO]",
+    ('lock', 'open'): "🔓 Cerradura: [ABIERTA]", ('lock', 'closed'): "🔒 Cerradura: [CERRADA]",
+    ('pad', 'on'): "🔥 Almohadilla: [ENCENDIDA]", ('pad', 'off'): "❄️ Almohadilla: [APAGADA]",
+}
 
-# Funciones sensores y actuadores
-def read_dht():
-    try:
-        return dht_sensor.humidity, dht_sensor.temperature
-    except RuntimeError:
-        return None, None
+# Banner: se escala una vez con PIL y se guarda en caché como PNG que Tk carga directamente
+BANNER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets', 'teikit_banner.png')
+BANNER_SIZE = (400, 100)
+CACHE_DIR = os.environ.get('TEIKIT_CACHE_DIR', os.path.expanduser('~/.cache/teikit'))
 
-def read_pad_temp():
-    try:
-        with open(DS18B20_DEVICE_FILE, 'r') as f:
-            lines = f.readlines()
-            temp_pos = lines[1].find('t=')
-            if temp_pos != -1:
-                return float(lines[1][temp_pos + 2:]) / 1000.0
-    except: return None
-
-def set_state(pin, state):
-    GPIO.output(pin, state)
-    update_actuator_states()
-
-def update_actuator_states():
-    fan_state = GPIO.input(FAN_PIN)
-    fan_label.config(text=f"🌀 Ventilador: [ENCENDIDO]" if fan_state == GPIO.LOW else "🌀 Ventilador: [APAGADO]")
-
-    lock_state = GPIO.input(LOCK_PIN)
-    lock_label.config(text=f"🔓 Cerradura: [ABIERTA]" if lock_state == GPIO.HIGH else "🔒 Cerradura: [CERRADA]")
-
-    pad_state = GPIO.input(HEATING_PAD_PIN)
-    pad_label.config(text=f"🔥 Almohadilla: [ENCENDIDA]" if pad_state == GPIO.LOW else "❄️ Almohadilla: [APAGADA]")
-
-def update_readings():
-    h, t = read_dht()
-    pad_t = read_pad_temp()
-    if h and t and pad_t:
-        humidity_data.append(h)
-        temperature_data.append(t)
-        pad_temperature_data.append(pad_t)
-        time_data.append(round(time.time() - start_time, 1))
-        if len(time_data) > 50:
-            for lst in [time_data, humidity_data, temperature_data, pad_temperature_data]:
-                lst.pop(0)
-        hum_label.config(text=f"[{h:.1f}%] Humedad")
-        amb_label.config(text=f"[{t:.1f}°C] Ambiente")
-        padtemp_label.config(text=f"[{pad_t:.1f}°C] Almohadilla")
-    update_actuator_states()
-    update_graphs()
-    root.after(2000, update_readings)
-
-# Gráficos y UI
-def update_graphs():
-    ax.clear()
-    ax.set_facecolor('#f0f0f0')
-
-    # Mostrar solo los datos de los últimos 50 segundos
-    if time_data:
-        latest_time = time_data[-1]
-        time_window = 50
-        filtered_data = [(t, h, a, p) for t, h, a, p in zip(time_data, humidity_data, temperature_data, pad_temperature_data) if latest_time - t <= time_window]
-
-        # Separar los datos filtrados
-        times, humidities, ambients, pads = zip(*filtered_data)
-
-        ax.plot(times, humidities, label="Humedad (%)", color="dodgerblue", linewidth=2)
-        ax.plot(times, ambients, label="Ambiente (°C)", color="tomato", linewidth=2)
-        ax.plot(times, pads, label="Pad (°C)", color="forestgreen", linewidth=2)
-
-    ax.set_title("Temperatura y Humedad", fontsize=14, color='black')
-    ax.set_xlabel("Tiempo (s)", fontsize=12)
-    ax.set_ylabel("Valores", fontsize=12)
-    ax.legend(loc="upper left", fontsize=10)
-    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
-    ax.tick_params(axis='both', which='major', labelsize=10)
-    canvas.draw()
-
-
-def toggle_fullscreen(event=None):
-    global fullscreen
-    fullscreen = not fullscreen
+
+def banner_path():
+    """Ruta del banner ya escalado; solo se regenera si el original es más nuevo que la caché."""
+    cached = os.path.join(CACHE_DIR, 'teikit_banner_%dx%d.png' % BANNER_SIZE)
+    if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(BANNER_FILE):
+        from PIL import Image
+        img = Image.open(BANNER_FILE)
+        img.thumbnail(BANNER_SIZE, Image.LANCZOS)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        img.save(cached + '.tmp', 'PNG')
+        os.replace(cached + '.tmp', cached)
+    return cached
+
+
+class Readout:
+    """Textos de los mosaicos (lecturas, relés, avisos, pronóstico) a partir del controlador, sin Tk.
+
+    Es el drenado de cada DRAIN_INTERVAL_MS de UI.run, también el que mide bench_loop.py.
+    `show(unit_id, clave, texto)` pinta un texto (config() de su etiqueta en Tk) y solo se
+    llama cuando cambia; las claves son 'hum', 'amb', 'padtemp', 'forecast', 'fault' y los relés.
+    """
+
+    def __init__(self, controller, show):
+        self.controller = controller
+        self.show = show
+        self.texts = {unit.id: {} for unit in controller.units}
+        # Transiciones de relés desde cualquier hilo (UI, API, control); se aplican en drain()
+        self.actuator_events = queue.SimpleQueue()
+        for unit in controller.units:
+            unit.actuators.subscribe(self.actuator_events.put)
+
+    def _set(self, unit_id, key, text):
+        if self.texts[unit_id].get(key) != text:
+            self.texts[unit_id][key] = text
+            self.show(unit_id, key, text)
+
+    def refresh(self):
+        """Relés y avisos actuales de todos los casilleros (al abrir la interfaz)."""
+        for unit in self.controller.units:
+            for name, state in unit.actuators.states().items():
+                self._set(unit.id, name, ACTUATOR_TEXT[name, state])
+            self.update_fault(unit)
+
+    def drain(self):
+        """Aplica las muestras y transiciones nuevas; devuelve los casilleros con muestras nuevas."""
+        # Solo drena la cola del muestreador: nunca espera a los sensores
+        samples = self.controller.poll()
+        updated = set()
+        for sample in samples:
+            h, t, pad_t = sample.humidity, sample.temperature, sample.pad_temperature
+            # Cada canal se actualiza por separado: un sensor fallando no borra a los demás
+            if h is not None:
+                self._set(sample.unit, 'hum', f"[{h:.1f}%] Humedad")
+            if t is not None:
+                self._set(sample.unit, 'amb', f"[{t:.1f}°C] Ambiente")
+            if pad_t is not None:
+                self._set(sample.unit, 'padtemp', f"[{pad_t:.1f}°C] Almohadilla")
+            updated.add(sample.unit)
+        self.update_actuator_states()
+        for unit_id in updated:
+            self.update_fault(self.controller.unit(unit_id))
+            self.update_forecast(self.controller.unit(unit_id))
+        return updated
+
+    def update_actuator_states(self):
+        while True:
+            try:
+                event = self.actuator_events.get_nowait()
+            except queue.Empty:
+                return
+            self._set(event.unit, event.name, ACTUATOR_TEXT[event.name, event.state])
+
+    def update_fault(self, unit):
+        faults = ([unit.thermostat.fault] if unit.thermostat.fault else []) + [f"alarma {name}" for name in unit.alarms]
+        self._set(unit.id, 'fault', "\n".join(f"⚠️ {fault}" for fault in faults))
+
+    def update_forecast(self, unit):
+        # Pronóstico del modelo térmico (thermal.py); vacío hasta que el modelo es fiable
+        forecast = unit.forecast()
+        self._set(unit.id, 'forecast', "" if forecast is None else (
+            f"⏩ {forecast['seconds'] / 60:.0f} min: pad {forecast['pad_temperature']:.1f}°C, "
+            f"ambiente {forecast['temperature']:.1f}°C"))
+
+
+def run(controller, on_ready=None):
+    """Interfaz Tk del casillero. Las librerías gráficas se importan aquí, no al arrancar el control."""
+    import tkinter as tk
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    import matplotlib.style as mplstyle
+    from chart import LiveChart
+
+    # Configuración de estilo de matplotlib
+    mplstyle.use('seaborn-v0_8-dark-palette')
+    plt.rcParams.update({'axes.facecolor': 'white', 'figure.facecolor': 'white', 'axes.edgecolor': 'gray'})
+
+    # Funciones actuadores: las etiquetas solo cambian con las transiciones que publica cada ActuatorBank
+    def command(unit, name, state, seconds=None):
+        # Encola y vuelve: la etiqueta cambia cuando la cola aplica la orden (evento del relé)
+        unit.command(name, state, 'ui', seconds=seconds)
+        readout.update_actuator_states()
+
+    def set_auto(unit, variable):
+        unit.thermostat.auto = variable.get()
+
+    def update_readings():
+        ui_period.tick()
+        with STAGE_SECONDS.time('ui_drain'):
+            drain()
+        root.after(DRAIN_INTERVAL_MS, update_readings)
+
+    def drain():
+        # Textos en Readout (compartido con bench_loop.py); aquí solo el redibujado del seleccionado
+        if selected.id in readout.drain():
+            renderer.invalidate()
+
+    # Gráficos y UI
+    def update_graphs():
+        # Ventana del casillero seleccionado (crudo o agregados) reducida con LTTB al ancho del gráfico
+        if len(selected.history):
+            with STAGE_SECONDS.time('ui_render'):
+                chart.update_series(selected.series(view[1], chart.width_px))
+
+    def select_view(new_view):
+        nonlocal view
+        view = new_view
+        chart.set_window(*view[1:])
+        renderer.invalidate()
+
+    def select_unit(unit):
+        nonlocal selected
+        selected = unit
+        chart.set_title(f"Temperatura y Humedad - {unit.id}")
+        renderer.invalidate()
+
+    # Actividad y visibilidad: sin nadie mirando el gráfico no se redibuja (el muestreo sigue igual)
+    def idle_seconds():
+        # `tk inactive` mide la inactividad de todo el display (extensión XScreenSaver);
+        # sin ella (-1) se usa la última entrada recibida por esta ventana
+        ms = int(root.tk.call('tk', 'inactive'))
+        return ms / 1000 if ms >= 0 else time.monotonic() - last_input
+
+    def note_input(event=None):
+        nonlocal last_input
+        last_input = time.monotonic()
+        renderer.wake()
+
+    def set_visible(event, visible):
+        if event.widget is root:
+            renderer.set_visible(visible)
+
+    def toggle_fullscreen(event=None):
+        nonlocal fullscreen
+        fullscreen = not fullscreen
+        root.attributes('-fullscreen', fullscreen)
+        if fullscreen:
+            root.bind('<Escape>', toggle_fullscreen)
+        else:
+            root.bind('<F11>', toggle_fullscreen)
+
+    def build_tile(parent, unit):
+        """Mosaico de un casillero: lecturas, estado de actuadores y botones."""
+        tile = {}
+        frame = tk.Frame(parent, bg="#f54c09", highlightthickness=1 if compact else 0, highlightbackground="white")
+
+        # Condiciones actuales
+        title = tk.Label(frame, text=f"🌡️ {unit.id}" if compact else "🌡️ Condiciones Actuales", font=title_font, bg="#f54c09", fg="white")
+        title.pack(pady=(0, 10))
+        title.bind('<Button-1>', lambda event: select_unit(unit))
+        tile['hum'] = tk.Label(frame, text="[---%] Humedad", **label_style)
+        tile['hum'].pack()
+        tile['amb'] = tk.Label(frame, text="[---°C] Ambiente", **label_style)
+        tile['amb'].pack()
+        tile['padtemp'] = tk.Label(frame, text="[---°C] Almohadilla", **label_style)
+        tile['padtemp'].pack()
+        tile['forecast'] = tk.Label(frame, text="", **label_style)
+        tile['forecast'].pack()
+
+        # Separador visual
+        tk.Frame(frame, height=2, bd=1, relief=tk.SUNKEN, bg="white").pack(fill=tk.X, pady=15)
+
+        # Controles
+        if not compact:
+            tk.Label(frame, text="🔧 Controles", font=title_font, bg="#f54c09", fg="white").pack(pady=(10, 10))
+        states = unit.actuators.states()
+        for name, on_text, on_state, off_text, off_state in (
+                ('fan', "Encender", 'on', "Apagar", 'off'),
+                ('lock', "Abrir", 'open', "Cerrar", 'closed'),
+                ('pad', "Encender", 'on', "Apagar", 'off')):
+            tile[name] = tk.Label(frame, text=ACTUATOR_TEXT[name, states[name]], **label_style)
+            tile[name].pack(pady=(0 if name == 'fan' else 10, 0))
+            frame_btns = tk.Frame(frame, bg="#f54c09")
+            frame_btns.pack(pady=4)
+            # "Abrir" es un pulso: la cerradura vuelve a cerrarse sola pasados LOCK_OPEN_SECONDS
+            seconds = LOCK_OPEN_SECONDS if name == 'lock' else None
+            tk.Button(frame_btns, text=on_text, command=lambda name=name, state=on_state, seconds=seconds: command(unit, name, state, seconds), **btn_style_on).pack(side=tk.LEFT, padx=5)
+            tk.Button(frame_btns, text=off_text, command=lambda name=name, state=off_state: command(unit, name, state), **btn_style_off).pack(side=tk.LEFT, padx=5)
+
+        # Control automático (termostato) y aviso de corte de seguridad
+        auto = tk.BooleanVar(value=unit.thermostat.auto)
+        tk.Checkbutton(frame, text="Control automático", variable=auto, command=lambda: set_auto(unit, auto),
+                       selectcolor="#f54c09", activebackground="#f54c09", activeforeground="white", **label_style).pack(pady=(10, 0))
+        tile['fault'] = tk.Label(frame, text="", **label_style)
+        tile['fault'].pack()
+        tiles[unit.id] = tile
+        return frame
+
+    fullscreen = True
+    root = tk.Tk()
+    root.title("Casillero Inteligente - Teikit")
+    root.configure(bg='#f54c09')
     root.attributes('-fullscreen', fullscreen)
-    if fullscreen:
-        root.bind('<Escape>', toggle_fullscreen)
+    root.bind('<F11>', toggle_fullscreen)
+
+    # Logo
+    try:
+        logo = tk.PhotoImage(file=banner_path())
+        tk.Label(root, image=logo, bg="#f54c09").pack(pady=10)
+    except: pass
+
+    main_frame = tk.Frame(root, bg="#f54c09")
+    main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+    left = tk.Frame(main_frame, bg="#f54c09")
+    right = tk.Frame(main_frame, bg="#f54c09")
+    left.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    right.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+    # Con varios casilleros los mosaicos se compactan y se reparten en una cuadrícula
+    compact = len(controller.units) > 1
+    label_style = {"font": ("Arial", 12 if compact else 20), "bg": "#f54c09", "fg": "white"}
+    title_font = ("Arial", 14 if compact else 22, "bold")
+    btn_size = {"font": ("Arial", 10 if compact else 14), "width": 8 if compact else 10, "height": 1}
+    btn_style_on = {"bg": "#a5d6a7", "fg": "black", **btn_size}
+    btn_style_off = {"bg": "#ef9a9a", "fg": "black", **btn_size}
+
+    tiles = {}
+    ui_period = LoopTimer('ui')
+    selected = controller.units[0]
+    columns = math.ceil(math.sqrt(len(controller.units)))
+    for i, unit in enumerate(controller.units):
+        build_tile(left, unit).grid(row=i // columns, column=i % columns, padx=5, pady=5, sticky='n')
+
+    # Botón cerrar: la limpieza de GPIO la hace quien arrancó el controlador
+    root.protocol("WM_DELETE_WINDOW", root.quit)
+
+    # Gráfico
+    fig, ax = plt.subplots(figsize=(7, 4))
+    view = CHART_VIEWS[0]
+    frame_views = tk.Frame(right, bg="#f54c09")
+    frame_views.pack(pady=(0, 5))
+    for chart_view in CHART_VIEWS:
+        tk.Button(frame_views, text=chart_view[0], command=lambda v=chart_view: select_view(v), **btn_size).pack(side=tk.LEFT, padx=3)
+    canvas = FigureCanvasTkAgg(fig, master=right)
+    canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    chart = LiveChart(ax, canvas, window=view[1])
+    last_input = time.monotonic()
+    renderer = RenderScheduler(update_graphs, root.after, idle_seconds,
+                               max_fps=RENDER_MAX_FPS, idle_after=DISPLAY_IDLE_S)
+    for sequence in ('<Motion>', '<ButtonPress>', '<KeyPress>'):
+        root.bind_all(sequence, note_input, add='+')
+    root.bind('<Map>', lambda event: set_visible(event, True))
+    root.bind('<Unmap>', lambda event: set_visible(event, False))
+    if compact:
+        select_unit(selected)
+
+    readout = Readout(controller, lambda unit_id, key, text: tiles[unit_id][key].config(text=text))
+    readout.refresh()
+    renderer.invalidate()
+    renderer.start()
+    update_readings()
+    if on_ready:
+        root.after_idle(on_ready)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    import sys
+    if '--standalone' in sys.argv[1:]:
+        # Todo en un proceso, como antes: esta interfaz es dueña de GPIO y sensores
+        controller = LockerController()
+        controller.start()
     else:
-        root.bind('<F11>', toggle_fullscreen)
-
-fullscreen = True
-root = tk.Tk()
-root.title("Casillero Inteligente - Teikit")
-root.configure(bg='#f54c09')
-root.attributes('-fullscreen', fullscreen)
-root.bind('<F11>', toggle_fullscreen)
-
-# Logo
-try:
-    img = Image.open("../assets/teikit_banner.png")
-    img.thumbnail((400, 100), Image.LANCZOS)
-    logo = ImageTk.PhotoImage(img)
-    tk.Label(root, image=logo, bg="#f54c09").pack(pady=10)
-except: pass
-
-main_frame = tk.Frame(root, bg="#f54c09")
-main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-left = tk.Frame(main_frame, bg="#f54c09")
-right = tk.Frame(main_frame, bg="#f54c09")
-left.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-right.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-
-label_style = {"font": ("Arial", 20), "bg": "#f54c09", "fg": "white"}
-btn_style_on = {"font": ("Arial", 14), "bg": "#a5d6a7", "fg": "black", "width": 10, "height": 1}
-btn_style_off = {"font": ("Arial", 14), "bg": "#ef9a9a", "fg": "black", "width": 10, "height": 1}
-
-# Condiciones actuales
-tk.Label(left, text="🌡️ Condiciones Actuales", font=("Arial", 22, "bold"), bg="#f54c09", fg="white").pack(pady=(0, 10))
-hum_label = tk.Label(left, text="[---%] Humedad", **label_style)
-hum_label.pack()
-amb_label = tk.Label(left, text="[---°C] Ambiente", **label_style)
-amb_label.pack()
-padtemp_label = tk.Label(left, text="[---°C] Almohadilla", **label_style)
-padtemp_label.pack()
-
-# Separador visual
-tk.Frame(left, height=2, bd=1, relief=tk.SUNKEN, bg="white").pack(fill=tk.X, pady=15)
-
-# Controles
-tk.Label(left, text="🔧 Controles", font=("Arial", 22, "bold"), bg="#f54c09", fg="white").pack(pady=(10, 10))
-
-fan_label = tk.Label(left, text="🌀 Ventilador: [---]", **label_style)
-fan_label.pack()
-frame_fan_btns = tk.Frame(left, bg="#f54c09")
-frame_fan_btns.pack(pady=4)
-tk.Button(frame_fan_btns, text="Encender", command=lambda: set_state(FAN_PIN, GPIO.LOW), **btn_style_on).pack(side=tk.LEFT, padx=5)
-tk.Button(frame_fan_btns, text="Apagar", command=lambda: set_state(FAN_PIN, GPIO.HIGH), **btn_style_off).pack(side=tk.LEFT, padx=5)
-
-lock_label = tk.Label(left, text="🔒 Cerradura: [---]", **label_style)
-lock_label.pack(pady=(10, 0))
-frame_lock_btns = tk.Frame(left, bg="#f54c09")
-frame_lock_btns.pack(pady=4)
-tk.Button(frame_lock_btns, text="Abrir", command=lambda: set_state(LOCK_PIN, GPIO.HIGH), **btn_style_on).pack(side=tk.LEFT, padx=5)
-tk.Button(frame_lock_btns, text="Cerrar", command=lambda: set_state(LOCK_PIN, GPIO.LOW), **btn_style_off).pack(side=tk.LEFT, padx=5)
-
-pad_label = tk.Label(left, text="🔥 Almohadilla: [---]", **label_style)
-pad_label.pack(pady=(10, 0))
-frame_pad_btns = tk.Frame(left, bg="#f54c09")
-frame_pad_btns.pack(pady=4)
-tk.Button(frame_pad_btns, text="Encender", command=lambda: set_state(HEATING_PAD_PIN, GPIO.LOW), **btn_style_on).pack(side=tk.LEFT, padx=5)
-tk.Button(frame_pad_btns, text="Apagar", command=lambda: set_state(HEATING_PAD_PIN, GPIO.HIGH), **btn_style_off).pack(side=tk.LEFT, padx=5)
-
-# Botón cerrar
-root.protocol("WM_DELETE_WINDOW", lambda: (GPIO.cleanup(), root.quit()))
-
-# Gráfico
-fig, ax = plt.subplots(figsize=(7, 4))
-canvas = FigureCanvasTkAgg(fig, master=right)
-canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-
-update_readings()
-root.mainloop()
+        # Interfaz aparte del daemon (daemon.py): lee la memoria compartida y manda órdenes por la API
+        import remote
+        controller = remote.connect()
+    try:
+        run(controller)
+    finally:
+        controller.stop()
@@ -0,0 +1,105 @@
+import threading
+from collections import namedtuple
+
+import clock
+
+# Actuadores: nombre -> (atributo del pin en la configuración, nivel GPIO activo, estado activo, estado inactivo)
+ACTUATORS = {
+    'fan': ('fan_pin', 'LOW', 'on', 'off'),
+    'lock': ('lock_pin', 'HIGH', 'open', 'closed'),
+    'pad': ('pad_pin', 'LOW', 'on', 'off'),
+}
+# Origen de cada actuación; el índice se guarda en disco, así que solo se añaden al final
+SOURCES = ('init', 'ui', 'api', 'thermostat', 'reconcile', 'rule')
+
+# Transición de un relé; `state` es el nombre del estado ('on', 'open'...)
+ActuatorEvent = namedtuple('ActuatorEvent', ['timestamp', 'unit', 'name', 'pin', 'level', 'state', 'source'])
+
+
+class ActuatorBank:
+    """Estado autoritativo de los relés de un casillero.
+
+    Solo se escribe GPIO y se notifica a los suscriptores cuando el estado cambia de verdad.
+    `reconcile()` compara periódicamente con el hardware y reescribe los relés que no coinciden.
+    Los suscriptores se llaman desde el hilo que provoca el cambio (UI, API, control).
+    """
+
+    def __init__(self, gpio, unit_id, pins):
+        self.GPIO = gpio
+        self.unit_id = unit_id
+        self.pins = dict(pins)
+        self.faults = 0
+        # Instante monotónico de la última transición de cada relé
+        self.changed_at = {}
+        self._levels = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        gpio.setup(list(self.pins.values()), gpio.OUT)
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def _level(self, name, state):
+        _, active_level, active, inactive = ACTUATORS[name]
+        if state not in (active, inactive):
+            raise ValueError(f"invalid state {state!r} for {name} (expected {active!r} or {inactive!r})")
+        active_level = getattr(self.GPIO, active_level)
+        inactive_level = self.GPIO.HIGH if active_level == self.GPIO.LOW else self.GPIO.LOW
+        return active_level if state == active else inactive_level
+
+    def _state(self, name, level):
+        _, active_level, active, inactive = ACTUATORS[name]
+        return active if level == getattr(self.GPIO, active_level) else inactive
+
+    def validate(self, name, state):
+        """ValueError si el relé o el estado no existen; devuelve el nivel GPIO del estado."""
+        if name not in self.pins:
+            raise ValueError(f"unknown actuator {name!r} (expected {', '.join(self.pins)})")
+        return self._level(name, state)
+
+    def set(self, name, state, source):
+        """Lleva el relé `name` a `state`; devuelve True si hubo transición."""
+        level = self.validate(name, state)
+        if source not in SOURCES:
+            raise ValueError(f"unknown actuation source {source!r}")
+        with self._lock:
+            if self._levels.get(name) == level:
+                return False
+            self.GPIO.output(self.pins[name], level)
+            self._levels[name] = level
+            self.changed_at[name] = clock.monotonic()
+        self._emit(ActuatorEvent(clock.time(), self.unit_id, name, self.pins[name], level, state, source))
+        return True
+
+    def state(self, name):
+        return self._state(name, self._levels[name])
+
+    def is_active(self, name):
+        return self.state(name) == ACTUATORS[name][2]
+
+    def states(self):
+        return {name: self._state(name, level) for name, level in self._levels.items()}
+
+    def reconcile(self):
+        """Compara con los niveles reales de GPIO; reescribe y notifica cada discrepancia (fallo de relé)."""
+        mismatches = []
+        with self._lock:
+            for name, pin in self.pins.items():
+                try:
+                    actual = self.GPIO.input(pin)
+                except RuntimeError:
+                    actual = None
+                if actual != self._levels[name]:
+                    self.GPIO.setup(pin, self.GPIO.OUT)
+                    self.GPIO.output(pin, self._levels[name])
+                    mismatches.append(name)
+            self.faults += len(mismatches)
+        for name in mismatches:
+            level = self._levels[name]
+            self._emit(ActuatorEvent(clock.time(), self.unit_id, name, self.pins[name], level,
+                                     self._state(name, level), 'reconcile'))
+        return mismatches
+
+    def _emit(self, event):
+        for callback in list(self._subscribers):
+            callback(event)
@@ -0,0 +1,302 @@
+"""API JSON local del casillero (HTTP/1.1 sobre TCP o socket Unix, asyncio).
+
+    GET  /lockers                          estado de todos los casilleros
+    GET  /lockers/<id>                     estado de un casillero
+    GET  /lockers/<id>/history?seconds=N   ventana del histórico (crudo hasta 6 h, luego agregados por minuto/hora)
+    POST /lockers/<id>/<fan|lock|pad>      {"state": "on" | "off" | "open" | "closed", "source": "api" | "ui"}
+                                           + "seconds": N  pulso: vuelve al estado contrario a los N s
+                                           + "every": M    ciclo: repite el pulso cada M s hasta otra orden
+    POST /lockers/<id>/thermostat          {"auto": true | false}
+    GET  /export?from=&to=&format=csv|columnar&source=samples|minute|hour&step=N&lockers=a,b
+                                           tramo del histórico en disco, enviado por trozos (ver export.py)
+    GET  /metrics                          métricas en formato Prometheus (con TEIKIT_METRICS=on)
+
+Las lecturas se sirven de la última instantánea del controlador (bytes JSON ya
+codificados): ningún cliente provoca lecturas de sensores ni de GPIO.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import clock
+import metrics
+from actuators import ACTUATORS
+from controller import ROLLUPS
+
+API_ENV = 'TEIKIT_API'
+DEFAULT_ADDRESS = '127.0.0.1:8080'
+MAX_BODY = 4096
+IDLE_TIMEOUT = 30
+JSON_TYPE = 'application/json'
+COMMAND_SOURCES = ('api', 'ui')
+COMMAND_WAIT = 0.5
+# Ventanas de histórico codificadas que se guardan (las menos usadas recientemente salen primero)
+HISTORY_CACHE_SIZE = 16
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LockerAPI:
+    """Servidor asyncio en su propio hilo; `address` es 'host:puerto' o 'unix:/ruta/al/socket'."""
+
+    def __init__(self, controller, address=DEFAULT_ADDRESS):
+        self.controller = controller
+        self.address = address
+        self._history_cache = OrderedDict()
+        self._loop = None
+        self._stopped = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='api', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout=None):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if self.address.startswith('unix:'):
+            path = self.address[len('unix:'):]
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self._handle, path)
+        else:
+            host, _, port = self.address.rpartition(':')
+            server = await asyncio.start_server(self._handle, host or '127.0.0.1', int(port))
+        self._ready.set()
+        async with server:
+            await self._stopped.wait()
+
+    # Conexiones
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                content_type = JSON_TYPE
+                if length > MAX_BODY:
+                    status, payload = 413, self._error('request body too large')
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    url = urlsplit(target)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    if url.path == '/export' and method == 'GET':
+                        # Respuesta por trozos: no pasa por _response ni se junta entera en memoria
+                        if await self._export(writer, url.query, keep_alive):
+                            continue
+                        break
+                    if url.path == '/metrics':
+                        status, payload, content_type = *self._metrics(method), metrics.CONTENT_TYPE
+                    else:
+                        status, payload = await self._dispatch(method, target, body)
+                writer.write(self._response(status, payload, keep_alive, content_type))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _response(status, payload, keep_alive, content_type=JSON_TYPE):
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode('latin-1') + payload
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode()
+
+    async def _dispatch(self, method, target, body):
+        try:
+            return 200, await self.route(method, target, body)
+        except HTTPError as e:
+            return e.status, self._error(str(e))
+        except Exception as e:
+            return 500, self._error(f"{type(e).__name__}: {e}")
+
+    def _metrics(self, method):
+        if method != 'GET':
+            return 405, b'use GET\n'
+        if not metrics.enabled():
+            return 404, f'metrics disabled (set {metrics.METRICS_ENV}=on)\n'.encode()
+        return 200, self.controller.render_metrics().encode()
+
+    async def _export(self, writer, query, keep_alive):
+        """Envía la exportación con Transfer-Encoding: chunked; cada trozo se genera en el ejecutor (lee disco).
+
+        Devuelve si la conexión sigue abierta para otra petición.
+        """
+        # Aquí y no arriba: export trae numpy, que el daemon no necesita hasta la primera exportación
+        from export import CONTENT_TYPES
+        try:
+            fmt, chunks, stats = self._export_request(parse_qs(query))
+        except HTTPError as e:
+            writer.write(self._response(e.status, self._error(str(e)), keep_alive))
+            await writer.drain()
+            return keep_alive
+        extension = 'csv' if fmt == 'csv' else 'col'
+        writer.write((f"HTTP/1.1 200 OK\r\n"
+                      f"Content-Type: {CONTENT_TYPES[fmt]}\r\n"
+                      f"Content-Disposition: attachment; filename=\"teikit-export.{extension}\"\r\n"
+                      f"Transfer-Encoding: chunked\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1'))
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await loop.run_in_executor(None, next, chunks, None)
+                if data is None:
+                    break
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                # Con un cliente lento se espera aquí: no se lee más disco del que se ha enviado
+                await writer.drain()
+        except Exception as e:
+            # El 200 ya salió: se corta sin el trozo final para que el cliente no lo dé por completo
+            print(f"api: exportación interrumpida tras {stats.rows} filas: {type(e).__name__}: {e}")
+            return False
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        print(f"api: exportación {fmt}: {stats.summary()}")
+        return keep_alive
+
+    def _export_request(self, query):
+        from export import DEFAULT_RANGE, ExportStats, export, parse_time
+
+        def param(name, default=None):
+            return query.get(name, [default])[0]
+
+        units = self.controller.units
+        if param('lockers'):
+            wanted = param('lockers').split(',')
+            unknown = [unit_id for unit_id in wanted if unit_id not in self.controller.units_by_id]
+            if unknown:
+                raise HTTPError(404, f"unknown lockers: {', '.join(unknown)}")
+            units = [self.controller.unit(unit_id) for unit_id in wanted]
+        try:
+            end = parse_time(param('to')) if param('to') else clock.time()
+            start = parse_time(param('from')) if param('from') else end - DEFAULT_RANGE
+            step = float(param('step')) if param('step') else None
+            fmt = param('format', 'csv')
+            stats = ExportStats()
+            chunks = export([(unit.id, unit.store) for unit in units], start, end, fmt,
+                            param('source', 'samples'), step, stats=stats)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return fmt, chunks, stats
+
+    # Rutas
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        if not parts or parts[0] != 'lockers' or len(parts) > 3:
+            raise HTTPError(404, f"no route for {url.path}")
+        all_lockers, per_unit = self.controller.snapshot
+        if len(parts) == 1:
+            self._require(method, 'GET')
+            return all_lockers
+        unit_id = parts[1]
+        if unit_id not in per_unit:
+            raise HTTPError(404, f"unknown locker {unit_id!r}")
+        if len(parts) == 2:
+            self._require(method, 'GET')
+            return per_unit[unit_id]
+        unit = self.controller.unit(unit_id)
+        resource = parts[2]
+        if resource == 'history':
+            self._require(method, 'GET')
+            return await self._history(unit, parse_qs(url.query))
+        self._require(method, 'POST')
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, "body must be JSON")
+        if resource == 'thermostat':
+            if not isinstance(request.get('auto'), bool):
+                raise HTTPError(400, "expected {\"auto\": true|false}")
+            unit.thermostat.auto = request['auto']
+        elif resource in ACTUATORS:
+            # La interfaz en otro proceso (remote.py) manda sus órdenes por aquí marcadas como 'ui'
+            source = request.get('source', 'api')
+            if source not in COMMAND_SOURCES:
+                raise HTTPError(400, f"source must be one of {', '.join(COMMAND_SOURCES)}")
+            timing = {key: request.get(key) for key in ('seconds', 'every')}
+            for key, value in timing.items():
+                if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+                    raise HTTPError(400, f"{key} must be a positive number of seconds")
+            try:
+                command = unit.command(resource, request.get('state'), source, **timing)
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+            if command is not None:
+                # La orden se encola; se espera un poco para responder ya con el relé cambiado
+                await asyncio.get_running_loop().run_in_executor(None, command.done.wait, COMMAND_WAIT)
+                if command.refused == 'hold':
+                    raise HTTPError(409, f"{resource} is held {unit.rule_holds.get(resource)} by an active alarm")
+        else:
+            raise HTTPError(404, f"no route for {url.path}")
+        self.controller.publish_snapshot()
+        return self.controller.snapshot[1][unit_id]
+
+    @staticmethod
+    def _require(method, expected):
+        if method != expected:
+            raise HTTPError(405, f"use {expected}")
+
+    async def _history(self, unit, query):
+        try:
+            seconds = float(query.get('seconds', ['300'])[0])
+        except ValueError:
+            raise HTTPError(400, "seconds must be a number")
+        seconds = min(max(seconds, 0.0), max(days for _, days in ROLLUPS.values()) * 86400)
+        # Caché por (casillero, ventana) válida hasta que llegue una fila nueva al buffer que la sirve;
+        # acotada, porque `seconds` lo elige el cliente
+        key = (unit.id, seconds)
+        cached = self._history_cache.get(key)
+        if cached and cached[0] == unit.history_latest(seconds):
+            self._history_cache.move_to_end(key)
+            return cached[1]
+        # Hasta 7 días de agregados: se codifican en el ejecutor para no parar el bucle de eventos;
+        # la marca de la caché sale de la misma copia que el payload
+        latest, payload = await asyncio.get_running_loop().run_in_executor(None, self._history_payload, unit, seconds)
+        self._history_cache[key] = (latest, payload)
+        self._history_cache.move_to_end(key)
+        while len(self._history_cache) > HISTORY_CACHE_SIZE:
+            self._history_cache.popitem(last=False)
+        return payload
+
+    @staticmethod
+    def _history_payload(unit, seconds):
+        window = unit.history_window(seconds)
+        latest = window['time'][-1] if window['time'] else None
+        return latest, json.dumps({'id': unit.id, 'seconds': seconds, **window}).encode()
@@ -0,0 +1,78 @@
+"""Mide el tiempo de render por frame: redibujado completo (anterior) frente a LiveChart (blitting)."""
+import math
+import statistics
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from chart import LiveChart
+
+FRAMES = 200
+INTERVAL = 2.0
+WINDOW = 50
+
+
+def synthetic_series(n):
+    times = [round(i * INTERVAL, 1) for i in range(n)]
+    hums = [55 + 5 * math.sin(i / 15) for i in range(n)]
+    ambs = [22 + math.sin(i / 20) for i in range(n)]
+    pads = [38 + 3 * math.sin(i / 10) for i in range(n)]
+    return times, hums, ambs, pads
+
+
+def windowed(series, i):
+    times, hums, ambs, pads = (s[:i + 1] for s in series)
+    lo = max(0, len(times) - WINDOW // int(INTERVAL) - 1)
+    return times[lo:], hums[lo:], ambs[lo:], pads[lo:]
+
+
+def legacy_frame(ax, canvas, times, hums, ambs, pads):
+    # Copia fiel del update_graphs() original: ax.clear() y reconstrucción completa
+    ax.clear()
+    ax.set_facecolor('#f0f0f0')
+    ax.plot(times, hums, label="Humedad (%)", color="dodgerblue", linewidth=2)
+    ax.plot(times, ambs, label="Ambiente (°C)", color="tomato", linewidth=2)
+    ax.plot(times, pads, label="Pad (°C)", color="forestgreen", linewidth=2)
+    ax.set_title("Temperatura y Humedad", fontsize=14, color='black')
+    ax.set_xlabel("Tiempo (s)", fontsize=12)
+    ax.set_ylabel("Valores", fontsize=12)
+    ax.legend(loc="upper left", fontsize=10)
+    ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.tick_params(axis='both', which='major', labelsize=10)
+    canvas.draw()
+
+
+def measure(render):
+    series = synthetic_series(FRAMES)
+    timings = []
+    for i in range(FRAMES):
+        window = windowed(series, i)
+        start = time.perf_counter()
+        render(*window)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95)]
+
+
+def main():
+    fig, ax = plt.subplots(figsize=(7, 4))
+    legacy = measure(lambda *w: legacy_frame(ax, fig.canvas, *w))
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(7, 4))
+    chart = LiveChart(ax, fig.canvas, window=WINDOW)
+    live = measure(chart.update)
+    plt.close(fig)
+
+    print(f"{'modo':<22}{'media (ms)':>12}{'p95 (ms)':>12}")
+    print(f"{'clear + draw':<22}{legacy[0]:>12.2f}{legacy[1]:>12.2f}")
+    print(f"{'LiveChart (blit)':<22}{live[0]:>12.2f}{live[1]:>12.2f}")
+    print(f"aceleración media: x{legacy[0] / live[0]:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""Banco de pruebas del bucle del casillero: latencia por tick, render, asignaciones y soak.
+
+    python bench_loop.py                        1 h simulada: p50/p99 por etapa y asignaciones
+    python bench_loop.py --soak 7               7 días en tiempo comprimido: RSS por día y crecimiento
+    python bench_loop.py --soak 7 --legacy      lo mismo con el redibujado ax.clear() anterior
+
+Sin Raspberry Pi ni pantalla: el backend simulado de hardware.py hace de RPi.GPIO, board y
+adafruit_dht (sin latencia ni errores de lectura), matplotlib dibuja con Agg y un bucle de
+eventos sobre el reloj virtual hace de root.after. El resto es el camino real: DHT22Reader,
+Sampler.read_all (un hilo por bus), reglas, histórico, almacén en disco (temporal),
+termostato en automático, cola de órdenes, RenderScheduler y LiveChart.
+
+HeadlessKiosk usa el mismo drenado que UI.run (UI.Readout) con las etiquetas en un dict y
+repite update_graphs() sobre una figura Agg.
+Un tick es un hueco de DRAIN_INTERVAL_MS: todo lo que el bucle ejecuta en él (muestreo,
+control, drenado y fotogramas), lo que tardaría una Raspberry Pi de un solo núcleo.
+"""
+import argparse
+import gc
+import heapq
+import itertools
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.style as mplstyle
+import numpy as np
+
+import clock
+import hardware
+import metrics
+from bench_chart import legacy_frame
+from chart import LiveChart
+from controller import CONTROL_PERIOD, SAMPLE_INTERVAL, LockerController, load_config
+from render import RenderScheduler
+from replay import percentile
+from UI import CHART_VIEWS, DISPLAY_IDLE_S, DRAIN_INTERVAL_MS, RENDER_MAX_FPS, Readout
+
+TICK = DRAIN_INTERVAL_MS / 1000
+STAGES = ('sampler', 'control', 'drain', 'render', 'tick')
+# Ticks de calentamiento antes de medir asignaciones (cachés de matplotlib, buffers que se llenan)
+ALLOC_WARMUP = 2000
+ALLOC_TICKS = 4000
+
+
+def bench_config(lockers):
+    """`lockers` casilleros con la plantilla del primero de lockers.json, en automático y con sus reglas."""
+    config = load_config()
+    template = config['lockers'][0]
+    units = []
+    for i in range(lockers):
+        unit = dict(template, id=f"casillero-{i + 1}", dht22=f"D{5 + i}", ds18b20=f"28-0000000be{i:03x}",
+                    fan_pin=100 + 3 * i, lock_pin=101 + 3 * i, pad_pin=102 + 3 * i)
+        unit['thermostat'] = dict(template.get('thermostat', {}), auto=True)
+        units.append(unit)
+    return {'lockers': units, 'rules': config.get('rules', [])}
+
+
+class EventLoop:
+    """root.after sobre el reloj virtual: cada callback se ejecuta en su instante, en orden."""
+
+    def __init__(self, virtual):
+        self.virtual = virtual
+        self.queue = []
+        self._seq = itertools.count()
+
+    def after(self, ms, callback):
+        heapq.heappush(self.queue, (self.virtual.now + ms / 1000, next(self._seq), callback))
+
+    def run_until(self, end):
+        while self.queue and self.queue[0][0] <= end:
+            when, _, callback = heapq.heappop(self.queue)
+            self.virtual.advance_to(when)
+            callback()
+        self.virtual.advance_to(end)
+
+
+class Timings:
+    """Duración de cada etapa; sin `keep` solo totales (el soak no acumula millones de floats)."""
+
+    def __init__(self, keep=True):
+        self.keep = keep
+        self.values = defaultdict(list)
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.slot = 0.0
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+        self.counts[stage] += 1
+        if self.keep:
+            self.values[stage].append(seconds)
+        if stage != 'tick':
+            self.slot += seconds
+
+    def close_slot(self):
+        if self.slot:
+            self.add('tick', self.slot)
+            self.slot = 0.0
+
+    def report(self):
+        print(f"{'etapa':<10}{'n':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'máx (ms)':>11}")
+        for stage in STAGES:
+            values = sorted(self.values[stage])
+            if values:
+                print(f"{stage:<10}{len(values):>9}{percentile(values, 0.5) * 1000:>11.3f}"
+                      f"{percentile(values, 0.99) * 1000:>11.3f}{values[-1] * 1000:>11.3f}")
+
+
+class HeadlessKiosk:
+    """UI.run sin Tk: el mismo Readout con las etiquetas en un dict y el gráfico en una figura Agg."""
+
+    def __init__(self, controller, loop, timings, view=CHART_VIEWS[0], legacy=False, max_fps=RENDER_MAX_FPS):
+        self.controller = controller
+        self.loop = loop
+        self.timings = timings
+        self.view = view
+        self.legacy = legacy
+        self.selected = controller.units[0]
+        self.labels = {unit.id: {} for unit in controller.units}
+        self.readout = Readout(controller, self._show)
+        self.readout.refresh()
+        mplstyle.use('seaborn-v0_8-dark-palette')
+        plt.rcParams.update({'axes.facecolor': 'white', 'figure.facecolor': 'white', 'axes.edgecolor': 'gray'})
+        self.fig, self.ax = plt.subplots(figsize=(7, 4))
+        self.chart = None if legacy else LiveChart(self.ax, self.fig.canvas, window=view[1])
+        if self.chart is not None:
+            self.chart.set_window(*view[1:])
+        self.renderer = RenderScheduler(self.update_graphs, loop.after, None,
+                                        max_fps=max_fps, idle_after=DISPLAY_IDLE_S)
+
+    def start(self):
+        self.renderer.invalidate()
+        self.renderer.start()
+        self.update_readings()
+
+    def update_readings(self):
+        self.timings.close_slot()
+        start = time.perf_counter()
+        self.drain()
+        self.timings.add('drain', time.perf_counter() - start)
+        self.loop.after(DRAIN_INTERVAL_MS, self.update_readings)
+
+    def _show(self, unit_id, key, text):
+        # Lo que en Tk sería config(text=...) de la etiqueta
+        self.labels[unit_id][key] = text
+
+    def drain(self):
+        if self.selected.id in self.readout.drain():
+            self.renderer.invalidate()
+
+    def update_graphs(self):
+        if not len(self.selected.history):
+            return
+        start = time.perf_counter()
+        if self.legacy:
+            # El update_graphs() de antes: ventana cruda y reconstrucción completa con ax.clear()
+            times, hums, ambs, pads = (list(column) for column in self.selected.history.window(self.view[1])[:4])
+            legacy_frame(self.ax, self.fig.canvas, times, hums, ambs, pads)
+        else:
+            self.chart.update_series(self.selected.series(self.view[1], self.chart.width_px))
+        self.timings.add('render', time.perf_counter() - start)
+
+    def close(self):
+        plt.close(self.fig)
+
+
+class Bench:
+    """Controlador completo sobre el backend simulado, movido por el bucle de eventos virtual."""
+
+    def __init__(self, lockers=3, data_dir=None, legacy=False, view=CHART_VIEWS[0], max_fps=RENDER_MAX_FPS,
+                 keep=True, seed=1):
+        self.virtual = clock.VirtualClock(time.time())
+        # Antes de crear plantas y controlador: todo lo que lee clock.monotonic() sigue al reloj virtual
+        clock.use(self.virtual)
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix='teikit-bench-')
+        hw = hardware.SimBackend(dht_error_rate=0.0, dht_latency=0.0, w1_conversion_delay=0.0, seed=seed)
+        self.controller = LockerController(hw=hw, data_dir=self.data_dir, config=bench_config(lockers))
+        for bus in self.controller.w1_buses.values():
+            # La conversión masiva espera el tiempo real de conversión; el bus simulado no lo necesita
+            bus.bulk = False
+        for unit in self.controller.units:
+            unit.load_thermal()
+        self.timings = Timings(keep)
+        self.loop = EventLoop(self.virtual)
+        self.kiosk = HeadlessKiosk(self.controller, self.loop, self.timings, view, legacy, max_fps)
+        self.every(SAMPLE_INTERVAL, 'sampler', self.sample_cycle)
+        self.every(CONTROL_PERIOD, 'control', self.control_cycle)
+        self.kiosk.start()
+
+    def every(self, seconds, stage, callback):
+        def tick():
+            start = time.perf_counter()
+            callback()
+            self.timings.add(stage, time.perf_counter() - start)
+            self.loop.after(seconds * 1000, tick)
+        self.loop.after(seconds * 1000, tick)
+
+    def sample_cycle(self):
+        # Lo que hacen los hilos DHT22Reader y Sampler en campo, en el instante virtual
+        controller = self.controller
+        for unit in controller.units:
+            unit.dht.read_once()
+        for sample in controller.sampler.read_all():
+            controller.sampler.publish(sample)
+
+    def control_cycle(self):
+        self.controller.control_step()
+        self.controller.commands.step()
+
+    def run(self, seconds):
+        self.loop.run_until(self.virtual.now + seconds)
+
+    def close(self):
+        self.kiosk.close()
+        self.controller.stop()
+        clock.use(None)
+
+
+def run_ticks(args):
+    bench = Bench(args.lockers, args.data_dir, args.legacy, args.view, 1 / args.render_every)
+    try:
+        started = time.perf_counter()
+        bench.run(args.minutes * 60)
+        wall = time.perf_counter() - started
+        print(f"{args.lockers} casilleros, vista {args.view[0]}, {'ax.clear()' if args.legacy else 'LiveChart'}: "
+              f"{args.minutes} min simulados en {wall:.1f} s, {bench.kiosk.renderer.frames} fotogramas")
+        bench.timings.report()
+        busy = sum(bench.timings.totals[stage] for stage in STAGES[:-1])
+        print(f"ocupación del bucle: {busy / (args.minutes * 60) * 100:.2f} % de un núcleo")
+
+        # Asignaciones: neto retenido entre dos instantáneas ya en régimen, y los sitios que más crecen
+        bench.timings.keep = False
+        bench.run(ALLOC_WARMUP * TICK)
+        tracemalloc.start()
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        bench.run(ALLOC_TICKS * TICK)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        diff = after.compare_to(before, 'lineno')
+        net = sum(stat.size_diff for stat in diff)
+        print(f"asignaciones: neto {net / 1024 / ALLOC_TICKS * 1000:+.1f} KiB por 1000 ticks, "
+              f"pico trazado {peak / 1024:.0f} KiB")
+        for stat in sorted(diff, key=lambda stat: stat.size_diff, reverse=True)[:3]:
+            frame = stat.traceback[0]
+            print(f"  {stat.size_diff / 1024:+8.1f} KiB  {os.path.relpath(frame.filename)}:{frame.lineno}")
+    finally:
+        bench.close()
+
+
+def run_soak(args):
+    bench = Bench(args.lockers, args.data_dir, args.legacy, args.view, 1 / args.render_every, keep=False)
+    days, rss, frames = [], [], []
+    try:
+        gc.collect()
+        days.append(0)
+        rss.append(metrics.resident_memory_bytes())
+        frames.append(0)
+        print(f"soak: {args.soak} días, {args.lockers} casilleros, vista {args.view[0]}, "
+              f"{'ax.clear()' if args.legacy else 'LiveChart'}, un fotograma cada {args.render_every:g} s como mucho")
+        print(f"{'día':>4}{'RSS (MiB)':>11}{'fotogramas':>12}{'render p. medio (ms)':>22}{'tiempo (s)':>12}")
+        print(f"{0:>4}{rss[0] / 2**20:>11.1f}{0:>12}{'':>22}{'':>12}")
+        for day in range(1, args.soak + 1):
+            started = time.perf_counter()
+            rendered = bench.timings.totals['render'], bench.timings.counts['render']
+            bench.run(86400)
+            gc.collect()
+            days.append(day)
+            rss.append(metrics.resident_memory_bytes())
+            frames.append(bench.kiosk.renderer.frames)
+            render_ms = ((bench.timings.totals['render'] - rendered[0]) * 1000
+                         / max(bench.timings.counts['render'] - rendered[1], 1))
+            print(f"{day:>4}{rss[-1] / 2**20:>11.1f}{frames[-1]:>12}{render_ms:>22.2f}"
+                  f"{time.perf_counter() - started:>12.1f}")
+    finally:
+        bench.close()
+    if len(days) > 2:
+        # Desde el día 1: el primero incluye cachés, buffers que se llenan y el arranque de matplotlib
+        slope = np.polyfit(days[1:], rss[1:], 1)[0]
+        per_frame = slope / ((frames[-1] - frames[1]) / (days[-1] - days[1]) or 1)
+        print(f"crecimiento del RSS desde el día 1: {slope / 1024:+.0f} KiB/día, "
+              f"{per_frame * 1000 / 1024:+.1f} KiB por 1000 fotogramas")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latencia por tick y soak del bucle del casillero, sin hardware")
+    parser.add_argument('--lockers', type=int, default=3, help="casilleros simulados (plantilla: lockers.json)")
+    parser.add_argument('--minutes', type=float, default=60, help="minutos simulados para medir latencias")
+    parser.add_argument('--soak', type=int, metavar='DAYS', help="simula DAYS días y mide el RSS al final de cada uno")
+    parser.add_argument('--legacy', action='store_true', help="redibujado completo con ax.clear() en lugar de LiveChart")
+    parser.add_argument('--view', choices=[view[0] for view in CHART_VIEWS], default=CHART_VIEWS[0][0])
+    parser.add_argument('--render-every', type=float,
+                        help=f"segundos mínimos entre fotogramas (por defecto {1 / RENDER_MAX_FPS:g}; 60 en el soak)")
+    parser.add_argument('--data-dir', help="dónde escribir el histórico (por defecto, un temporal)")
+    args = parser.parse_args(argv)
+    args.view = next(view for view in CHART_VIEWS if view[0] == args.view)
+    if args.render_every is None:
+        args.render_every = 60.0 if args.soak else 1 / RENDER_MAX_FPS
+    if args.soak:
+        return run_soak(args)
+    run_ticks(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+
+# Series del gráfico: (etiqueta, color)
+SERIES = (
+    ("Humedad (%)", "dodgerblue"),
+    ("Ambiente (°C)", "tomato"),
+    ("Pad (°C)", "forestgreen"),
+)
+
+
+class LiveChart:
+    """Gráfico incremental: los artistas se crean una vez y cada tick se hace blitting sobre un fondo cacheado."""
+
+    def __init__(self, ax, canvas, window=50, x_headroom=0.25, y_padding=0.1):
+        self.ax = ax
+        self.canvas = canvas
+        self.window = window
+        self.scale = 1
+        self._reframe = False
+        self.x_headroom = x_headroom
+        self.y_padding = y_padding
+        self.background = None
+        self.last_render_ms = 0.0
+
+        # Decoraciones estáticas: se dibujan solo en el fondo
+        ax.set_facecolor('#f0f0f0')
+        self.lines = [ax.plot([], [], label=label, color=color, linewidth=2, animated=True)[0]
+                      for label, color in SERIES]
+        ax.set_title("Temperatura y Humedad", fontsize=14, color='black')
+        ax.set_xlabel("Tiempo (s)", fontsize=12)
+        ax.set_ylabel("Valores", fontsize=12)
+        ax.legend(loc="upper left", fontsize=10)
+        ax.grid(True, which='both', linestyle='--', linewidth=0.5)
+        ax.tick_params(axis='both', which='major', labelsize=10)
+        ax.set_xlim(0, window)
+        ax.set_ylim(0, 100)
+
+        # Cada redibujado completo (inicio, redimensión, reescalado) renueva el fondo
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.draw()
+
+    def set_title(self, title):
+        self.ax.set_title(title, fontsize=14, color='black')
+        self.canvas.draw_idle()
+
+    def set_window(self, seconds, scale=1, unit='s'):
+        """Cambia la vista a los últimos `seconds` segundos con el eje x en unidades de `scale` segundos."""
+        self.window = seconds / scale
+        self.scale = scale
+        self.ax.set_xlabel(f"Tiempo ({unit})", fontsize=12)
+        # El siguiente update() reencuadra el eje x y redibuja el fondo
+        self._reframe = True
+
+    @property
+    def width_px(self):
+        """Ancho del área de datos en píxeles: más puntos por línea no se llegan a ver."""
+        return max(int(self.ax.bbox.width), 2)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def update(self, times, *series):
+        """Actualiza las líneas con un eje de tiempo común (ver update_series)."""
+        return self.update_series([(times, values) for values in series])
+
+    def update_series(self, series):
+        """Actualiza cada línea con su (x, y) mediante set_data; redibuja todo solo si los datos salen de los límites."""
+        start = time.perf_counter()
+        # np.asarray envuelve sin copiar las vistas (memoryview) del buffer circular
+        series = [(np.asarray(x) / self.scale if self.scale != 1 else np.asarray(x), np.asarray(y)) for x, y in series]
+        for line, (x, y) in zip(self.lines, series):
+            line.set_data(x, y)
+        if self._rescale(series) or self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_lines()
+            self.canvas.blit(self.ax.bbox)
+        self.last_render_ms = (time.perf_counter() - start) * 1000
+        return self.last_render_ms
+
+    def _rescale(self, series):
+        ends = [x[-1] for x, _ in series if len(x)]
+        if not ends:
+            return False
+        changed = False
+        x_min, x_max = self.ax.get_xlim()
+        latest = max(ends)
+        if latest > x_max or self._reframe:
+            self._reframe = False
+            # Se deja margen a la derecha para no reescalar en cada tick
+            right = latest + self.window * self.x_headroom
+            self.ax.set_xlim(right - self.window, right)
+            changed = True
+
+        finite = [y for _, y in series if np.isfinite(y).any()]
+        if finite:
+            low = min(np.nanmin(s) for s in finite)
+            high = max(np.nanmax(s) for s in finite)
+            y_min, y_max = self.ax.get_ylim()
+            if changed or low < y_min or high > y_max:
+                pad = max((high - low) * self.y_padding, 1.0)
+                self.ax.set_ylim(low - pad, high + pad)
+                changed = True
+        return changed
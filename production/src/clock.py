@@ -0,0 +1,45 @@
+"""Reloj de la lógica del casillero.
+
+Por defecto es el reloj del sistema. La reproducción de trazas instala uno virtual con
+`use()` para que la antigüedad de las lecturas, la histéresis y las marcas de tiempo
+avancen al ritmo de la traza. Las medidas de rendimiento (latencias, jitter, plazos de
+los hilos) siguen usando time.monotonic/perf_counter directamente.
+
+`clock.sleep()` es la espera de los dispositivos simulados y de sus conversiones: con el
+reloj virtual no bloquea, adelanta el reloj (un solo hilo lo mueve, como replay y bench_loop).
+
+Se usa siempre como `clock.monotonic()` / `clock.time()`, nunca `from clock import ...`.
+"""
+import time as _time
+
+monotonic = _time.monotonic
+time = _time.time
+sleep = _time.sleep
+
+
+class VirtualClock:
+    """Reloj manual: `advance_to(t)` fija el instante (epoch); monotonic y time coinciden."""
+
+    def __init__(self, start):
+        self.now = start
+
+    def advance_to(self, now):
+        if now > self.now:
+            self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.advance_to(self.now + max(seconds, 0.0))
+
+
+def use(source=None):
+    """Instala `source` (con monotonic(), time() y sleep()) como reloj; None vuelve al del sistema."""
+    global monotonic, time, sleep
+    monotonic = source.monotonic if source else _time.monotonic
+    time = source.time if source else _time.time
+    sleep = source.sleep if source else _time.sleep
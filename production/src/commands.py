@@ -0,0 +1,260 @@
+"""Cola de órdenes de actuadores: serializa, agrupa y temporiza los cambios de relés.
+
+- `submit()` nunca bloquea: encola y vuelve. Un único hilo ('actuators') aplica las órdenes.
+- Por relé solo cuenta la última orden pendiente: varios toques seguidos son un único cambio.
+- Permanencia mínima por relé (DWELL): una orden que llega antes se aplaza hasta que se cumpla.
+- Pulsos (abrir la cerradura 5 s y volver a cerrar) y ciclos (pad 30 s de cada 120 s) en una
+  rueda de temporizadores, sin un hilo dormido por cada uno.
+- Un relé retenido por una alarma (`rule_holds` del casillero) no acepta órdenes contrarias:
+  se descartan con `refused = 'hold'`, también las vueltas de pulso y los ciclos.
+
+Los lazos de control (termostato, reglas, reconciliación) siguen escribiendo directamente
+en ActuatorBank: los cortes de seguridad no esperan a la cola.
+"""
+import math
+import threading
+import time
+
+import clock
+from actuators import ACTUATORS
+from metrics import COMMAND_LATENCY
+
+# Segundos mínimos entre dos cambios de un mismo relé (cuenta cualquier transición, también las del termostato)
+DWELL = {'fan': 2.0, 'lock': 0.5, 'pad': 5.0}
+TICK = 0.05
+SLOTS = 256
+
+
+class Timer:
+    __slots__ = ('when', 'callback', 'rounds', 'cancelled')
+
+    def __init__(self, when, callback, rounds):
+        self.when = when
+        self.callback = callback
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Rueda de temporizadores de `slots` huecos de `tick` segundos.
+
+    Alta y cancelación O(1); `advance()` recorre solo los huecos transcurridos. Los
+    plazos más lejanos que una vuelta esperan en su hueco contando vueltas. Un
+    temporizador nunca vence antes de su plazo, como mucho un `tick` después.
+    """
+
+    def __init__(self, tick=TICK, slots=SLOTS, now=0.0):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.active = 0
+        self._tick_count = math.floor(now / tick)
+
+    def schedule(self, when, callback):
+        timer = Timer(when, callback, 0)
+        self._add(timer)
+        return timer
+
+    def _add(self, timer):
+        ticks = max(math.ceil(timer.when / self.tick), self._tick_count + 1)
+        timer.rounds = (ticks - self._tick_count - 1) // len(self.slots)
+        self.slots[ticks % len(self.slots)].append(timer)
+        self.active += 1
+
+    def advance(self, now):
+        """Saca de la rueda los temporizadores vencidos hasta `now` y devuelve sus callbacks, en orden."""
+        target = math.floor(now / self.tick)
+        due = []
+        if target - self._tick_count > len(self.slots):
+            # Salto de más de una vuelta (p. ej. reproducción de trazas): se reparten de nuevo
+            timers = sorted((timer for slot in self.slots for timer in slot if not timer.cancelled),
+                            key=lambda timer: timer.when)
+            for slot in self.slots:
+                slot.clear()
+            self.active = 0
+            self._tick_count = target
+            for timer in timers:
+                if timer.when <= now:
+                    due.append(timer.callback)
+                else:
+                    self._add(timer)
+            return due
+        while self._tick_count < target:
+            self._tick_count += 1
+            slot = self.slots[self._tick_count % len(self.slots)]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                if timer.cancelled:
+                    self.active -= 1
+                elif timer.rounds == 0:
+                    self.active -= 1
+                    due.append(timer.callback)
+                else:
+                    timer.rounds -= 1
+                    keep.append(timer)
+            slot[:] = keep
+        return due
+
+
+class Command:
+    """Orden encolada; `done` se activa al aplicarla, al descartarla o al quedar sustituida.
+
+    `refused` dice por qué se descartó sin tocar el relé ('hold': retenido por una alarma).
+    """
+    __slots__ = ('bank', 'name', 'state', 'source', 'seconds', 'submitted', 'done', 'applied', 'refused')
+
+    def __init__(self, bank, name, state, source, seconds=None):
+        self.bank = bank
+        self.name = name
+        self.state = state
+        self.source = source
+        self.seconds = seconds
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.applied = False
+        self.refused = None
+
+
+class CommandQueue(threading.Thread):
+    """Hilo dueño de las órdenes de los casilleros; ver el docstring del módulo.
+
+    `holds(unit_id)` devuelve los relés retenidos por alarmas de ese casillero ({relé: estado}).
+    """
+
+    def __init__(self, dwell=DWELL, tick=TICK, holds=None):
+        super().__init__(name='actuators', daemon=True)
+        self.dwell = dict(dwell)
+        self.holds = holds or (lambda unit_id: {})
+        self.wheel = TimerWheel(tick, now=clock.monotonic())
+        self.submitted = 0
+        self.coalesced = 0
+        self.deferred = 0
+        self.refused = 0
+        self.max_latency = 0.0
+        # (casillero, relé) -> orden pendiente; orden aplazada por permanencia (con su plazo);
+        # el temporizador de vuelta de un pulso; el de un ciclo
+        self._pending = {}
+        self._deferred = {}
+        self._reverts = {}
+        self._cycles = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    # API para UI, API y reglas (cualquier hilo)
+    def submit(self, bank, name, state, source, seconds=None):
+        """Encola `name` -> `state`; con `seconds` vuelve al estado contrario pasado ese tiempo (pulso).
+
+        Una orden manual cancela el pulso o ciclo en curso de ese relé.
+        """
+        bank.validate(name, state)
+        self._cancel_timers((bank.unit_id, name))
+        return self._enqueue(Command(bank, name, state, source, seconds))
+
+    def cycle(self, bank, name, state, seconds, every, source):
+        """Ciclo de trabajo: `state` durante `seconds` s de cada `every` s hasta la siguiente orden manual."""
+        bank.validate(name, state)
+        if not seconds or not every or not 0 < seconds < every:
+            raise ValueError(f"duty cycle needs 0 < seconds < every, got {seconds} and {every}")
+        key = (bank.unit_id, name)
+        self._cancel_timers(key)
+        deadline = clock.monotonic()
+
+        def period():
+            nonlocal deadline
+            self._enqueue(Command(bank, name, state, source, seconds))
+            # Plazos absolutos: el retraso de un tick no se acumula de un periodo al siguiente
+            deadline += every
+            with self._lock:
+                self._cycles[key] = self.wheel.schedule(deadline, period)
+        with self._lock:
+            self._cycles[key] = self.wheel.schedule(deadline, period)
+        self._wake.set()
+
+    def _cancel_timers(self, key):
+        with self._lock:
+            for timers in (self._reverts, self._cycles):
+                timer = timers.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+
+    def _enqueue(self, command):
+        key = (command.bank.unit_id, command.name)
+        with self._lock:
+            self.submitted += 1
+            replaced = [self._pending.get(key), self._deferred.pop(key, (None,))[0]]
+            self._pending[key] = command
+        for old in replaced:
+            if old is not None:
+                # Solo cuenta la última: la anterior no llega a tocar el relé
+                self.coalesced += 1
+                old.done.set()
+        self._wake.set()
+        return command
+
+    # Hilo
+    def run(self):
+        while not self._stop_event.is_set():
+            # Sin temporizadores ni órdenes aplazadas el hilo duerme hasta la próxima orden
+            self._wake.wait(self.wheel.tick if self.wheel.active or self._deferred else None)
+            self._wake.clear()
+            self.step()
+
+    def step(self, now=None):
+        """Avanza la rueda y aplica las órdenes listas (el hilo, o replay.py con el reloj virtual)."""
+        now = clock.monotonic() if now is None else now
+        with self._lock:
+            due = self.wheel.advance(now)
+        for callback in due:
+            callback()
+        with self._lock:
+            ready, self._pending = self._pending, {}
+            for key, (command, until) in list(self._deferred.items()):
+                if until <= now:
+                    ready[key] = command
+                    del self._deferred[key]
+        for key, command in ready.items():
+            self._apply(key, command, now)
+
+    def _apply(self, key, command, now):
+        bank, name = command.bank, command.name
+        held = self.holds(bank.unit_id).get(name)
+        if held is not None and held != command.state:
+            # La alarma manda: ni la orden ni su vuelta de pulso tocan el relé (un ciclo lo reintenta en su periodo)
+            self.refused += 1
+            command.refused = 'hold'
+            command.done.set()
+            return
+        last = bank.changed_at.get(name)
+        dwell = self.dwell.get(name, 0.0)
+        if last is not None and now - last < dwell and bank.state(name) != command.state:
+            # Aún no ha cumplido la permanencia mínima: se aplica al cumplirla, salvo que llegue otra orden
+            self.deferred += 1
+            with self._lock:
+                if key in self._pending:
+                    command.done.set()
+                    self.coalesced += 1
+                else:
+                    self._deferred[key] = (command, last + dwell)
+            return
+        command.applied = bank.set(name, command.state, command.source)
+        latency = time.perf_counter() - command.submitted
+        self.max_latency = max(self.max_latency, latency)
+        COMMAND_LATENCY.observe(latency, command.source)
+        if command.seconds:
+            _, _, active, inactive = ACTUATORS[name]
+            back = inactive if command.state == active else active
+            with self._lock:
+                self._reverts[key] = self.wheel.schedule(
+                    now + command.seconds, lambda: self._enqueue(Command(bank, name, back, command.source)))
+        command.done.set()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        self._wake.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,485 @@
+import json
+import math
+import os
+import threading
+import traceback
+
+import clock
+import hardware
+import metrics
+from actuators import ACTUATORS, SOURCES, ActuatorBank
+from commands import CommandQueue
+from ds18b20 import DEFAULT_RESOLUTION, DS18B20Bus
+from lttb import downsample
+from metrics import STAGE_SECONDS
+from ringbuffer import SeriesBuffer
+from rollups import Rollup
+from rules import RulesEngine
+from sampler import Sampler
+from scheduler import FixedRateScheduler
+from sensors import DHT22Reader, SpikeFilter
+from shared import SharedState
+from store import SegmentStore
+from thermal import MODEL_FILE, ThermalModel
+from thermostat import Thermostat
+from w1devices import DeviceRegistry
+
+# Mapa declarativo de casilleros: TEIKIT_LOCKERS o production/config/lockers.json
+CONFIG_FILE = os.environ.get('TEIKIT_LOCKERS', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            '..', 'config', 'lockers.json'))
+DEFAULT_CONFIG = {'lockers': [{'id': 'casillero-1', 'dht22': 'D5', 'ds18b20': '28-3de10457e49d',
+                               'fan_pin': 22, 'lock_pin': 17, 'pad_pin': 27}]}
+UNIT_KEYS = ('id', 'dht22', 'ds18b20', 'fan_pin', 'lock_pin', 'pad_pin')
+DEFAULT_W1_BUS = 'w1_bus_master1'
+
+# Muestreo e histórico: buffer circular de HISTORY_HOURS horas y segmentos en disco con 30 días de retención
+SAMPLE_INTERVAL = 2.0
+HISTORY_HOURS = 6
+HISTORY_CAPACITY = int(HISTORY_HOURS * 3600 / SAMPLE_INTERVAL)
+DATA_DIR = os.environ.get('TEIKIT_DATA_DIR', os.path.expanduser('~/.local/share/teikit'))
+EXPIRE_INTERVAL = 3600
+# Funciones de las sondas 1-wire -> serie, guardadas para sobrevivir a un cambio de sonda
+W1_REGISTRY_FILE = 'w1_devices.json'
+# Agregados incrementales del histórico: nombre (canal en disco) -> (segundos por intervalo, días en memoria)
+ROLLUPS = {'minute': (60, 7), 'hour': (3600, 30)}
+CHANNELS = ('humidity', 'temperature', 'pad_temperature')
+
+# Periodo del lazo de control (termostato y cortes de seguridad), independiente del muestreo y de la UI
+CONTROL_PERIOD = 1.0
+# Cada cuánto se contrasta el estado de los relés con GPIO para detectar fallos
+RECONCILE_INTERVAL = 30.0
+
+
+def history_source(seconds):
+    """Fuente con la que se sirve una ventana: el buffer crudo mientras alcance, luego el agregado más fino que la cubra."""
+    if seconds <= HISTORY_HOURS * 3600:
+        return 'raw'
+    for name, (_, days) in ROLLUPS.items():
+        if seconds <= days * 86400:
+            return name
+    return list(ROLLUPS)[-1]
+
+
+def load_config(path=CONFIG_FILE):
+    """Lee el mapa de pines y sensores; sin archivo se usa el casillero único de siempre."""
+    if not os.path.exists(path):
+        return DEFAULT_CONFIG
+    with open(path, 'r') as f:
+        config = json.load(f)
+    ids = set()
+    for unit in config.get('lockers', []):
+        missing = [key for key in UNIT_KEYS if key not in unit]
+        if missing:
+            raise ValueError(f"{path}: locker {unit.get('id', '?')!r} is missing {', '.join(missing)}")
+        if unit['id'] in ids:
+            raise ValueError(f"{path}: duplicate locker id {unit['id']!r}")
+        ids.add(unit['id'])
+    if not ids:
+        raise ValueError(f"{path}: no lockers defined")
+    return config
+
+
+def local_buffers(source, columns, capacity):
+    return SeriesBuffer(columns, capacity)
+
+
+class LockerUnit:
+    """Un compartimento: sus sensores, relés, histórico en memoria y almacén en disco.
+
+    `buffers(fuente, columnas, capacidad)` crea los buffers del histórico ('raw' y uno por
+    agregado); con memoria compartida los leen también los procesos de interfaz.
+    """
+
+    def __init__(self, hw, config, data_dir, start_time, pad_bus, commands, buffers=local_buffers, registry=None):
+        self.hw = hw
+        self.GPIO = GPIO = hw.GPIO
+        self.id = config['id']
+        self.fan_pin, self.lock_pin, self.pad_pin = config['fan_pin'], config['lock_pin'], config['pad_pin']
+        # Buses para la lectura concurrente: cada DHT22 en su pin, las DS18B20 por maestro 1-wire
+        self.dht_bus = 'dht:' + config['dht22']
+        self.w1_bus = 'w1:' + config.get('w1_bus', DEFAULT_W1_BUS)
+
+        hw.bind_unit(config)
+        self.dht = DHT22Reader(hw.dht22(config['dht22']), name=f"dht22-{self.id}")
+        # La sonda del pad comparte maestro 1-wire (y conversión simultánea) con las de otros casilleros;
+        # el registro decide qué serie es y la cambia en caliente si se sustituye la sonda
+        self.pad_bus = pad_bus
+        serial = config['ds18b20']
+        if registry is not None:
+            serial = registry.resolve(f"{self.id}.pad", serial)
+            registry.watch(f"{self.id}.pad", self._rebind_pad)
+        self.pad_probe = pad_bus.add(serial, config.get('ds18b20_resolution', DEFAULT_RESOLUTION))
+        # Serie que debe leer la sonda; si el registro la cambia, el muestreador la aplica entre lecturas
+        self._pad_serial = serial
+        self.pad_filter = SpikeFilter(min_spread=0.3, valid_range=(-55.0, 125.0))
+        self.pad_reads = 0
+        self.pad_errors = 0
+
+        self.start_time = start_time
+        self.history = buffers('raw', ('time',) + CHANNELS, HISTORY_CAPACITY)
+        self.rollups = {name: Rollup(CHANNELS, seconds, days * 86400 // seconds, offset=start_time,
+                                     make_buffer=lambda columns, capacity, name=name: buffers(name, columns, capacity))
+                        for name, (seconds, days) in ROLLUPS.items()}
+        self._series_cache = (None, None)
+        self.store = SegmentStore(os.path.join(data_dir, self.id), flush_interval=60, retention_days=30)
+        # Modelo térmico del casillero, ajustado con cada muestra y guardado junto a sus segmentos
+        self.thermal = ThermalModel(os.path.join(data_dir, self.id, MODEL_FILE))
+        self._forecast_cache = (None, None)
+
+        # Estado autoritativo de los relés; cada transición queda registrada en disco
+        self.actuators = ActuatorBank(GPIO, self.id, {'fan': self.fan_pin, 'lock': self.lock_pin, 'pad': self.pad_pin})
+        self.actuators.subscribe(self._log_event)
+        self.actuators.subscribe(self._thermal_relay)
+        self.actuators.set('fan', 'off', 'init')
+        self.actuators.set('lock', 'closed', 'init')
+        self.actuators.set('pad', 'off', 'init')
+        # Órdenes manuales (UI, API): encoladas, agrupadas y con permanencia mínima
+        self.commands = commands
+        # Última lectura válida por canal: (valor, instante monotónico); la escribe el muestreador
+        self.readings = {}
+        # Alarmas activas y relés que retienen; los reemplaza en bloque el motor de reglas
+        self.alarms = ()
+        self.rule_holds = {}
+        self.thermostat = Thermostat(self, **config.get('thermostat', {}))
+
+    # Sensores (solo se llaman desde los hilos del muestreador)
+    def read_dht(self):
+        # No bloquea: el DHT22 se lee en su propio hilo y aquí se toma la última lectura buena
+        return self.dht.latest()
+
+    def read_pad_temp(self):
+        # El driver descarta CRC inválido y el valor de reinicio (85.0)
+        serial = self._pad_serial
+        if serial != self.pad_probe.serial:
+            self.pad_probe.rebind(serial)
+            # Otra sonda, otro desvío: las lecturas de la anterior no sirven para filtrar picos
+            self.pad_filter.values.clear()
+        self.pad_reads += 1
+        with STAGE_SECONDS.time('pad_read'):
+            celsius = self.pad_probe.read()
+        if celsius is None:
+            self.pad_errors += 1
+            return None
+        return self.pad_filter(celsius)
+
+    def _rebind_pad(self, serial):
+        # Hilo de control (w1.poll): la sonda y el filtro son del hilo del muestreador, aquí solo se anota
+        self._pad_serial = serial
+
+    def observe(self, sample):
+        """Actualiza las últimas lecturas válidas (hilo del muestreador, sin esperar a la UI)."""
+        now = clock.monotonic()
+        for channel in ('humidity', 'temperature', 'pad_temperature'):
+            value = getattr(sample, channel)
+            if value is not None:
+                self.readings[channel] = (value, now)
+        self.thermal.observe(sample.timestamp, sample.pad_temperature, sample.temperature)
+
+    def forecast(self):
+        """Pad y ambiente previstos a FORECAST_HORIZON s, o None sin modelo fiable o sin lecturas."""
+        max_age = self.thermostat.params['stale_after']
+        pad, ambient = self.reading('pad_temperature', max_age), self.reading('temperature', max_age)
+        if pad is None or ambient is None:
+            return None
+        relays = tuple(self.actuators.state(name) == ACTUATORS[name][2] for name in ('pad', 'fan'))
+        # La instantánea (1 Hz) y la UI lo piden más a menudo de lo que cambian lecturas, relés y modelo
+        key = (pad, ambient, relays, self.thermostat.auto, self.thermal.loaded, self.thermal.refits)
+        if self._forecast_cache[0] != key:
+            # En automático se prevé con el termostato actuando; en manual, con los relés quietos
+            params = self.thermostat.params if self.thermostat.auto else None
+            self._forecast_cache = (key, self.thermal.forecast(pad, ambient, *relays, params=params))
+        return self._forecast_cache[1]
+
+    def thermal_relays(self):
+        """(pin, nivel GPIO activo) del pad y del ventilador, como quedan sus transiciones en disco."""
+        return [(self.actuators.pins[name], getattr(self.GPIO, ACTUATORS[name][1])) for name in ('pad', 'fan')]
+
+    def reading(self, channel, max_age):
+        """Última lectura válida del canal, o None si no hay o tiene más de `max_age` segundos."""
+        value, at = self.readings.get(channel, (None, None))
+        if value is None or clock.monotonic() - at > max_age:
+            return None
+        return value
+
+    # Actuadores
+    def command(self, name, state, source='ui', seconds=None, every=None):
+        """Orden por nombre: command('lock', 'open'), command('pad', 'off')...
+
+        Con `seconds` es un pulso (vuelve al estado contrario pasado ese tiempo) y con
+        `every`, además, un ciclo que se repite. No espera: devuelve la Command encolada
+        (None para un ciclo).
+        """
+        if every:
+            return self.commands.cycle(self.actuators, name, state, seconds, every, source)
+        return self.commands.submit(self.actuators, name, state, source, seconds)
+
+    def _thermal_relay(self, event):
+        if event.name in ('pad', 'fan'):
+            self.thermal.relay(event.name, event.state == ACTUATORS[event.name][2], event.timestamp)
+
+    def _log_event(self, event):
+        self.store.append('events', event.timestamp, event.pin, event.level, SOURCES.index(event.source))
+
+    # Histórico
+    def load_history(self):
+        # Recupera del disco los agregados y las últimas HISTORY_HOURS horas tras un reinicio
+        now = clock.time()
+        for name, (seconds, days) in ROLLUPS.items():
+            for row in self.store.query(name, now - days * 86400, now):
+                self.rollups[name].load(row)
+        for ts, h, t, pad_t in self.store.query('samples', now - HISTORY_HOURS * 3600, now):
+            if not (math.isnan(h) and math.isnan(t) and math.isnan(pad_t)):
+                self.history.append(round(ts - self.start_time, 1), h, t, pad_t)
+                # Completa los intervalos que quedaron abiertos al parar
+                self._roll(ts, h, t, pad_t)
+
+    def load_thermal(self):
+        # Modelo guardado o, sin él, un ajuste de una vez con el histórico reciente (importa numpy)
+        rows = self.thermal.load(self.store, self.thermal_relays(), clock.time())
+        if rows:
+            print(f"{self.id}: modelo térmico ajustado con {rows} intervalos del histórico")
+
+    def snapshot(self):
+        """Estado publicable del casillero: últimas lecturas con su antigüedad, actuadores y termostato."""
+        now = clock.monotonic()
+        readings = {}
+        for channel, (value, at) in list(self.readings.items()):
+            readings[channel] = {'value': value, 'age': round(now - at, 1)}
+        return {
+            'id': self.id,
+            'readings': readings,
+            'pad_probe': self.pad_probe.serial,
+            'actuators': self.actuators.states(),
+            'thermostat': {'auto': self.thermostat.auto, 'fault': self.thermostat.fault},
+            'forecast': self.forecast(),
+            'alarms': list(self.alarms),
+        }
+
+    def _buffer(self, source):
+        return self.history if source == 'raw' else self.rollups[source].buffer
+
+    def history_window(self, seconds):
+        """Últimos `seconds` segundos como listas (tiempo en epoch); los agregados incluyen mínimos y máximos."""
+        source = history_source(seconds)
+        buffer = self._buffer(source)
+        times, *columns = buffer.copy_window(seconds)
+        window = {'resolution': source, 'time': [round(self.start_time + t, 1) for t in times]}
+        for name, values in zip(buffer.columns[1:], columns):
+            window[name] = [None if math.isnan(v) else v for v in values]
+        return window
+
+    def history_latest(self, seconds):
+        """Tiempo (epoch) de la última fila de la ventana de `seconds`, como en history_window; None si no hay."""
+        latest = self._buffer(history_source(seconds)).latest()
+        return latest and round(self.start_time + latest[0], 1)
+
+    def series(self, seconds, points):
+        """Medias de los últimos `seconds` segundos por canal como (x, y), reducidas con LTTB a `points` puntos."""
+        buffer = self._buffer(history_source(seconds))
+        latest = buffer.latest()
+        key = (seconds, points, id(buffer), len(buffer), latest and latest[0])
+        if self._series_cache[0] != key:
+            times, *channels = buffer.window(seconds)[:1 + len(CHANNELS)]
+            self._series_cache = (key, [downsample(times, values, points) for values in channels])
+        return self._series_cache[1]
+
+    def record(self, sample):
+        h, t, pad_t = sample.humidity, sample.temperature, sample.pad_temperature
+        self.store.append('samples', sample.timestamp, h, t, pad_t)
+        # Canales independientes: un sensor sin lectura queda como hueco (NaN) sin borrar a los demás
+        if h is not None or t is not None or pad_t is not None:
+            self.history.append(round(sample.timestamp - self.start_time, 1), h, t, pad_t)
+            self._roll(sample.timestamp, h, t, pad_t)
+
+    def _roll(self, timestamp, *values):
+        for name, rollup in self.rollups.items():
+            row = rollup.add(timestamp, *values)
+            if row:
+                self.store.append(name, *row)
+
+
+class LockerController:
+    """Lógica de los casilleros sin interfaz: hardware, muestreo, histórico y actuadores de N unidades.
+
+    Con `shm` (nombre de segmento) el histórico y la instantánea se publican en memoria
+    compartida para interfaces en otros procesos (ver shared.py y remote.py).
+    """
+
+    def __init__(self, hw=None, data_dir=DATA_DIR, config=None, shm=None):
+        self.hw = hw or hardware.get_backend()
+        self.GPIO = GPIO = self.hw.GPIO
+        GPIO.setmode(GPIO.BCM)
+
+        self.start_time = clock.time()
+        self.data_dir = data_dir
+        config = config or load_config()
+        self.shared = SharedState(shm, boot=self.start_time) if shm else None
+        bus_names = [unit.get('w1_bus', DEFAULT_W1_BUS) for unit in config['lockers']]
+        self.w1_buses = {name: DS18B20Bus(self.hw, name) for name in bus_names}
+        # Las órdenes respetan los relés retenidos por las alarmas, igual que el termostato
+        self.commands = CommandQueue(holds=lambda unit_id: self.units_by_id[unit_id].rule_holds)
+        self.w1 = DeviceRegistry(self.hw, os.path.join(data_dir, W1_REGISTRY_FILE))
+        self.units = [LockerUnit(self.hw, unit, data_dir, self.start_time, self.w1_buses[name], self.commands,
+                                 self.shared.buffers(unit['id']) if self.shared else local_buffers, self.w1)
+                      for unit, name in zip(config['lockers'], bus_names)]
+        # Con todas las funciones declaradas: reparte sondas nuevas entre las que faltan
+        self.w1.poll(force=True)
+        self.units_by_id = {unit.id: unit for unit in self.units}
+        self.sampler = Sampler(self.units, interval=SAMPLE_INTERVAL)
+        # Reglas de alarma: se evalúan en el hilo del muestreador con cada ciclo
+        self.rules = RulesEngine(config.get('rules', []), self.units)
+        self.sampler.listeners.append(self.rules.feed)
+        self.control = FixedRateScheduler(self.control_step, CONTROL_PERIOD, name='control')
+        self._last_expire = clock.monotonic()
+        self._last_reconcile = clock.monotonic()
+        self._stop_event = threading.Event()
+        self._thermal_loader = None
+        self.metrics = self._build_metrics()
+        self.publish_snapshot()
+
+    def unit(self, unit_id):
+        return self.units_by_id[unit_id]
+
+    def _build_metrics(self):
+        """Contadores y estados que ya llevan los objetos; se leen solo al exportar."""
+        registry = metrics.Registry()
+        units = self.units
+
+        def per_sensor(dht, w1):
+            return lambda: [item for u in units for item in (((u.id, 'dht22'), dht(u)), ((u.id, 'ds18b20'), w1(u)))]
+
+        metrics.Counter('teikit_sensor_reads_total', "Lecturas de sensor intentadas.", ('unit', 'sensor'),
+                        per_sensor(lambda u: u.dht.reads, lambda u: u.pad_reads), registry)
+        metrics.Counter('teikit_sensor_errors_total', "Lecturas fallidas (el DHT22 reintenta en el siguiente hueco).",
+                        ('unit', 'sensor'), per_sensor(lambda u: u.dht.errors, lambda u: u.pad_errors), registry)
+        metrics.Counter('teikit_ds18b20_crc_errors_total', "Lecturas de w1_slave con CRC inválido.", ('unit',),
+                        lambda: [((u.id,), u.pad_probe.crc_errors) for u in units], registry)
+        metrics.Gauge('teikit_w1_bulk_conversion', "1 si el maestro 1-wire convierte todas sus sondas a la vez "
+                      "(therm_bulk_read), 0 si cada sonda convierte por separado.", ('bus',),
+                      lambda: [((name,), int(bus.bulk)) for name, bus in self.w1_buses.items()], registry)
+        metrics.Counter('teikit_w1_convert_errors_total', "Conversiones masivas fallidas.", ('bus',),
+                        lambda: [((name,), bus.convert_errors) for name, bus in self.w1_buses.items()], registry)
+        metrics.Counter('teikit_w1_rebinds_total', "Funciones de sonda reasignadas a otra serie en caliente.",
+                        callback=lambda: [((), self.w1.rebinds)], registry=registry)
+        metrics.Gauge('teikit_w1_probes_missing', "Funciones de sonda sin su sonda conectada.",
+                      callback=lambda: [((), len(self.w1.missing()))], registry=registry)
+        metrics.Counter('teikit_sensor_rejected_total', "Valores descartados por el filtro de picos.", ('unit', 'channel'),
+                        lambda: [item for u in units for item in (
+                            ((u.id, 'humidity'), u.dht.humidity_filter.rejected),
+                            ((u.id, 'temperature'), u.dht.temperature_filter.rejected),
+                            ((u.id, 'pad_temperature'), u.pad_filter.rejected))], registry)
+        metrics.Gauge('teikit_reading_age_seconds', "Antigüedad de la última lectura válida.", ('unit', 'channel'),
+                      lambda: [((u.id, channel), round(clock.monotonic() - at, 3))
+                               for u in units for channel, (_, at) in list(u.readings.items())], registry)
+        metrics.Counter('teikit_actuator_faults_total', "Relés que no coincidían con el estado esperado.", ('unit',),
+                        lambda: [((u.id,), u.actuators.faults) for u in units], registry)
+        metrics.Counter('teikit_actuator_commands_total', "Órdenes de relé encoladas, agrupadas (sustituidas por "
+                        "una posterior), aplazadas por permanencia mínima y rechazadas por una alarma.", ('result',),
+                        lambda: [(('submitted',), self.commands.submitted), (('coalesced',), self.commands.coalesced),
+                                 (('deferred',), self.commands.deferred), (('refused',), self.commands.refused)],
+                        registry)
+        metrics.Counter('teikit_thermostat_suppressed_total', "Conmutaciones retenidas por el intervalo mínimo.",
+                        ('unit',), lambda: [((u.id,), u.thermostat.suppressed) for u in units], registry)
+        metrics.Counter('teikit_thermostat_preemptive_total', "Conmutaciones adelantadas por el modelo térmico.",
+                        ('unit',), lambda: [((u.id,), u.thermostat.preemptive) for u in units], registry)
+        metrics.Gauge('teikit_thermal_fit_error_celsius', "Error cuadrático medio del modelo térmico por intervalo "
+                      "de ajuste.", ('unit', 'channel'),
+                      lambda: [((u.id, channel), error) for u in units
+                               for channel, error in u.thermal.errors().items() if error is not None], registry)
+        metrics.Gauge('teikit_alarms_active', "Reglas de alarma disparadas ahora.", ('unit',),
+                      lambda: [((u.id,), len(u.alarms)) for u in units], registry)
+        metrics.Counter('teikit_alarms_raised_total', "Disparos de reglas de alarma.",
+                        callback=lambda: [((), self.rules.raised)], registry=registry)
+        metrics.Counter('teikit_loop_missed_ticks_total', "Ticks perdidos por sobrepasar el periodo.", ('loop',),
+                        lambda: [((self.control.name,), self.control.jitter.missed)], registry)
+        metrics.Counter('teikit_sampler_late_buses_total', "Lecturas de bus que no terminaron antes del plazo.",
+                        callback=lambda: [((), self.sampler.late_buses)], registry=registry)
+        metrics.Gauge('teikit_sampler_queue_depth', "Muestras pendientes de drenar.",
+                      callback=lambda: [((), self.sampler.samples.qsize())], registry=registry)
+        return registry
+
+    def render_metrics(self):
+        """Texto de Prometheus con las métricas del proceso y las de este controlador."""
+        return metrics.REGISTRY.render() + self.metrics.render()
+
+    # Ciclo de vida
+    def start(self):
+        for unit in self.units:
+            unit.load_history()
+            unit.dht.start()
+        self.sampler.start()
+        self.control.start()
+        self.commands.start()
+        # El modelo térmico (numpy y ajuste con el histórico) se carga en su hilo: el control, la API
+        # y la interfaz no lo esperan. Hasta que termina no hay pronóstico (ThermalModel.loaded)
+        self._thermal_loader = threading.Thread(target=self._load_thermal, name='thermal-load', daemon=True)
+        self._thermal_loader.start()
+
+    def _load_thermal(self):
+        for unit in self.units:
+            if self._stop_event.is_set():
+                return
+            try:
+                unit.load_thermal()
+            except Exception:
+                traceback.print_exc()
+
+    def control_step(self):
+        # Cambios de sondas 1-wire: un listdir cada POLL_INTERVAL, no un rastreo por lectura
+        self.w1.poll()
+        for unit in self.units:
+            unit.thermostat.step()
+        if clock.monotonic() - self._last_reconcile >= RECONCILE_INTERVAL:
+            self._last_reconcile = clock.monotonic()
+            for unit in self.units:
+                unit.actuators.reconcile()
+        self.publish_snapshot()
+
+    def publish_snapshot(self):
+        """Regenera la instantánea JSON que sirve la API; los clientes nunca tocan sensores ni GPIO."""
+        units = {unit.id: unit.snapshot() for unit in self.units}
+        # Se reemplaza la tupla completa: la API lee una referencia inmutable sin bloqueos
+        self.snapshot = (
+            json.dumps({'timestamp': clock.time(), 'lockers': list(units.values())}).encode(),
+            {unit_id: json.dumps(state).encode() for unit_id, state in units.items()},
+        )
+        if self.shared is not None:
+            self.shared.publish(self.snapshot[0], clock.time())
+
+    def poll(self):
+        """Drena las muestras pendientes hacia el histórico y el disco; nunca espera a los sensores."""
+        samples = self.sampler.drain()
+        for sample in samples:
+            self.units_by_id[sample.unit].record(sample)
+        if clock.monotonic() - self._last_expire >= EXPIRE_INTERVAL:
+            self._last_expire = clock.monotonic()
+            for unit in self.units:
+                unit.store.expire(clock.time())
+                unit.thermal.save()
+        return samples
+
+    def run_forever(self, poll_interval=0.25):
+        """Bucle sin interfaz: drena el muestreador hasta que se llame a shutdown()."""
+        while not self._stop_event.wait(poll_interval):
+            self.poll()
+
+    def shutdown(self):
+        self._stop_event.set()
+
+    def stop(self):
+        self.shutdown()
+        self.commands.stop(timeout=2)
+        self.control.stop(timeout=2)
+        self.sampler.stop(timeout=2)
+        if self._thermal_loader is not None:
+            # Un modelo a medio cargar no se guarda (save() lo omite): no pisa al del disco
+            self._thermal_loader.join(timeout=2)
+        for unit in self.units:
+            unit.dht.stop(timeout=2)
+            unit.thermal.save()
+            unit.store.close()
+        if self.shared is not None:
+            for unit in self.units:
+                unit._series_cache = (None, None)
+            self.shared.close()
+        self.GPIO.cleanup()
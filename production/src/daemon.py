@@ -0,0 +1,103 @@
+"""Punto de entrada del casillero: control sin interfaz y, opcionalmente, el kiosco Tk.
+
+    python daemon.py          solo control (muestreo, histórico, actuadores)
+    python daemon.py --gui    control + interfaz gráfica cargada de forma diferida
+    python daemon.py --api unix:/run/teikit.sock   API JSON local (por defecto 127.0.0.1:8080, 'off' la desactiva)
+    python daemon.py --metrics-file /var/lib/node_exporter/teikit.prom   métricas (también en GET /metrics)
+    python daemon.py --record campo.trace.gz   graba sensores y relés para replay.py
+    python daemon.py --shm teikit   histórico y estado en memoria compartida (por defecto; 'off' la desactiva)
+    python daemon.py --uplink http://colector:9000/ingest   telemetría a un colector, con spool local (ver uplink.py)
+
+Con la memoria compartida y la API activas, la interfaz puede correr en otro proceso
+(`python UI.py`) y reiniciarse sin tocar los relés.
+
+El control arranca antes de importar tkinter/matplotlib/PIL, así el primer muestreo
+no espera a la interfaz. Los tiempos de arranque se informan por la salida estándar.
+"""
+import time
+boot = time.perf_counter()
+
+import argparse
+import os
+import signal
+import sys
+
+import hardware
+import metrics
+from api import API_ENV, DEFAULT_ADDRESS, LockerAPI
+from controller import LockerController, load_config
+from shared import DEFAULT_NAME as SHM_DEFAULT, SHM_ENV
+from traces import RecordingBackend, TraceWriter
+from uplink import UPLINK_ENV, Uplink
+
+
+def elapsed_ms():
+    return (time.perf_counter() - boot) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Controlador del casillero Teikit")
+    parser.add_argument('--gui', action='store_true', help="mostrar la interfaz del kiosco")
+    parser.add_argument('--api', default=os.environ.get(API_ENV, DEFAULT_ADDRESS),
+                        help="dirección de la API JSON: host:puerto, unix:/ruta u 'off'")
+    parser.add_argument('--metrics', action='store_true',
+                        help=f"activar la instrumentación (equivale a {metrics.METRICS_ENV}=on)")
+    parser.add_argument('--metrics-file', help="volcar las métricas en este archivo cada 15 s (implica --metrics)")
+    parser.add_argument('--record', metavar='TRACE', help="grabar lecturas y actuaciones en esta traza (ver replay.py)")
+    parser.add_argument('--shm', default=os.environ.get(SHM_ENV, SHM_DEFAULT),
+                        help="nombre del segmento de memoria compartida para interfaces en otro proceso, u 'off'")
+    parser.add_argument('--uplink', default=os.environ.get(UPLINK_ENV, 'off'),
+                        help="URL del colector de telemetría (http[s]://host:puerto/ruta) u 'off'")
+    args = parser.parse_args(argv)
+    if args.metrics or args.metrics_file:
+        metrics.enable()
+
+    hw = trace = None
+    config = load_config()
+    if args.record:
+        trace = TraceWriter(args.record, config)
+        hw = RecordingBackend(hardware.get_backend(), trace)
+    controller = LockerController(hw=hw, config=config, shm=None if args.shm == 'off' else args.shm)
+    if trace:
+        hw.attach(controller)
+    controller.start()
+    print(f"arranque: control listo en {elapsed_ms():.0f} ms", flush=True)
+
+    # Servicios auxiliares; se paran antes que el controlador
+    services = []
+    if args.metrics_file:
+        services.append(metrics.MetricsFile(controller.render_metrics, args.metrics_file))
+        services[-1].start()
+    if args.api != 'off':
+        services.append(LockerAPI(controller, args.api))
+        services[-1].start()
+        print(f"api: escuchando en {args.api}", flush=True)
+    if args.uplink != 'off':
+        services.append(Uplink(controller, args.uplink, os.path.join(controller.data_dir, 'uplink')))
+        services[-1].start()
+        print(f"uplink: enviando a {args.uplink} ({services[-1].spool.backlog()} registros pendientes)", flush=True)
+
+    try:
+        if args.gui:
+            # Importación diferida: la interfaz es opcional y el muestreo ya está en marcha
+            import UI
+            UI.run(controller, on_ready=lambda: print(f"arranque: interfaz lista en {elapsed_ms():.0f} ms", flush=True))
+        else:
+            signal.signal(signal.SIGTERM, lambda signum, frame: controller.shutdown())
+            controller.sampler.first_sample.wait()
+            print(f"arranque: primera muestra en {elapsed_ms():.0f} ms", flush=True)
+            controller.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for service in services:
+            service.stop(timeout=2)
+        controller.stop()
+        if trace:
+            trace.close()
+            print(f"traza: {trace.records} registros en {args.record}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Driver de sondas DS18B20 sobre w1_therm del kernel.
+
+- Resolución configurable de 9 a 12 bits: la conversión dura de ~94 ms a ~750 ms.
+- Lectura por el atributo `temperature` (kernels recientes, el CRC lo valida el kernel) o,
+  si no existe, por `w1_slave` comprobando la línea de CRC.
+- Conversión simultánea de todas las sondas de un maestro con `therm_bulk_read`: el bus
+  tarda un tiempo de conversión en total y no uno por sonda.
+"""
+import os
+
+import clock
+from metrics import STAGE_SECONDS
+
+RESOLUTIONS = (9, 10, 11, 12)
+DEFAULT_RESOLUTION = 12
+# Valor de reinicio del registro de temperatura: indica que no hubo conversión
+POWER_ON_RESET = 85.0
+
+
+def conversion_time(resolution):
+    """Tiempo máximo de conversión en segundos según la hoja de datos (750 ms a 12 bits)."""
+    return 0.75 / 2 ** (12 - resolution)
+
+
+class CRCError(ValueError):
+    pass
+
+
+def parse_w1_slave(lines):
+    """°C de las dos líneas de w1_slave; CRCError si el kernel marca el CRC como NO."""
+    if len(lines) < 2 or 't=' not in lines[1]:
+        raise ValueError(f"unexpected w1_slave contents: {lines!r}")
+    if not lines[0].strip().endswith('YES'):
+        raise CRCError(lines[0].strip())
+    return int(lines[1].rsplit('t=', 1)[1]) / 1000.0
+
+
+class DS18B20:
+    """Una sonda; `read()` devuelve °C validados o None."""
+
+    def __init__(self, hw, serial, resolution=DEFAULT_RESOLUTION):
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"ds18b20 {serial}: resolution must be one of {RESOLUTIONS}, got {resolution!r}")
+        self.hw = hw
+        self.resolution = resolution
+        self.crc_errors = 0
+        self._point(serial)
+
+    def _point(self, serial):
+        self.serial = serial
+        self.conversion_time = conversion_time(self.resolution)
+        self.temperature_path = self.hw.w1_device_path(serial, 'temperature')
+        self.slave_path = self.hw.w1_device_path(serial, 'w1_slave')
+        self._use_temperature = True
+
+    def rebind(self, serial):
+        """Pasa a leer otra sonda (cambiada en caliente) y le fija la resolución."""
+        self._point(serial)
+        return self.configure()
+
+    def _check_temperature(self):
+        # Solo con la sonda presente se sabe si el kernel tiene `temperature`; sin ella no se cambia
+        if os.path.isdir(os.path.dirname(self.temperature_path)):
+            self._use_temperature = os.path.exists(self.temperature_path)
+
+    def configure(self):
+        """Fija la resolución (atributo `resolution`; en kernels antiguos se escribe en w1_slave)."""
+        self._check_temperature()
+        for attribute in ('resolution', 'w1_slave'):
+            try:
+                self.hw.write_w1(self.hw.w1_device_path(self.serial, attribute), f"{self.resolution}\n")
+                return True
+            except FileNotFoundError:
+                continue
+            except OSError:
+                break
+        print(f"ds18b20 {self.serial}: no se pudo fijar la resolución a {self.resolution} bits, se asumen 12")
+        self.conversion_time = conversion_time(12)
+        return False
+
+    def read(self):
+        try:
+            celsius = self._read()
+        except CRCError:
+            self.crc_errors += 1
+            return None
+        except (OSError, IndexError, ValueError):
+            return None
+        return None if celsius == POWER_ON_RESET else celsius
+
+    def _read(self):
+        if self._use_temperature:
+            try:
+                return int(self.hw.read_w1(self.temperature_path)[0]) / 1000.0
+            except FileNotFoundError:
+                # Sonda desconectada (falta todo el directorio): la lectura falla sin más. Sonda
+                # presente sin `temperature` (configurada sin ella conectada): kernel antiguo
+                self._check_temperature()
+                if self._use_temperature:
+                    raise
+        # Kernel sin el atributo `temperature`: se lee w1_slave y se valida el CRC aquí
+        return parse_w1_slave(self.hw.read_w1(self.slave_path))
+
+
+class DS18B20Bus:
+    """Sondas de un maestro 1-wire. `convert()` lanza una conversión simultánea de todas.
+
+    Tras la conversión masiva, la lectura de cada sonda devuelve el valor ya convertido
+    sin esperar. Sin soporte del kernel (o con una sola sonda) cada lectura convierte por su cuenta.
+    """
+
+    def __init__(self, hw, name):
+        self.hw = hw
+        self.name = name
+        self.probes = []
+        self.bulk = True
+        # Conversiones masivas fallidas (las sondas de ese ciclo convierten por separado)
+        self.convert_errors = 0
+        self.bulk_path = hw.w1_master_path(name, 'therm_bulk_read')
+
+    def add(self, serial, resolution=DEFAULT_RESOLUTION):
+        probe = DS18B20(self.hw, serial, resolution)
+        probe.configure()
+        self.probes.append(probe)
+        return probe
+
+    def convert(self):
+        """Conversión simultánea; True si las lecturas siguientes ya no tienen que esperar."""
+        if not self.bulk or len(self.probes) < 2:
+            return False
+        wait = max(probe.conversion_time for probe in self.probes)
+        try:
+            with STAGE_SECONDS.time('w1_convert'):
+                self.hw.write_w1(self.bulk_path, 'trigger\n')
+                # En el reloj de la lógica: con el bus simulado y un reloj virtual la conversión no espera de verdad
+                start = clock.monotonic()
+                clock.sleep(wait)
+                # -1: alguna sonda sigue convirtiendo (p. ej. alimentación parásita más lenta)
+                while self.hw.read_w1(self.bulk_path)[0].strip() == '-1' and clock.monotonic() - start < 2 * wait:
+                    clock.sleep(0.01)
+        except FileNotFoundError:
+            # Kernel sin therm_bulk_read: cada sonda convierte por su cuenta desde ahora
+            self.bulk = False
+            return False
+        except (OSError, IndexError, ValueError):
+            # Fallo de este ciclo (lectura vacía, bus ocupado): se lee igual, convirtiendo por separado
+            self.convert_errors += 1
+            return False
+        return True
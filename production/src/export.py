@@ -0,0 +1,247 @@
+"""Exportación del histórico en disco por tramos, en CSV o en un formato columnar compacto.
+
+    python export.py --from 2026-10-01 --to 2026-10-08 --lockers casillero-1 --step 300 -o auditoria.csv
+    GET /export?from=...&to=...&format=csv|columnar&lockers=a,b&source=samples&step=300   (api.py)
+
+Tubería de generadores con memoria acotada: el almacén entrega bloques de registros enteros
+(SegmentStore.blocks, por mmap), cada bloque se ve como columnas numpy sin más copias, se reduce
+opcionalmente por intervalos de `step` segundos (medias, y mínimos/máximos en los agregados)
+y se codifica. En memoria hay un bloque por vez, más las filas del intervalo aún abierto con
+`step`, sea cual sea el rango exportado. El daemon sigue escribiendo mientras tanto.
+
+Formato columnar (`read_columnar()` lo lee):
+    TEIKCOL1, longitud (uint32) y cabecera JSON {"source", "step", "columns", "lockers"}
+    por bloque: índice del casillero (uint16), filas (uint32) y cada columna seguida,
+    el tiempo en float64 (epoch) y los valores en float32 (NaN si no hubo lectura)
+"""
+import argparse
+import json
+import os
+import resource
+import struct
+import sys
+import time
+from datetime import datetime
+
+# numpy se importa dentro de las etapas: la API carga este módulo con la primera exportación
+from controller import CHANNELS, DATA_DIR, ROLLUPS, load_config
+from rollups import rollup_columns
+from store import SegmentStore
+
+FORMATS = ('csv', 'columnar')
+SOURCES = ('samples',) + tuple(ROLLUPS)
+CHUNK_RECORDS = 4096
+DEFAULT_RANGE = 86400
+MAGIC = b'TEIKCOL1'
+BLOCK = struct.Struct('<HI')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'columnar': 'application/octet-stream'}
+
+
+def source_columns(source):
+    return ('time',) + CHANNELS if source == 'samples' else rollup_columns(CHANNELS)
+
+
+def record_dtype(columns):
+    import numpy as np
+    # Mismo diseño que los registros del almacén ('<dfff', '<d9f'): tiempo float64, valores float32
+    return np.dtype([('time', '<f8')] + [(name, '<f4') for name in columns[1:]])
+
+
+def parse_time(value):
+    """Epoch o fecha ISO 8601 ('2026-10-01', '2026-10-01T08:00'); sin zona, hora local."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"invalid time {value!r}: use epoch seconds or ISO 8601")
+
+
+class ExportStats:
+    """Filas y bytes producidos, duración y el mayor bloque retenido a la vez (memoria de la tubería)."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.peak_buffer = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def summary(self):
+        rate = self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+        return (f"{self.rows} filas, {self.bytes / 1e6:.1f} MB en {self.seconds:.2f} s "
+                f"({self.rows / max(self.seconds, 1e-9):,.0f} filas/s, {rate:.1f} MB/s), "
+                f"bloque máximo en memoria {self.peak_buffer / 1024:.0f} KiB")
+
+
+# Etapas de la tubería
+def frames(store, source, t0, t1, chunk=CHUNK_RECORDS, stats=None):
+    """Bloques del almacén como arrays estructurados (vistas sobre los bytes leídos)."""
+    import numpy as np
+    dtype = record_dtype(source_columns(source))
+    for block in store.blocks(source, t0, t1, chunk):
+        if stats is not None:
+            stats.peak_buffer = max(stats.peak_buffer, len(block))
+        yield np.frombuffer(block, dtype=dtype)
+
+
+def reduce_frames(frames, step, stats=None):
+    """Un registro por intervalo de `step` s (inicio del intervalo): media de cada canal, mín. de '_min', máx. de '_max'.
+
+    Las filas del último intervalo de cada bloque esperan al siguiente, que puede continuarlo.
+    """
+    import numpy as np
+    carry = None
+    for frame in frames:
+        if carry is not None:
+            frame = np.concatenate((carry, frame))
+        if not len(frame):
+            continue
+        if stats is not None:
+            stats.peak_buffer = max(stats.peak_buffer, frame.nbytes)
+        buckets = frame['time'] // step
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        carry = frame[starts[-1]:]
+        if len(starts) > 1:
+            yield _reduce(frame[:starts[-1]], buckets, starts[:-1], step)
+    if carry is not None and len(carry):
+        yield _reduce(carry, carry['time'] // step, np.array([0]), step)
+
+
+def _reduce(frame, buckets, starts, step):
+    import numpy as np
+    out = np.empty(len(starts), dtype=frame.dtype)
+    out['time'] = buckets[starts] * step
+    for name in frame.dtype.names[1:]:
+        values = frame[name]
+        if name.endswith('_min'):
+            out[name] = np.fmin.reduceat(values, starts)
+        elif name.endswith('_max'):
+            out[name] = np.fmax.reduceat(values, starts)
+        else:
+            finite = ~np.isnan(values)
+            counts = np.add.reduceat(finite.astype(np.int64), starts)
+            sums = np.add.reduceat(np.where(finite, values, 0.0), starts, dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[name] = np.where(counts > 0, sums / counts, np.nan)
+    return out
+
+
+def encode_csv(frame, unit_id):
+    """Líneas CSV del bloque: casillero, hora local ISO 8601 con zona, epoch y valores con 2 decimales."""
+    times = frame['time'].tolist()
+    columns = [[f"{unit_id},{time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(t))},{t:.1f}" for t in times]]
+    for name in frame.dtype.names[1:]:
+        columns.append(['' if v != v else f"{v:.2f}" for v in frame[name].tolist()])
+    return ''.join(','.join(row) + '\n' for row in zip(*columns)).encode()
+
+
+def encode_columnar(frame, index):
+    return BLOCK.pack(index, len(frame)) + b''.join(frame[name].tobytes() for name in frame.dtype.names)
+
+
+def export(stores, t0, t1, fmt='csv', source='samples', step=None, chunk=CHUNK_RECORDS, stats=None):
+    """Genera el tramo [t0, t1] de cada casillero ((id, SegmentStore), en orden) ya codificado, en trozos de bytes."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}, got {fmt!r}")
+    if source not in SOURCES:
+        raise ValueError(f"source must be one of {', '.join(SOURCES)}, got {source!r}")
+    if step is not None and not step > 0:
+        raise ValueError(f"step must be a positive number of seconds, got {step!r}")
+    if t1 < t0:
+        raise ValueError("the end of the range is before its start")
+    stats = stats or ExportStats()
+    columns = source_columns(source)
+    stores = list(stores)
+    return _export(stores, t0, t1, fmt, source, step, chunk, stats, columns)
+
+
+def _export(stores, t0, t1, fmt, source, step, chunk, stats, columns):
+    if fmt == 'csv':
+        header = (','.join(('locker', 'time', 'epoch') + columns[1:]) + '\n').encode()
+    else:
+        layout = json.dumps({'source': source, 'step': step, 'columns': list(columns),
+                             'lockers': [unit_id for unit_id, _ in stores]}).encode()
+        header = MAGIC + struct.pack('<I', len(layout)) + layout
+    yield _count(stats, header)
+    for index, (unit_id, store) in enumerate(stores):
+        blocks = frames(store, source, t0, t1, chunk, stats)
+        if step:
+            blocks = reduce_frames(blocks, step, stats)
+        for frame in blocks:
+            if not len(frame):
+                continue
+            stats.rows += len(frame)
+            yield _count(stats, encode_csv(frame, unit_id) if fmt == 'csv' else encode_columnar(frame, index))
+    stats.finish()
+
+
+def _count(stats, data):
+    stats.bytes += len(data)
+    return data
+
+
+def read_columnar(f):
+    """Lee un archivo columnar: devuelve la cabecera y un generador de (casillero, {columna: array})."""
+    import numpy as np
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a teikit columnar export")
+    length, = struct.unpack('<I', f.read(4))
+    header = json.loads(f.read(length))
+    dtypes = [np.dtype('<f8')] + [np.dtype('<f4')] * (len(header['columns']) - 1)
+
+    def blocks():
+        while True:
+            raw = f.read(BLOCK.size)
+            if len(raw) < BLOCK.size:
+                return
+            index, rows = BLOCK.unpack(raw)
+            yield header['lockers'][index], {name: np.frombuffer(f.read(rows * dtype.itemsize), dtype=dtype)
+                                             for name, dtype in zip(header['columns'], dtypes)}
+    return header, blocks()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el histórico de los casilleros sin parar el control")
+    parser.add_argument('--from', dest='start', help="inicio: epoch o ISO 8601 (por defecto, 24 h antes del final)")
+    parser.add_argument('--to', dest='end', help="final: epoch o ISO 8601 (por defecto, ahora)")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--source', choices=SOURCES, default='samples', help="muestras crudas o agregados en disco")
+    parser.add_argument('--step', type=float, help="reducir a un registro cada STEP segundos")
+    parser.add_argument('--lockers', help="ids separados por comas (por defecto, todos los de lockers.json)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('-o', '--output', help="archivo de salida (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    end = parse_time(args.end) if args.end else time.time()
+    start = parse_time(args.start) if args.start else end - DEFAULT_RANGE
+    ids = [unit['id'] for unit in load_config()['lockers']]
+    if args.lockers:
+        wanted = args.lockers.split(',')
+        unknown = set(wanted) - set(ids)
+        if unknown:
+            parser.error(f"unknown lockers: {', '.join(sorted(unknown))}")
+        ids = wanted
+    # Lo que el daemon aún no ha volcado a disco (hasta un minuto) no sale por aquí; sí por GET /export
+    stores = [(unit_id, SegmentStore(os.path.join(args.data_dir, unit_id))) for unit_id in ids]
+    stats = ExportStats()
+    chunks = export(stores, start, end, args.format, args.source, args.step, stats=stats)
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for data in chunks:
+            out.write(data)
+    finally:
+        if args.output:
+            out.close()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"export: {stats.summary()}, memoria máxima del proceso {peak:.0f} MiB", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
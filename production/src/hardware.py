@@ -0,0 +1,390 @@
+"""Capa de abstracción de hardware: backend real (Raspberry Pi) o simulado.
+
+El backend se elige con la variable de entorno TEIKIT_HW (`real` por defecto, `sim`
+para ejecutar sin Raspberry Pi). Ambos exponen la misma interfaz:
+
+    hw.GPIO                 módulo (o imitación) compatible con RPi.GPIO
+    hw.bind_unit(config)    declara los sensores y relés de un casillero (lockers.json)
+    hw.dht22('D5')          sensor con propiedades humidity / temperature
+    hw.w1_device_path(serie, atributo)  ruta de un atributo de w1_therm (w1_slave, temperature, resolution)
+    hw.w1_master_path(bus, atributo)    ruta de un atributo del maestro 1-wire (therm_bulk_read)
+    hw.w1_slave_path(serie) ruta del archivo w1_slave de una sonda DS18B20
+    hw.read_w1(ruta)        líneas del atributo (w1_slave y temperature bloquean durante la conversión)
+    hw.write_w1(ruta, txt)  escribe en un atributo (resolución, 'trigger' de conversión masiva)
+"""
+import atexit
+import errno
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+
+import clock
+
+BACKEND_ENV = 'TEIKIT_HW'
+W1_DEVICES_DIR = '/sys/bus/w1/devices'
+# Esclavos 1-wire: familia y 48 bits de serie ('28-3de10457e49d'); los maestros son 'w1_bus_master*'
+W1_SERIAL = re.compile(r'^[0-9a-f]{2}-[0-9a-f]{12}$')
+
+
+def list_w1_devices(w1_dir):
+    """Números de serie de los esclavos presentes en el directorio de dispositivos 1-wire."""
+    try:
+        return sorted(name for name in os.listdir(w1_dir) if W1_SERIAL.match(name))
+    except FileNotFoundError:
+        # Sin w1-gpio cargado (dtoverlay=w1-gpio en config.txt) no existe el directorio
+        return []
+
+
+class RealBackend:
+    name = 'real'
+
+    def __init__(self):
+        # Importaciones diferidas: solo existen en la Raspberry Pi
+        import RPi.GPIO as GPIO
+        import adafruit_dht
+        import board
+        self.GPIO = GPIO
+        self._adafruit_dht = adafruit_dht
+        self._board = board
+        self.w1_dir = W1_DEVICES_DIR
+
+    def bind_unit(self, config):
+        pass
+
+    def dht22(self, pin):
+        return self._adafruit_dht.DHT22(getattr(self._board, pin))
+
+    def w1_device_path(self, serial, attribute):
+        return os.path.join(self.w1_dir, serial, attribute)
+
+    def w1_master_path(self, bus, attribute):
+        return os.path.join(self.w1_dir, bus, attribute)
+
+    def w1_slave_path(self, serial):
+        return self.w1_device_path(serial, 'w1_slave')
+
+    def w1_devices(self):
+        return list_w1_devices(self.w1_dir)
+
+    def read_w1(self, path):
+        with open(path, 'r') as f:
+            return f.readlines()
+
+    def write_w1(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+# Backend simulado
+class FakeGPIO:
+    """Banco de pines en memoria con la API de RPi.GPIO que usa el proyecto."""
+
+    BCM, BOARD = 11, 10
+    OUT, IN = 0, 1
+    LOW, HIGH = 0, 1
+
+    def __init__(self):
+        self.mode = None
+        self.pins = {}
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, channel, direction, initial=None):
+        with self._lock:
+            for pin in self._channels(channel):
+                self.pins[pin] = self.LOW if initial is None else initial
+
+    def output(self, channel, state):
+        with self._lock:
+            for pin in self._channels(channel):
+                if pin not in self.pins:
+                    raise RuntimeError("The GPIO channel has not been set up as an OUTPUT")
+                self.pins[pin] = state
+                self.writes += 1
+
+    def input(self, channel):
+        with self._lock:
+            if channel not in self.pins:
+                raise RuntimeError("You must setup() the GPIO channel first")
+            return self.pins[channel]
+
+    def cleanup(self, channel=None):
+        with self._lock:
+            if channel is None:
+                self.pins.clear()
+            else:
+                for pin in self._channels(channel):
+                    self.pins.pop(pin, None)
+
+    @staticmethod
+    def _channels(channel):
+        return channel if isinstance(channel, (list, tuple)) else [channel]
+
+
+class SimPlant:
+    """Modelo térmico sencillo del casillero: el pad calienta si su relé (activo en LOW) está encendido."""
+
+    def __init__(self, gpio, pad_pin=27, fan_pin=22, ambient=22.0, humidity=55.0, seed=None):
+        self.gpio = gpio
+        self.pad_pin = pad_pin
+        self.fan_pin = fan_pin
+        self.room = ambient
+        self.ambient = ambient
+        self.humidity = humidity
+        self.pad = ambient
+        self.rng = random.Random(seed)
+        # Reloj de la lógica: con uno virtual (replay, bench_loop) la planta evoluciona en tiempo simulado
+        self._last = clock.monotonic()
+        self._lock = threading.Lock()
+
+    def _relay_on(self, pin):
+        return self.gpio.pins.get(pin, self.gpio.HIGH) == self.gpio.LOW
+
+    def step(self):
+        with self._lock:
+            now = clock.monotonic()
+            dt, self._last = now - self._last, now
+            target = 55.0 if self._relay_on(self.pad_pin) else self.ambient
+            self.pad += (target - self.pad) * (1 - math.exp(-dt / 120.0))
+            cooling = 0.5 if self._relay_on(self.fan_pin) else 0.0
+            self.ambient += ((self.room - self.ambient) * dt / 900.0 + (self.pad - self.ambient) * dt / 3000.0
+                             - cooling * dt / 600.0 + self.rng.gauss(0, 0.02))
+            self.humidity = min(100.0, max(0.0, self.humidity + self.rng.gauss(0, 0.1)))
+            return self.humidity, self.ambient, self.pad
+
+
+class SimDHT22:
+    """DHT22 simulado: latencia de lectura, RuntimeError aleatorio y caché de 2 s como adafruit_dht."""
+
+    def __init__(self, plant, error_rate=0.1, latency=0.25, seed=None):
+        self.plant = plant
+        self.error_rate = error_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self._last_read = None
+        self._values = (None, None)
+
+    def measure(self):
+        now = clock.monotonic()
+        if self._last_read is not None and now - self._last_read < 2.0:
+            return
+        self._last_read = now
+        clock.sleep(self.latency)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        humidity, ambient, _ = self.plant.step()
+        self._values = (round(humidity, 1), round(ambient, 1))
+
+    @property
+    def humidity(self):
+        self.measure()
+        return self._values[0]
+
+    @property
+    def temperature(self):
+        self.measure()
+        return self._values[1]
+
+    def exit(self):
+        pass
+
+
+class FakeW1Bus:
+    """Árbol sysfs de w1_therm falso en un directorio temporal.
+
+    Imita lo que usa el driver: `w1_slave` y `temperature` (la lectura convierte y bloquea
+    el bus), `resolution` (9-12 bits; la conversión dura 2**(bits-12) veces la de 12 bits)
+    y `therm_bulk_read` del maestro ('trigger' convierte todas las sondas del bus a la vez).
+    Las conversiones duran en el reloj de la lógica (clock), como la planta. Sin `root`, el
+    directorio temporal se borra con close() o al salir.
+    """
+
+    def __init__(self, plant, conversion_delay=0.75, crc_error_rate=0.0, root=None, seed=None):
+        self.plant = plant
+        self.plants = {}
+        self.buses = {}
+        self.conversion_delay = conversion_delay
+        self.crc_error_rate = crc_error_rate
+        self.rng = random.Random(seed)
+        self._own_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix='teikit-w1-')
+        if self._own_root:
+            atexit.register(self.close)
+        self.resolution = {}
+        # Por maestro: fin de la conversión masiva en curso y valores ya convertidos por sonda
+        self._bulk_until = {}
+        self._converted = {}
+        # Cada maestro 1-wire atiende una sonda a la vez
+        self._bus_locks = {}
+        self._lock = threading.Lock()
+
+    def attach(self, serial, plant, bus='w1_bus_master1'):
+        self.plants[serial] = plant
+        self.buses[serial] = bus
+
+    def _bus(self, serial):
+        return self.buses.get(serial, 'w1_bus_master1')
+
+    def _bus_lock(self, bus):
+        with self._lock:
+            return self._bus_locks.setdefault(bus, threading.Lock())
+
+    def add_device(self, serial):
+        device_dir = os.path.join(self.root, serial)
+        os.makedirs(device_dir, exist_ok=True)
+        master_dir = os.path.join(self.root, self._bus(serial))
+        os.makedirs(master_dir, exist_ok=True)
+        for path in (os.path.join(device_dir, name) for name in ('w1_slave', 'temperature', 'resolution')):
+            open(path, 'a').close()
+        open(os.path.join(master_dir, 'therm_bulk_read'), 'a').close()
+        return device_dir
+
+    def close(self):
+        if self._own_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+            atexit.unregister(self.close)
+            self._own_root = False
+
+    def remove_device(self, serial):
+        """Desconecta la sonda: su directorio desaparece y sus lecturas dan FileNotFoundError."""
+        shutil.rmtree(os.path.join(self.root, serial), ignore_errors=True)
+
+    def _conversion(self, serial):
+        return self.conversion_delay * 2 ** (self.resolution.get(serial, 12) - 12)
+
+    def _convert(self, serial):
+        """°C que la sonda entrega tras convertir, redondeados a su resolución."""
+        _, _, pad = self.plants.get(serial, self.plant).step()
+        step = 0.0625 * 2 ** (12 - self.resolution.get(serial, 12))
+        return round(pad / step) * step
+
+    def read(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        name = os.path.basename(path)
+        node = os.path.basename(os.path.dirname(path))
+        if name == 'therm_bulk_read':
+            with self._lock:
+                if clock.monotonic() < self._bulk_until.get(node, 0.0):
+                    return ['-1\n']
+                return ['1\n' if self._converted.get(node) else '0\n']
+        if name == 'resolution':
+            return [f"{self.resolution.get(node, 12)}\n"]
+        bus = self._bus(node)
+        with self._bus_lock(bus):
+            with self._lock:
+                converted = self._converted.get(bus, {}).pop(node, None)
+                remaining = self._bulk_until.get(bus, 0.0) - clock.monotonic()
+            if converted is None:
+                # El kernel bloquea la lectura mientras dura la conversión de la sonda
+                clock.sleep(self._conversion(node))
+                converted = self._convert(node)
+            elif remaining > 0:
+                clock.sleep(remaining)
+        crc_ok = self.rng.random() >= self.crc_error_rate
+        if name == 'temperature':
+            if not crc_ok:
+                raise OSError(errno.EIO, "CRC check failed", path)
+            return [f"{int(round(converted * 1000))}\n"]
+        raw = int(round(converted * 16)) & 0xFFFF
+        config = 0x1F | (self.resolution.get(node, 12) - 9) << 5
+        scratchpad = f"{raw & 0xFF:02x} {raw >> 8:02x} 4b 46 {config:02x} ff 0c 10 1c"
+        return [f"{scratchpad} : crc=1c {'YES' if crc_ok else 'NO'}\n",
+                f"{scratchpad} t={int(round(converted * 1000))}\n"]
+
+    def write(self, path, text):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        name = os.path.basename(path)
+        node = os.path.basename(os.path.dirname(path))
+        value = text.strip()
+        if name in ('resolution', 'w1_slave') and value in ('9', '10', '11', '12'):
+            self.resolution[node] = int(value)
+        elif name == 'therm_bulk_read' and value == 'trigger':
+            # No bloquea: las sondas del maestro convierten en paralelo
+            serials = [serial for serial, bus in self.buses.items() if bus == node]
+            values = {serial: self._convert(serial) for serial in serials}
+            with self._lock:
+                self._converted[node] = values
+                self._bulk_until[node] = clock.monotonic() + max(map(self._conversion, serials), default=0.0)
+        else:
+            raise OSError(errno.EINVAL, "Invalid argument", path)
+
+
+class SimBackend:
+    name = 'sim'
+
+    def __init__(self, dht_error_rate=0.1, dht_latency=0.25, w1_conversion_delay=0.75, w1_crc_error_rate=0.0, seed=None,
+                 w1_root=None):
+        self.GPIO = FakeGPIO()
+        self.plant = SimPlant(self.GPIO, seed=seed)
+        self.dht_error_rate = dht_error_rate
+        self.dht_latency = dht_latency
+        self.seed = seed
+        self.w1 = FakeW1Bus(self.plant, conversion_delay=w1_conversion_delay, crc_error_rate=w1_crc_error_rate,
+                            root=w1_root, seed=seed)
+        self.w1_dir = self.w1.root
+        self._dht_plants = {}
+
+    def bind_unit(self, config):
+        # Cada casillero simulado tiene su propia planta térmica, ligada a sus relés
+        plant = SimPlant(self.GPIO, pad_pin=config['pad_pin'], fan_pin=config['fan_pin'], seed=self.seed)
+        self._dht_plants[config['dht22']] = plant
+        self.w1.attach(config['ds18b20'], plant, config.get('w1_bus', 'w1_bus_master1'))
+        self.w1.add_device(config['ds18b20'])
+
+    def dht22(self, pin):
+        plant = self._dht_plants.get(pin, self.plant)
+        return SimDHT22(plant, self.dht_error_rate, self.dht_latency, self.seed)
+
+    def w1_device_path(self, serial, attribute):
+        # Solo la ruta, como en RealBackend: las sondas se conectan con self.w1.add_device()
+        return os.path.join(self.w1_dir, serial, attribute)
+
+    def w1_master_path(self, bus, attribute):
+        return os.path.join(self.w1_dir, bus, attribute)
+
+    def w1_slave_path(self, serial):
+        return self.w1_device_path(serial, 'w1_slave')
+
+    def w1_devices(self):
+        return list_w1_devices(self.w1_dir)
+
+    def read_w1(self, path):
+        return self.w1.read(path)
+
+    def write_w1(self, path, text):
+        self.w1.write(path, text)
+
+    def close(self):
+        self.w1.close()
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return default if value in (None, '') else float(value)
+
+
+def get_backend(name=None):
+    """Crea el backend indicado o el de TEIKIT_HW; el simulado se ajusta con TEIKIT_SIM_*."""
+    name = name or os.environ.get(BACKEND_ENV, 'real')
+    if name == 'real':
+        return RealBackend()
+    if name == 'sim':
+        seed = os.environ.get('TEIKIT_SIM_SEED')
+        return SimBackend(dht_error_rate=_env_float('TEIKIT_SIM_DHT_ERROR_RATE', 0.1),
+                          dht_latency=_env_float('TEIKIT_SIM_DHT_LATENCY', 0.25),
+                          w1_conversion_delay=_env_float('TEIKIT_SIM_W1_DELAY', 0.75),
+                          w1_crc_error_rate=_env_float('TEIKIT_SIM_W1_CRC_ERROR_RATE', 0.0),
+                          seed=None if seed is None else int(seed))
+    raise ValueError(f"unknown hardware backend: {name!r} (expected 'real' or 'sim')")
@@ -0,0 +1,50 @@
+"""Largest-Triangle-Three-Buckets: reduce una serie a `threshold` puntos conservando su forma.
+
+El coste de dibujar queda acotado por el ancho en píxeles y no por la cantidad de datos.
+numpy se importa al reducir la primera serie: el daemon sin interfaz arranca sin él.
+"""
+
+
+def lttb_indices(x, y, threshold):
+    """Índices de los puntos elegidos (primero y último incluidos); x creciente, y sin NaN."""
+    import numpy as np
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # Cubos [bounds[i], bounds[i + 1]) para los threshold - 2 puntos interiores
+    bounds = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.intp) + 1
+    bounds[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = bounds[i], bounds[i + 1]
+        # Vértice C: media del cubo siguiente (el último punto para el último cubo)
+        next_lo, next_hi = (hi, bounds[i + 2]) if i + 2 < threshold - 1 else (n - 1, n)
+        cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x, y, threshold):
+    """(x, y) reducidos con LTTB; los huecos (NaN) se conservan como un NaN entre los puntos que separan."""
+    import numpy as np
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= threshold:
+        return x, y
+    finite = np.isfinite(y)
+    if finite.all():
+        keep = lttb_indices(x, y, threshold)
+        return x[keep], y[keep]
+    positions = np.flatnonzero(finite)
+    if not len(positions):
+        return x[:0], y[:0]
+    keep = positions[lttb_indices(x[positions], y[positions], threshold)]
+    # Número de NaN acumulados: si cambia entre dos puntos elegidos, había un hueco entre ellos
+    gaps_seen = np.cumsum(~finite)[keep]
+    gaps = np.flatnonzero(gaps_seen[1:] != gaps_seen[:-1]) + 1
+    return np.insert(x[keep], gaps, x[keep][gaps - 1]), np.insert(y[keep], gaps, np.nan)
@@ -0,0 +1,236 @@
+"""Métricas internas del casillero en formato de texto de Prometheus.
+
+Desactivadas por defecto: se encienden con TEIKIT_METRICS=on o `enable()`. Apagadas,
+`observe()` retorna al instante y `time()` devuelve un contexto vacío, así los puntos
+de medida pueden quedarse en el camino caliente. Los contadores que ya existen en los
+objetos (lecturas, errores, fallos de relé) se exportan con callbacks que solo se
+evalúan al generar el texto, sin coste en cada lectura.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+METRICS_ENV = 'TEIKIT_METRICS'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Límites (s) de los histogramas de latencia: de 100 µs a 10 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get(METRICS_ENV, 'off').lower() in ('1', 'on', 'true', 'yes')
+_NULL = nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        if any(m.name == metric.name for m in self.metrics):
+            raise ValueError(f"duplicate metric {metric.name!r}")
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.lines())
+        return '\n'.join(lines) + '\n'
+
+
+# Métricas del camino caliente; los módulos las importan de aquí
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name, help, labels=(), callback=None, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        # callback() -> iterable de (valores de etiquetas, valor); se evalúa al exportar
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def lines(self):
+        if self.callback:
+            items = self.callback()
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def set(self, value, *labels):
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[labels] = value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos; `observe(valor, *etiquetas)` o `with h.time(*etiquetas):`."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        super().__init__(name, help, labels, registry=registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not _enabled:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [cuenta por bucket..., +Inf], suma
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels) if _enabled else _NULL
+
+    def lines(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def resident_memory_bytes():
+    """RSS actual del proceso (Linux, /proc/self/statm); None si no está disponible."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+STAGE_SECONDS = Histogram('teikit_stage_duration_seconds',
+                          "Duración de cada etapa del camino caliente.", ('stage',))
+LOOP_PERIOD = Histogram('teikit_loop_period_seconds',
+                        "Periodo real entre iteraciones de cada bucle.", ('loop',))
+LOOP_LATENESS = Histogram('teikit_loop_lateness_seconds',
+                          "Retraso de cada tick respecto a su plazo teórico.", ('loop',))
+COMMAND_LATENCY = Histogram('teikit_actuator_command_latency_seconds',
+                            "Desde que se encola una orden de relé hasta que se escribe GPIO (con la espera "
+                            "por permanencia mínima).", ('source',))
+Gauge('teikit_process_resident_memory_bytes', "Memoria residente del proceso.",
+      callback=lambda: [((), rss) for rss in (resident_memory_bytes(),) if rss is not None])
+
+
+class LoopTimer:
+    """Mide el periodo real de un bucle: llamar a `tick()` al principio de cada iteración."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self._last = None
+
+    def tick(self):
+        if not _enabled:
+            self._last = None
+            return
+        now = time.perf_counter()
+        if self._last is not None:
+            LOOP_PERIOD.observe(now - self._last, self.loop)
+        self._last = now
+
+
+class MetricsFile(threading.Thread):
+    """Vuelca `render()` a un archivo cada `interval` s (p. ej. para el textfile collector de node_exporter).
+
+    La escritura es atómica (archivo temporal + rename), el lector nunca ve un volcado a medias.
+    """
+
+    def __init__(self, render, path, interval=15.0):
+        super().__init__(name='metrics-file', daemon=True)
+        self.render = render
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            self.write()
+            if self._stop_event.wait(self.interval):
+                return
+
+    def write(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
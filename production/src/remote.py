@@ -0,0 +1,316 @@
+"""Controlador remoto para la interfaz en su propio proceso.
+
+Ofrece a UI.run() lo mismo que LockerController (unidades, poll, órdenes) sin tocar GPIO
+ni sensores: el histórico y el estado se leen de la memoria compartida que publica el
+daemon (shared.py) y las órdenes van por la API local. Si la interfaz se cuelga o se
+reinicia, el daemon y los relés siguen igual.
+"""
+import http.client
+import json
+import math
+import os
+import queue
+import socket
+import threading
+import time
+
+import clock
+from actuators import ActuatorEvent
+from api import API_ENV, DEFAULT_ADDRESS, JSON_TYPE
+from controller import ROLLUPS, LockerUnit
+from sampler import Sample
+from shared import DEFAULT_NAME, SHM_ENV, SharedReader
+
+# Segundos sin latido del daemon antes de intentar reabrir la memoria compartida
+STALE_AFTER = 10.0
+REATTACH_INTERVAL = 5.0
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class APIClient:
+    """Cliente mínimo de la API local (TCP o socket Unix); una conexión por orden.
+
+    post() bloquea hasta la respuesta. send() la encola para el hilo 'api-client' y vuelve
+    al momento: la interfaz no se congela aunque el daemon tarde (espera de la orden, daemon
+    atascado). Los resultados se entregan, en orden, en el hilo que llama a deliver().
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=2.0):
+        self.address = address
+        self.timeout = timeout
+        self._outbox = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        self._sender = None
+
+    def _connection(self):
+        if self.address.startswith('unix:'):
+            return _UnixHTTPConnection(self.address[len('unix:'):], self.timeout)
+        host, _, port = self.address.rpartition(':')
+        return http.client.HTTPConnection(host or '127.0.0.1', int(port), timeout=self.timeout)
+
+    def post(self, path, payload):
+        connection = self._connection()
+        try:
+            connection.request('POST', path, body=json.dumps(payload), headers={'Content-Type': JSON_TYPE})
+            response = connection.getresponse()
+            body = response.read()
+        finally:
+            connection.close()
+        if response.status == 400:
+            raise ValueError(json.loads(body).get('error', 'bad request'))
+        if response.status != 200:
+            try:
+                error = json.loads(body)['error']
+            except (ValueError, KeyError, TypeError):
+                error = f"HTTP {response.status}"
+            raise OSError(f"{path}: {error}")
+        return json.loads(body)
+
+    def send(self, path, payload, on_result=None, on_error=None):
+        """Encola el POST y vuelve; deliver() llamará a on_result(respuesta) u on_error(excepción)."""
+        if self._sender is None:
+            self._sender = threading.Thread(target=self._run, name='api-client', daemon=True)
+            self._sender.start()
+        self._outbox.put((path, payload, on_result, on_error))
+
+    def _run(self):
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                return
+            path, payload, on_result, on_error = item
+            try:
+                result = (on_result, self.post(path, payload))
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                result = (on_error, e)
+            self._results.put(result)
+
+    def deliver(self):
+        """Llama a los callbacks de los POST terminados (desde el hilo de la interfaz); nunca bloquea."""
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if callback is not None:
+                callback(value)
+
+    def close(self, timeout=None):
+        if self._sender is not None:
+            self._outbox.put(None)
+            self._sender.join(timeout)
+
+
+class RemoteActuators:
+    """Estados de los relés según la instantánea; avisa a los suscriptores de cada cambio."""
+
+    def __init__(self, unit_id):
+        self.unit_id = unit_id
+        self._states = {}
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def states(self):
+        return dict(self._states)
+
+    def update(self, states):
+        for name, state in states.items():
+            if self._states.get(name) != state:
+                self._states[name] = state
+                # Sin pin ni nivel: la interfaz solo usa casillero, relé y estado
+                event = ActuatorEvent(clock.time(), self.unit_id, name, None, None, state, None)
+                for callback in list(self._subscribers):
+                    callback(event)
+
+
+class RemoteThermostat:
+    def __init__(self, unit):
+        self.unit = unit
+        self.fault = None
+        self._auto = False
+
+    def update(self, state):
+        self.fault = state['fault']
+        self._auto = state['auto']
+
+    @property
+    def auto(self):
+        return self._auto
+
+    @auto.setter
+    def auto(self, value):
+        # No bloquea: el modo cambia con la respuesta o con la siguiente instantánea
+        self.unit.client.send(f"/lockers/{self.unit.id}/thermostat", {'auto': bool(value)}, self.unit.apply,
+                              lambda e: print(f"{self.unit.id}: no se pudo cambiar el modo automático: {e}"))
+
+
+class RemoteUnit:
+    """Casillero visto desde la interfaz: histórico compartido (sin copias) y estado de la instantánea."""
+
+    # Mismas ventanas y reducción LTTB que en el daemon; solo cambia de dónde salen los buffers
+    history_window = LockerUnit.history_window
+    history_latest = LockerUnit.history_latest
+    series = LockerUnit.series
+
+    def __init__(self, unit_id, reader, client):
+        self.id = unit_id
+        self.client = client
+        self.actuators = RemoteActuators(unit_id)
+        self.thermostat = RemoteThermostat(self)
+        self.alarms = ()
+        self._forecast = None
+        self.history = None
+        self.rollups = {}
+        self.attach(reader)
+
+    def attach(self, reader):
+        """Abre (o reabre, tras reiniciarse el daemon) los buffers compartidos del casillero."""
+        history = reader.series(self.id, 'raw')
+        rollups = {name: reader.series(self.id, name) for name in ROLLUPS}
+        if self.history is not None:
+            self.close()
+        self.start_time = reader.boot
+        self.history = history
+        self.rollups = rollups
+        self._series_cache = (None, None)
+        # Las filas que ya había se cargan como histórico, no como muestras nuevas
+        self._seen = self.history.refresh()
+
+    def close(self):
+        self._series_cache = (None, None)
+        for buffer in (self.history, *self.rollups.values()):
+            buffer.close()
+
+    def _buffer(self, source):
+        buffer = self.history if source == 'raw' else self.rollups[source]
+        buffer.refresh()
+        return buffer
+
+    def poll(self):
+        """Muestras escritas por el daemon desde la última llamada."""
+        written = self.history.refresh()
+        new = min(written - self._seen, len(self.history))
+        self._seen = written
+        if new <= 0:
+            return []
+        size = len(self.history)
+        times, *channels = self.history.slice(size - new, size)
+        return [Sample(self.start_time + t, *(None if math.isnan(v) else v for v in values), self.id)
+                for t, *values in zip(times, *channels)]
+
+    def apply(self, state):
+        """Aplica la instantánea del casillero (de la memoria compartida o de la respuesta de la API)."""
+        self.actuators.update(state['actuators'])
+        self.thermostat.update(state['thermostat'])
+        self.alarms = tuple(state.get('alarms', ()))
+        self._forecast = state.get('forecast')
+
+    def forecast(self):
+        return self._forecast
+
+    def command(self, name, state, source='ui', seconds=None, every=None):
+        """Encola la orden para el daemon y vuelve, como LockerUnit.command (aquí sin Command que esperar).
+
+        Los relés cambian con la respuesta (RemoteController.poll) o con la siguiente instantánea.
+        """
+        request = {'state': state, 'source': source}
+        request.update((key, value) for key, value in (('seconds', seconds), ('every', every)) if value)
+        self.client.send(f"/lockers/{self.id}/{name}", request, self.apply,
+                         lambda e: print(f"{self.id}: orden {name}={state} no aplicada por el daemon: {e}"))
+
+
+class RemoteController:
+    """Sustituto de LockerController para UI.run() en un proceso aparte."""
+
+    def __init__(self, shm=DEFAULT_NAME, api=DEFAULT_ADDRESS):
+        self.shm = shm
+        self.client = APIClient(api)
+        self.reader = SharedReader(shm)
+        state = self._wait_state()
+        self.units = [RemoteUnit(locker['id'], self.reader, self.client) for locker in state['lockers']]
+        self.units_by_id = {unit.id: unit for unit in self.units}
+        self._apply(state)
+        self._stale = False
+        self._last_attempt = 0.0
+
+    def _wait_state(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.reader.state()
+            if state is not None:
+                return state
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{self.shm}: the daemon has not published any state")
+            time.sleep(0.1)
+
+    def unit(self, unit_id):
+        return self.units_by_id[unit_id]
+
+    def _apply(self, state):
+        for locker in state['lockers']:
+            unit = self.units_by_id.get(locker['id'])
+            if unit is not None:
+                unit.apply(locker)
+
+    def poll(self):
+        """Muestras nuevas de todos los casilleros y estado actualizado; nunca bloquea."""
+        self._check_daemon()
+        samples = [sample for unit in self.units for sample in unit.poll()]
+        state = self.reader.state()
+        if state is not None:
+            self._apply(state)
+        # Respuestas de las órdenes enviadas: en este hilo (el de Tk), después de la instantánea
+        self.client.deliver()
+        return samples
+
+    def _check_daemon(self):
+        # Un daemon reiniciado crea segmentos nuevos con el mismo nombre; los viejos dejan de latir
+        if time.time() - self.reader.heartbeat() < STALE_AFTER:
+            if self._stale:
+                print("shm: el daemon vuelve a publicar")
+                self._stale = False
+            return
+        if not self._stale:
+            print(f"shm: sin latido del daemon desde hace más de {STALE_AFTER:.0f} s")
+            self._stale = True
+        if time.monotonic() - self._last_attempt < REATTACH_INTERVAL:
+            return
+        self._last_attempt = time.monotonic()
+        try:
+            reader = SharedReader(self.shm)
+            if reader.boot == self.reader.boot:
+                reader.close()
+                return
+            for unit in self.units:
+                unit.attach(reader)
+        except (OSError, ValueError):
+            return
+        self.reader.close()
+        self.reader = reader
+        print("shm: reconectado a un daemon nuevo")
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.client.close(timeout=self.client.timeout)
+        for unit in self.units:
+            unit.close()
+        self.reader.close()
+
+
+def connect(shm=None, api=None):
+    """RemoteController con los valores de TEIKIT_SHM / TEIKIT_API por defecto."""
+    return RemoteController(shm or os.environ.get(SHM_ENV, DEFAULT_NAME), api or os.environ.get(API_ENV, DEFAULT_ADDRESS))
@@ -0,0 +1,68 @@
+import clock
+
+
+class RenderScheduler:
+    """Planifica el redibujado del gráfico con independencia del muestreo.
+
+    `invalidate()` solo marca que hay datos nuevos: el dibujo se hace como mucho a `max_fps`
+    y varias invalidaciones seguidas se agrupan en un único fotograma. Con la ventana oculta
+    o sin actividad del usuario durante `idle_after` segundos no se dibuja nada; al volver
+    se dibuja un solo fotograma con el estado actual, no los que se saltaron.
+
+    `after(ms, callback)` programa una llamada en el bucle de la interfaz (root.after en Tk)
+    e `idle_seconds()` devuelve los segundos desde la última entrada del usuario.
+    """
+
+    def __init__(self, render, after, idle_seconds=None, max_fps=2.0, idle_after=300.0, poll_interval=1.0):
+        self.render = render
+        self.after = after
+        self.idle_seconds = idle_seconds
+        self.min_interval = 1.0 / max_fps
+        self.idle_after = idle_after
+        self.poll_ms = int(poll_interval * 1000)
+        self.visible = True
+        self.dirty = False
+        self.frames = 0
+        self.invalidations = 0
+        self._pending = False
+        self._last_frame = float('-inf')
+
+    def start(self):
+        self.after(self.poll_ms, self._poll)
+
+    def idle(self):
+        return self.idle_seconds is not None and self.idle_seconds() >= self.idle_after
+
+    def active(self):
+        return self.visible and not self.idle()
+
+    def invalidate(self):
+        self.invalidations += 1
+        self.dirty = True
+        self.wake()
+
+    def set_visible(self, visible):
+        self.visible = visible
+        self.wake()
+
+    def wake(self):
+        """Programa un fotograma si hay algo pendiente de dibujar y la pantalla está activa."""
+        if self._pending or not self.dirty or not self.active():
+            return
+        self._pending = True
+        delay = max(0.0, self._last_frame + self.min_interval - clock.monotonic())
+        self.after(int(delay * 1000), self._frame)
+
+    def _frame(self):
+        self._pending = False
+        if not self.dirty or not self.active():
+            return
+        self.dirty = False
+        self._last_frame = clock.monotonic()
+        self.frames += 1
+        self.render()
+
+    def _poll(self):
+        # Detecta la vuelta de la actividad (toque, ratón) para dibujar el fotograma de recuperación
+        self.wake()
+        self.after(self.poll_ms, self._poll)
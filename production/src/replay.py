@@ -0,0 +1,145 @@
+"""Reproduce una traza grabada por el mismo camino que en campo, sin hardware.
+
+    python replay.py campo.trace.gz               tan rápido como se pueda
+    python replay.py campo.trace.gz --speed 100   a 100x el tiempo real
+    python daemon.py --record campo.trace.gz      graba una traza
+
+Las lecturas grabadas pasan por DHT22Reader, los filtros, el muestreador, el histórico,
+el almacén en disco y el termostato con un reloj virtual que sigue a la traza. Solo se
+reinyectan las órdenes manuales (UI, API); las del termostato las genera la reproducción,
+así se pueden comparar con las grabadas al ajustar parámetros.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import chain
+
+import clock
+import traces
+from actuators import ACTUATORS, SOURCES
+from controller import CONTROL_PERIOD, LockerController
+
+# Órdenes externas que se vuelven a aplicar tal cual
+REPLAYED_SOURCES = ('ui', 'api')
+# Un hueco mayor en la traza (daemon parado) no se rellena con pasos de control
+MAX_CONTROL_GAP = 60.0
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float('nan')
+
+
+class Replayer:
+    def __init__(self, path, data_dir, speed=None):
+        self.config, self.records = traces.read_trace(path)
+        self.data_dir = data_dir
+        self.speed = speed
+        self.backend = traces.ReplayBackend(self.config)
+        self.counts = Counter()
+        self.errors = Counter()
+        self.latencies = {traces.DHT: [], traces.W1: []}
+        self.recorded_switches = Counter()
+        self.replayed_switches = Counter()
+        self.samples = 0
+
+    def run(self):
+        records = iter(self.records)
+        first = next(records, None)
+        if first is None:
+            return None
+        virtual = clock.VirtualClock(first.timestamp)
+        clock.use(virtual)
+        try:
+            controller = LockerController(hw=self.backend, data_dir=self.data_dir, config=self.config)
+            for unit in controller.units:
+                unit.load_thermal()
+                unit.actuators.subscribe(lambda event: self.replayed_switches.update([(event.name, event.source)]))
+            started = time.perf_counter()
+            next_control = first.timestamp
+            for record in chain([first], records):
+                if self.speed:
+                    delay = started + (record.timestamp - first.timestamp) / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                if record.timestamp - next_control > MAX_CONTROL_GAP:
+                    next_control = record.timestamp
+                while next_control <= record.timestamp:
+                    virtual.advance_to(next_control)
+                    controller.control_step()
+                    controller.commands.step()
+                    next_control += CONTROL_PERIOD
+                virtual.advance_to(record.timestamp)
+                self._apply(controller, record)
+            wall = time.perf_counter() - started
+            controller.stop()
+        finally:
+            clock.use(None)
+        return wall, virtual.now - first.timestamp
+
+    def _apply(self, controller, record):
+        self.counts[record.kind] += 1
+        lockers = self.config['lockers']
+        if record.kind == traces.DHT:
+            self._sensor_stats(record)
+            self.backend.dht[lockers[record.unit]['dht22']].pending = record
+            controller.units[record.unit].dht.read_once()
+        elif record.kind == traces.W1:
+            self._sensor_stats(record)
+            self.backend.w1[lockers[record.unit]['ds18b20']].append(record)
+        elif record.kind == traces.ACT:
+            name, source = traces.ACTUATOR_NAMES[record.aux], SOURCES[record.status]
+            self.recorded_switches[name, source] += 1
+            if source in REPLAYED_SOURCES:
+                _, _, active, inactive = ACTUATORS[name]
+                controller.units[record.unit].command(name, active if record.a else inactive, source)
+                # Sin hilo de la cola: la orden se aplica ya, con el reloj virtual
+                controller.commands.step()
+        elif record.kind == traces.CYCLE:
+            for sample in controller.sampler.read_all():
+                controller.sampler.publish(sample)
+            self.samples += len(controller.poll())
+
+    def _sensor_stats(self, record):
+        self.latencies[record.kind].append(record.latency)
+        if record.status != traces.OK:
+            self.errors[record.kind] += 1
+
+    def report(self, wall, span):
+        total = sum(self.counts.values())
+        print(f"traza: {total} registros, {span / 3600:.1f} h en {wall:.1f} s "
+              f"({span / wall if wall else float('inf'):.0f}x), {total / wall if wall else 0:.0f} registros/s, "
+              f"{self.samples / wall if wall else 0:.0f} muestras/s")
+        for kind, label in ((traces.DHT, 'dht22'), (traces.W1, 'ds18b20')):
+            values = sorted(self.latencies[kind])
+            print(f"{label}: {self.counts[kind]} lecturas, {self.errors[kind]} errores, latencia grabada "
+                  f"p50={percentile(values, 0.5) * 1000:.0f} ms p99={percentile(values, 0.99) * 1000:.0f} ms "
+                  f"máx={(values[-1] if values else float('nan')) * 1000:.0f} ms")
+        for key in sorted(set(self.recorded_switches) | set(self.replayed_switches)):
+            if key[1] != 'init':
+                print(f"relé {key[0]} ({key[1]}): grabadas {self.recorded_switches[key]}, "
+                      f"reproducidas {self.replayed_switches[key]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproduce una traza de sensores del casillero")
+    parser.add_argument('trace', help="archivo grabado con daemon.py --record")
+    parser.add_argument('--speed', type=float, help="factor sobre el tiempo real (por defecto, sin esperas)")
+    parser.add_argument('--data-dir', help="dónde escribir el histórico reproducido (por defecto, un temporal)")
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='teikit-replay-')
+    replayer = Replayer(args.trace, data_dir, args.speed)
+    result = replayer.run()
+    if result is None:
+        print("traza vacía")
+        return 1
+    replayer.report(*result)
+    print(f"histórico reproducido en {os.path.abspath(data_dir)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+MISSING = float('nan')
+
+
+class SeriesBuffer:
+    """Buffer circular columnar de capacidad fija (array('d') por columna).
+
+    Cada valor se escribe dos veces (posición i e i + capacidad), así cualquier
+    ventana de datos recientes es contigua y se entrega como memoryview sin copiar.
+    Las vistas son válidas hasta que se sobrescriben (capacidad - len(ventana) appends);
+    desde otro hilo que el escritor, `copy_window()` copia una ventana coherente bajo su cerrojo.
+    La primera columna es el tiempo y debe ser creciente.
+
+    Con `memory` (un buffer escribible de `nbytes(columns, capacity)` bytes, p. ej. memoria
+    compartida) las columnas se colocan ahí en lugar de en arrays propios.
+    """
+
+    def __init__(self, columns, capacity, memory=None):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        if memory is None:
+            self._arrays = [array('d', bytes(2 * capacity * 8)) for _ in self.columns]
+        else:
+            doubles = memoryview(memory).cast('B')[:self.nbytes(self.columns, capacity)].cast('d')
+            self._arrays = [doubles[k * 2 * capacity:(k + 1) * 2 * capacity] for k in range(len(self.columns))]
+        self._views = [memoryview(a) for a in self._arrays]
+        self._head = 0
+        self._size = 0
+        # Lo toma append(): quien lee desde otro hilo no ve una fila a medias ni cabeza y tamaño desfasados
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_duration(cls, columns, hours, interval):
+        """Capacidad para `hours` horas de muestras cada `interval` segundos."""
+        return cls(columns, max(1, int(hours * 3600 / interval)))
+
+    @staticmethod
+    def nbytes(columns, capacity):
+        return len(columns) * 2 * capacity * 8
+
+    def __len__(self):
+        return self._size
+
+    def append(self, *values):
+        if len(values) != len(self.columns):
+            raise ValueError(f"expected {len(self.columns)} values, got {len(values)}")
+        with self._lock:
+            i, mirror = self._head, self._head + self.capacity
+            for arr, value in zip(self._arrays, values):
+                arr[i] = arr[mirror] = MISSING if value is None else value
+            self._head = (self._head + 1) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+
+    def _start(self):
+        return (self._head - self._size) % self.capacity
+
+    def slice(self, lo, hi):
+        """Filas [lo, hi) en orden cronológico como tupla de memoryviews (una por columna)."""
+        start = self._start()
+        return tuple(v[start + lo:start + hi] for v in self._views)
+
+    def all(self):
+        return self.slice(0, self._size)
+
+    def between(self, t0, t1):
+        """Filas con t0 <= tiempo <= t1, localizadas por bisección sobre la columna de tiempo."""
+        times = self.all()[0]
+        return self.slice(bisect_left(times, t0), bisect_right(times, t1))
+
+    def window(self, seconds):
+        """Últimos `seconds` segundos respecto a la muestra más reciente."""
+        if not self._size:
+            return self.slice(0, 0)
+        latest = self.latest()[0]
+        return self.between(latest - seconds, latest)
+
+    def copy_window(self, seconds):
+        """Como window(), pero copiada a listas bajo el cerrojo: segura frente a un append concurrente."""
+        with self._lock:
+            return tuple(view.tolist() for view in self.window(seconds))
+
+    def latest(self):
+        with self._lock:
+            if not self._size:
+                return None
+            i = (self._head - 1) % self.capacity
+            return tuple(arr[i] for arr in self._arrays)
@@ -0,0 +1,80 @@
+import math
+
+from ringbuffer import SeriesBuffer
+
+STATS = ('mean', 'min', 'max')
+
+
+def rollup_columns(channels):
+    """Columnas de un agregado: tiempo, medias (con el nombre del canal), mínimos ('_min') y máximos ('_max')."""
+    return ('time',) + tuple(f"{channel}_{stat}" if stat != 'mean' else channel
+                             for stat in STATS for channel in channels)
+
+
+class Rollup:
+    """Agregado incremental (media, mínimo, máximo) por intervalos fijos de `seconds`.
+
+    Cada muestra actualiza el intervalo abierto en O(canales); al llegar una muestra del
+    intervalo siguiente el anterior se cierra y pasa a `buffer`. Los intervalos se alinean
+    al reloj (epoch); en el buffer el tiempo es el centro del intervalo menos `offset`,
+    igual que el histórico crudo. Columnas: tiempo, medias, mínimos, máximos.
+    `make_buffer(columns, capacity)` crea el buffer (por defecto un SeriesBuffer en memoria).
+    """
+
+    def __init__(self, channels, seconds, capacity, offset=0.0, make_buffer=SeriesBuffer):
+        self.channels = tuple(channels)
+        self.seconds = seconds
+        self.offset = offset
+        self.buffer = make_buffer(rollup_columns(self.channels), capacity)
+        self._bucket = None
+        # Todo intervalo que empieza antes de esto ya está cerrado (en el buffer o en disco)
+        self._closed_until = -math.inf
+        self._reset()
+
+    def _reset(self):
+        n = len(self.channels)
+        self._count = [0] * n
+        self._sum = [0.0] * n
+        self._min = [math.inf] * n
+        self._max = [-math.inf] * n
+
+    def add(self, timestamp, *values):
+        """Suma una muestra (epoch); devuelve la fila que se cierra (inicio, medias..., mín..., máx...) o None."""
+        bucket = timestamp - timestamp % self.seconds
+        if bucket < self._closed_until or (self._bucket is not None and bucket < self._bucket):
+            # Intervalo ya cerrado (muestras releídas al arrancar o reloj que retrocede)
+            return None
+        closed = None
+        if self._bucket is not None and bucket != self._bucket:
+            closed = self._close()
+        self._bucket = bucket
+        for i, value in enumerate(values):
+            if value is None or value != value:
+                continue
+            self._count[i] += 1
+            self._sum[i] += value
+            if value < self._min[i]:
+                self._min[i] = value
+            if value > self._max[i]:
+                self._max[i] = value
+        return closed
+
+    def _close(self):
+        nan = float('nan')
+        empty = not any(self._count)
+        row = (self._bucket,
+               *(s / c if c else nan for s, c in zip(self._sum, self._count)),
+               *(m if c else nan for m, c in zip(self._min, self._count)),
+               *(m if c else nan for m, c in zip(self._max, self._count)))
+        self._closed_until = self._bucket + self.seconds
+        self._reset()
+        if empty:
+            return None
+        self.load(row)
+        return row
+
+    def load(self, row):
+        """Añade una fila ya cerrada (p. ej. leída del disco al arrancar)."""
+        start, *values = row
+        self.buffer.append(start + self.seconds / 2 - self.offset, *values)
+        self._closed_until = max(self._closed_until, start + self.seconds)
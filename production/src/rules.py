@@ -0,0 +1,284 @@
+"""Reglas de alarma declarativas sobre ventanas móviles de cada canal.
+
+Las reglas se definen en lockers.json ("rules": [...]); cada una es un diccionario:
+
+    {"name": "pad-caliente", "channel": "pad_temperature", "op": ">", "threshold": 45, "for": 30,
+     "actions": {"pad": "off", "fan": "on"}}
+    {"name": "ambiente-sube", "channel": "temperature", "stat": "rate", "window": 120,
+     "op": ">", "threshold": 2}
+
+    channel    humidity, temperature o pad_temperature
+    stat       value (última lectura, por defecto), mean, min, max o rate (pendiente en unidades/min)
+    window     segundos de la ventana móvil (obligatoria salvo con value)
+    op         >, >=, < o <=
+    threshold  umbral de disparo; `clear` (opcional) es el umbral de rearme, para tener histéresis
+    for        segundos que la condición debe mantenerse antes de disparar (0 por defecto)
+    actions    relés a mover al disparar; el termostato no los contradice mientras la alarma siga activa
+    lockers    ids de los casilleros a los que se aplica (todos por defecto)
+
+Cada muestra actualiza una vez cada ventana distinta (casillero, canal, segundos) en O(1)
+amortizado y solo evalúa las reglas de los canales que trajeron valor: el coste por muestra
+no depende de la longitud de la ventana ni del histórico.
+"""
+import operator
+from collections import deque, namedtuple
+
+from actuators import ACTUATORS
+from metrics import STAGE_SECONDS
+
+CHANNELS = ('humidity', 'temperature', 'pad_temperature')
+STATS = ('value', 'mean', 'min', 'max', 'rate')
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+RULE_KEYS = ('name', 'channel', 'stat', 'window', 'op', 'threshold', 'clear', 'for', 'actions', 'lockers')
+
+# Disparo (active=True) o rearme de una regla en un casillero
+AlarmEvent = namedtuple('AlarmEvent', ['timestamp', 'unit', 'rule', 'active', 'value'])
+
+
+class RollingWindow:
+    """Media, mínimo, máximo y pendiente de los últimos `seconds` segundos en O(1) amortizado por muestra.
+
+    Suma y mínimos cuadrados por sumas acumuladas; mínimo y máximo por colas monótonas.
+    Las sumas se recalculan cada vez que la ventana se renueva entera para que los errores
+    de redondeo de las restas no se acumulen.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        self._mins = deque()
+        self._maxes = deque()
+        self._first = 0       # número de orden de samples[0]
+        self._next = 0
+        self._t0 = None       # origen de tiempos de las sumas
+        self._since_rebase = 0
+        self._n = self._sy = self._st = self._stt = self._sty = 0.0
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, timestamp, value):
+        seq = self._next
+        self._next += 1
+        self.samples.append((timestamp, value))
+        if self._t0 is None:
+            self._t0 = timestamp
+        self._accumulate(timestamp - self._t0, value, 1)
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((seq, value))
+        while self._maxes and self._maxes[-1][1] <= value:
+            self._maxes.pop()
+        self._maxes.append((seq, value))
+
+        limit = timestamp - self.seconds
+        while self.samples[0][0] < limit:
+            t, v = self.samples.popleft()
+            self._accumulate(t - self._t0, v, -1)
+            self._first += 1
+        while self._mins[0][0] < self._first:
+            self._mins.popleft()
+        while self._maxes[0][0] < self._first:
+            self._maxes.popleft()
+        self._since_rebase += 1
+        if self._since_rebase > max(len(self.samples), 32):
+            self._rebase()
+
+    def _accumulate(self, t, value, sign):
+        self._n += sign
+        self._sy += sign * value
+        self._st += sign * t
+        self._stt += sign * t * t
+        self._sty += sign * t * value
+
+    def _rebase(self):
+        self._t0 = self.samples[0][0]
+        self._since_rebase = 0
+        self._n = self._sy = self._st = self._stt = self._sty = 0.0
+        for t, v in self.samples:
+            self._accumulate(t - self._t0, v, 1)
+
+    def mean(self):
+        return self._sy / self._n if self._n else None
+
+    def min(self):
+        return self._mins[0][1] if self._mins else None
+
+    def max(self):
+        return self._maxes[0][1] if self._maxes else None
+
+    def rate(self):
+        """Pendiente por mínimos cuadrados en unidades por minuto; None con menos de 3 muestras."""
+        if self._n < 3:
+            return None
+        denominator = self._n * self._stt - self._st * self._st
+        if denominator <= 0:
+            return None
+        return (self._n * self._sty - self._st * self._sy) / denominator * 60
+
+
+class Rule:
+    """Regla validada; `Rule.from_config(dict)` la construye desde lockers.json."""
+
+    def __init__(self, name, channel, op, threshold, stat='value', window=0.0, clear=None, hold=0.0,
+                 actions=None, lockers=None):
+        where = f"rule {name!r}"
+        if channel not in CHANNELS:
+            raise ValueError(f"{where}: channel must be one of {', '.join(CHANNELS)}, got {channel!r}")
+        if stat not in STATS:
+            raise ValueError(f"{where}: stat must be one of {', '.join(STATS)}, got {stat!r}")
+        if op not in OPERATORS:
+            raise ValueError(f"{where}: op must be one of {' '.join(OPERATORS)}, got {op!r}")
+        if stat != 'value' and not window > 0:
+            raise ValueError(f"{where}: stat {stat!r} needs a window in seconds")
+        for actuator, state in (actions or {}).items():
+            if actuator not in ACTUATORS or state not in ACTUATORS[actuator][2:]:
+                raise ValueError(f"{where}: invalid action {actuator!r}: {state!r}")
+        self.name = name
+        self.channel = channel
+        self.stat = stat
+        self.window = float(window) if stat != 'value' else 0.0
+        self.op = op
+        self.compare = OPERATORS[op]
+        self.threshold = float(threshold)
+        self.clear = self.threshold if clear is None else float(clear)
+        # La condición de rearme es la contraria con el umbral `clear`: con '>' se rearma al bajar de él
+        self.cleared = OPERATORS[{'>': '<=', '>=': '<', '<': '>=', '<=': '>'}[op]]
+        self.hold = float(hold)
+        self.actions = dict(actions or {})
+        self.lockers = None if lockers is None else set(lockers)
+
+    @classmethod
+    def from_config(cls, config):
+        unknown = set(config) - set(RULE_KEYS)
+        if unknown:
+            raise ValueError(f"rule {config.get('name', '?')!r}: unknown keys {', '.join(sorted(unknown))}")
+        params = dict(config)
+        if 'for' in params:
+            params['hold'] = params.pop('for')
+        missing = [key for key in ('name', 'channel', 'op', 'threshold') if key not in params]
+        if missing:
+            raise ValueError(f"rule {config.get('name', '?')!r} is missing {', '.join(missing)}")
+        return cls(**params)
+
+    def applies_to(self, unit_id):
+        return self.lockers is None or unit_id in self.lockers
+
+
+class _Check:
+    """Estado de una regla en un casillero."""
+    __slots__ = ('index', 'rule', 'unit', 'window', 'since', 'active')
+
+    def __init__(self, index, rule, unit, window):
+        self.index = index
+        self.rule = rule
+        self.unit = unit
+        self.window = window
+        self.since = None
+        self.active = False
+
+    def value(self, latest):
+        if self.window is None:
+            return latest
+        return getattr(self.window, self.rule.stat)()
+
+
+class RulesEngine:
+    """Evalúa las reglas con cada ciclo del muestreador (se registra en `Sampler.listeners`).
+
+    Al disparar una regla se ejecutan sus acciones con origen 'rule', el relé queda
+    retenido para el termostato (`unit.rule_holds`) y se guarda el evento en el canal
+    'alarms' del almacén del casillero. Las alarmas activas se publican en `unit.alarms`.
+    """
+
+    def __init__(self, rules, units):
+        self.rules = [rule if isinstance(rule, Rule) else Rule.from_config(rule) for rule in rules]
+        names = [rule.name for rule in self.rules]
+        duplicated = {name for name in names if names.count(name) > 1}
+        if duplicated:
+            raise ValueError(f"duplicate rule names: {', '.join(sorted(duplicated))}")
+        self.units = {unit.id: unit for unit in units}
+        self.raised = 0
+        self._subscribers = []
+        # casillero -> canal -> (ventanas distintas, comprobaciones)
+        self._checks = {}
+        for unit in units:
+            by_channel = {}
+            for index, rule in enumerate(self.rules):
+                if not rule.applies_to(unit.id):
+                    continue
+                windows, checks = by_channel.setdefault(rule.channel, ({}, []))
+                window = None
+                if rule.window:
+                    window = windows.setdefault(rule.window, RollingWindow(rule.window))
+                checks.append(_Check(index, rule, unit, window))
+            self._checks[unit.id] = {channel: (list(windows.values()), checks)
+                                     for channel, (windows, checks) in by_channel.items()}
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+
+    def windows(self):
+        return sum(len(windows) for channels in self._checks.values() for windows, _ in channels.values())
+
+    def feed(self, samples):
+        if not self.rules:
+            return
+        with STAGE_SECONDS.time('rules'):
+            for sample in samples:
+                self.observe(sample)
+
+    def observe(self, sample):
+        channels = self._checks.get(sample.unit)
+        if not channels:
+            return
+        timestamp = sample.timestamp
+        for channel, (windows, checks) in channels.items():
+            latest = getattr(sample, channel)
+            if latest is None:
+                # Sin lectura la condición no avanza ni se rearma: de eso se ocupa el termostato
+                continue
+            for window in windows:
+                window.add(timestamp, latest)
+            for check in checks:
+                self._evaluate(check, timestamp, check.value(latest))
+
+    def _evaluate(self, check, timestamp, value):
+        if value is None:
+            return
+        rule = check.rule
+        if check.active:
+            if rule.cleared(value, rule.clear):
+                check.active = False
+                check.since = None
+                self._transition(check, timestamp, value)
+            return
+        if not rule.compare(value, rule.threshold):
+            check.since = None
+            return
+        if check.since is None:
+            check.since = timestamp
+        if timestamp - check.since >= rule.hold:
+            check.active = True
+            self._transition(check, timestamp, value)
+
+    def _transition(self, check, timestamp, value):
+        unit, rule = check.unit, check.rule
+        event = AlarmEvent(timestamp, unit.id, rule.name, check.active, value)
+        if check.active:
+            self.raised += 1
+            for name, state in rule.actions.items():
+                unit.actuators.set(name, state, 'rule')
+            print(f"alarma {rule.name} en {unit.id}: {rule.channel} {rule.stat} {value:.2f} {rule.op} {rule.threshold:g}")
+        else:
+            print(f"alarma {rule.name} en {unit.id}: rearmada ({value:.2f})")
+        # Se reemplazan en bloque: la API y la UI leen sin bloqueos desde otros hilos
+        active = [c for c in self._all_checks(unit.id) if c.active]
+        unit.alarms = tuple(c.rule.name for c in active)
+        unit.rule_holds = {name: state for c in active for name, state in c.rule.actions.items()}
+        unit.store.append('alarms', timestamp, check.index, 1 if check.active else 0, value)
+        for callback in list(self._subscribers):
+            callback(event)
+
+    def _all_checks(self, unit_id):
+        return [check for _, checks in self._checks[unit_id].values() for check in checks]
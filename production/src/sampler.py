@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import clock
+from metrics import STAGE_SECONDS, LoopTimer
+
+# Muestra con marca de tiempo (epoch) de un casillero, publicada por el muestreador
+Sample = namedtuple('Sample', ['timestamp', 'humidity', 'temperature', 'pad_temperature', 'unit'])
+
+
+class Sampler(threading.Thread):
+    """Hilo dueño de los sensores: cada `interval` segundos lee todos los casilleros y publica una muestra por unidad.
+
+    Las lecturas se agrupan por bus (cada DHT22 tiene su pin, las DS18B20 comparten el
+    bus 1-wire) y cada bus se lee en su propio hilo, en serie dentro del bus. Así el ciclo
+    dura lo que el bus más lento y no la suma de todas las lecturas. Un bus que no termina
+    antes de `deadline` se publica como None y no se vuelve a consultar hasta que acabe.
+    """
+
+    def __init__(self, units, interval=2.0, maxsize=256, deadline=None):
+        super().__init__(name='sampler', daemon=True)
+        self.units = list(units)
+        self.interval = interval
+        self.deadline = interval if deadline is None else deadline
+        self.samples = queue.Queue(maxsize=maxsize)
+        self.first_sample = threading.Event()
+        # Llamados con la lista de muestras al final de cada ciclo (p. ej. el grabador de trazas)
+        self.listeners = []
+        self.last_cycle_ms = 0.0
+        # Lecturas de bus que no terminaron antes del plazo
+        self.late_buses = 0
+        self._period = LoopTimer('sampler')
+        self._stop_event = threading.Event()
+
+        self.buses = {}
+        for unit in self.units:
+            self.buses.setdefault(unit.dht_bus, []).append((unit, 'dht'))
+            self.buses.setdefault(unit.w1_bus, []).append((unit, 'w1'))
+        self._pool = ThreadPoolExecutor(max_workers=len(self.buses) or 1, thread_name_prefix='sampler-bus')
+        self._pending = {}
+
+    def run(self):
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            self._period.tick()
+            for sample in self.read_all():
+                self.publish(sample)
+            # Reloj monotónico: si una lectura se atrasa no se acumulan ticks pendientes
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            self._stop_event.wait(next_tick - time.monotonic())
+
+    @staticmethod
+    def _read_bus(tasks):
+        readings = {}
+        if tasks[0][1] == 'w1':
+            # Todas las sondas del maestro convierten a la vez; luego cada lectura es inmediata
+            tasks[0][0].pad_bus.convert()
+        for unit, kind in tasks:
+            readings[unit.id, kind] = unit.read_dht() if kind == 'dht' else unit.read_pad_temp()
+        return readings
+
+    def read_all(self):
+        """Un ciclo completo: todos los buses en paralelo, acotado por `deadline`."""
+        start = time.monotonic()
+        for bus, tasks in self.buses.items():
+            if bus not in self._pending:
+                self._pending[bus] = self._pool.submit(self._read_bus, tasks)
+        done, _ = wait(self._pending.values(), timeout=self.deadline)
+        readings = {}
+        for bus, future in list(self._pending.items()):
+            if future in done:
+                del self._pending[bus]
+                if future.exception() is None:
+                    readings.update(future.result())
+            else:
+                self.late_buses += 1
+        timestamp = clock.time()
+        self.last_cycle_ms = (time.monotonic() - start) * 1000
+        STAGE_SECONDS.observe(self.last_cycle_ms / 1000, 'sampler_cycle')
+        samples = []
+        for unit in self.units:
+            h, t = readings.get((unit.id, 'dht'), (None, None))
+            sample = Sample(timestamp, h, t, readings.get((unit.id, 'w1')), unit.id)
+            unit.observe(sample)
+            samples.append(sample)
+        for listener in self.listeners:
+            listener(samples)
+        return samples
+
+    def publish(self, sample):
+        """Encola sin bloquear; si nadie drena se descarta la muestra más antigua."""
+        while True:
+            try:
+                self.samples.put_nowait(sample)
+                self.first_sample.set()
+                return
+            except queue.Full:
+                try:
+                    self.samples.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def drain(self):
+        """Devuelve todas las muestras pendientes sin esperar (seguro desde el hilo de Tk)."""
+        pending = []
+        while True:
+            try:
+                pending.append(self.samples.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
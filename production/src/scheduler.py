@@ -0,0 +1,75 @@
+import threading
+import time
+import traceback
+
+from metrics import LOOP_LATENESS, STAGE_SECONDS, LoopTimer
+
+
+class JitterStats:
+    """Retraso de cada tick respecto a su plazo teórico (segundos)."""
+
+    def __init__(self):
+        self.count = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.missed = 0
+
+    def add(self, lateness):
+        self.count += 1
+        self.last = lateness
+        self.total += lateness
+        if lateness > self.max:
+            self.max = lateness
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self):
+        return (f"ticks={self.count} jitter media={self.mean * 1000:.2f} ms "
+                f"máx={self.max * 1000:.2f} ms perdidos={self.missed}")
+
+
+class FixedRateScheduler(threading.Thread):
+    """Ejecuta `task` cada `period` segundos sobre plazos absolutos del reloj monotónico.
+
+    El plazo k es inicio + k * period, así el retraso de una ejecución no desplaza a las
+    siguientes (sin deriva, a diferencia de encadenar root.after). Si la tarea se pasa de
+    uno o más periodos, los ticks vencidos se cuentan como perdidos en vez de ejecutarse en ráfaga.
+    """
+
+    def __init__(self, task, period, name='scheduler'):
+        super().__init__(name=name, daemon=True)
+        self.task = task
+        self.period = period
+        self.jitter = JitterStats()
+        self._period = LoopTimer(name)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        tick = 0
+        while True:
+            deadline = start + tick * self.period
+            if self._stop_event.wait(max(0.0, deadline - time.monotonic())):
+                return
+            lateness = time.monotonic() - deadline
+            self.jitter.add(lateness)
+            self._period.tick()
+            LOOP_LATENESS.observe(lateness, self.name)
+            try:
+                with STAGE_SECONDS.time(self.name):
+                    self.task()
+            except Exception:
+                traceback.print_exc()
+            tick += 1
+            due = int((time.monotonic() - start) // self.period)
+            if due >= tick:
+                self.jitter.missed += due - tick + 1
+                tick = due + 1
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,108 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+import clock
+from metrics import STAGE_SECONDS
+
+# El DHT22 no admite más de una lectura cada 2 s
+DHT22_MIN_INTERVAL = 2.0
+# Un valor en caché más viejo que esto se publica como None
+DHT22_MAX_AGE = 10.0
+
+
+class SpikeFilter:
+    """Filtro de picos por mediana móvil y MAD: rechaza |x - mediana| > threshold * 1.4826 * MAD.
+
+    `min_spread` evita rechazar todo cuando la señal es casi constante (MAD ~ 0). Tras
+    `max_rejects` rechazos seguidos se acepta el valor y se reinicia la ventana: es un
+    cambio real de nivel, no un pico aislado.
+    """
+
+    def __init__(self, window=9, threshold=4.0, min_spread=0.5, max_rejects=3, valid_range=None):
+        self.values = deque(maxlen=window)
+        self.threshold = threshold
+        self.min_spread = min_spread
+        self.max_rejects = max_rejects
+        self.valid_range = valid_range
+        self.rejected = 0
+        self._consecutive = 0
+
+    def __call__(self, value):
+        if value is None:
+            return None
+        if self.valid_range and not self.valid_range[0] <= value <= self.valid_range[1]:
+            self.rejected += 1
+            return None
+        if len(self.values) >= 3:
+            median = statistics.median(self.values)
+            spread = max(1.4826 * statistics.median(abs(v - median) for v in self.values), self.min_spread)
+            if abs(value - median) > self.threshold * spread:
+                if self._consecutive < self.max_rejects:
+                    self._consecutive += 1
+                    self.rejected += 1
+                    return None
+                self.values.clear()
+        self._consecutive = 0
+        self.values.append(value)
+        return value
+
+
+class DHT22Reader(threading.Thread):
+    """Lee un DHT22 en segundo plano al ritmo máximo permitido y guarda la última lectura buena.
+
+    Un RuntimeError (checksum, timeout) se reintenta en el siguiente hueco de 2 s sin que
+    nadie espere; `latest()` devuelve al instante la última lectura filtrada y su antigüedad.
+    """
+
+    def __init__(self, sensor, interval=DHT22_MIN_INTERVAL, name='dht22'):
+        super().__init__(name=name, daemon=True)
+        self.sensor = sensor
+        self.interval = max(interval, DHT22_MIN_INTERVAL)
+        self.humidity_filter = SpikeFilter(min_spread=1.0, valid_range=(0.0, 100.0))
+        self.temperature_filter = SpikeFilter(min_spread=0.3, valid_range=(-40.0, 80.0))
+        self.reads = 0
+        self.errors = 0
+        self._humidity = (None, None)
+        self._temperature = (None, None)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            self.read_once()
+            self._stop_event.wait(max(0.0, started + self.interval - time.monotonic()))
+
+    def read_once(self):
+        self.reads += 1
+        try:
+            with STAGE_SECONDS.time('dht_read'):
+                humidity, temperature = self.sensor.humidity, self.sensor.temperature
+        except RuntimeError:
+            self.errors += 1
+            return
+        now = clock.monotonic()
+        # Cada canal se publica por separado: un canal rechazado no invalida al otro
+        humidity = self.humidity_filter(humidity)
+        temperature = self.temperature_filter(temperature)
+        if humidity is not None:
+            self._humidity = (humidity, now)
+        if temperature is not None:
+            self._temperature = (temperature, now)
+
+    def latest(self, max_age=DHT22_MAX_AGE):
+        """(humedad, temperatura) en caché; None en el canal cuya lectura tiene más de `max_age` s."""
+        now = clock.monotonic()
+        return tuple(value if value is not None and now - at <= max_age else None
+                     for value, at in (self._humidity, self._temperature))
+
+    def age(self):
+        """Antigüedad en segundos de la última lectura buena de cada canal (None si nunca hubo)."""
+        now = clock.monotonic()
+        return tuple(None if at is None else now - at for _, at in (self._humidity, self._temperature))
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,196 @@
+"""Histórico y estado del daemon en memoria compartida para procesos de interfaz.
+
+El daemon (único escritor) crea los segmentos y coloca en ellos los buffers de sus
+casilleros; las interfaces los abren en solo lectura y leen las ventanas sin copiar.
+
+    <nombre>                    control: cabecera + instantánea JSON del controlador (la de la API)
+    <nombre>.<casillero>.<fuente>   un SeriesBuffer: 'raw', 'minute', 'hour'
+
+Cabecera de control: magia, arranque del daemon (epoch, origen de los tiempos del
+histórico), latido (epoch de la última publicación), secuencia y longitud de la instantánea.
+La instantánea se protege con un seqlock: la secuencia es impar mientras se escribe.
+
+Cada buffer lleva delante su número de filas escritas, que el daemon actualiza después de
+escribir la fila: un lector que lo lee ve filas completas. Las ventanas leídas son válidas
+mientras el daemon no las sobrescriba, como en SeriesBuffer.
+"""
+import json
+import re
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+from ringbuffer import SeriesBuffer
+
+SHM_ENV = 'TEIKIT_SHM'
+DEFAULT_NAME = 'teikit'
+MAGIC = b'TEIKSHM1'
+CONTROL = struct.Struct('<8sddQI')
+STATE_SIZE = 256 * 1024
+# Cabecera de cada buffer: magia, capacidad, filas escritas, columnas (JSON, relleno hasta 256 bytes)
+SERIES = struct.Struct('<8sQQ')
+SERIES_HEADER = 256
+WRITTEN_OFFSET = 16
+
+
+def segment_name(name, unit_id, source):
+    return f"{name}.{re.sub(r'[^A-Za-z0-9_-]', '_', unit_id)}.{source}"
+
+
+def _create(name, size):
+    try:
+        return shared_memory.SharedMemory(name, create=True, size=size)
+    except FileExistsError:
+        # Restos de un daemon que no terminó limpio: nadie más escribe, se reemplazan
+        stale = shared_memory.SharedMemory(name)
+        stale.unlink()
+        stale.close()
+        return shared_memory.SharedMemory(name, create=True, size=size)
+
+
+def _attach(name):
+    """Abre un segmento existente sin que este proceso lo borre al salir."""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13: el resource_tracker borraría el segmento del daemon al cerrar la interfaz
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # Aún hay vistas vivas (ventanas en uso): el mapeo se libera cuando se recojan;
+        # se suelta aquí para que SharedMemory.__del__ no vuelva a intentarlo al salir
+        shm._mmap = None
+
+
+class SharedSeries(SeriesBuffer):
+    """SeriesBuffer en un segmento compartido. `create=True` lo crea (daemon); si no, lo abre para leer.
+
+    El lector llama a `refresh()` antes de leer para ver las filas que ha escrito el daemon.
+    """
+
+    def __init__(self, name, columns=None, capacity=None, create=False):
+        self.name = name
+        self.writer = create
+        if create:
+            layout = json.dumps(list(columns)).encode()
+            if len(layout) > SERIES_HEADER - SERIES.size:
+                raise ValueError(f"{name}: too many columns for the shared header")
+            self.shm = _create(name, SERIES_HEADER + self.nbytes(columns, capacity))
+            SERIES.pack_into(self.shm.buf, 0, MAGIC, capacity, 0)
+            self.shm.buf[SERIES.size:SERIES.size + len(layout)] = layout
+        else:
+            self.shm = _attach(name)
+            magic, capacity, _ = SERIES.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                _close(self.shm)
+                raise ValueError(f"{name}: not a teikit shared buffer")
+            columns = json.loads(bytes(self.shm.buf[SERIES.size:SERIES_HEADER]).rstrip(b'\0'))
+        super().__init__(columns, capacity, memory=self.shm.buf[SERIES_HEADER:])
+        self._written = 0
+        self.refresh()
+
+    def append(self, *values):
+        super().append(*values)
+        # Se publica después de escribir la fila (y su espejo)
+        self._written += 1
+        struct.pack_into('<Q', self.shm.buf, WRITTEN_OFFSET, self._written)
+
+    def refresh(self):
+        """Sincroniza cabeza y tamaño con lo escrito por el daemon; devuelve el total de filas escritas."""
+        if not self.writer:
+            self._written = struct.unpack_from('<Q', self.shm.buf, WRITTEN_OFFSET)[0]
+            self._head = self._written % self.capacity
+            self._size = min(self._written, self.capacity)
+        return self._written
+
+    def close(self):
+        for view in self._views + self._arrays:
+            view.release()
+        _close(self.shm)
+        if self.writer:
+            self.shm.unlink()
+
+
+class SharedState:
+    """Lado del daemon: crea el segmento de control y los buffers de cada casillero."""
+
+    def __init__(self, name=DEFAULT_NAME, boot=0.0):
+        self.name = name
+        self.boot = boot
+        self.series = []
+        self.shm = _create(name, CONTROL.size + STATE_SIZE)
+        self._seq = 0
+        # Publican el hilo de control y los de la API: el seqlock necesita un único escritor a la vez
+        self._lock = threading.Lock()
+        CONTROL.pack_into(self.shm.buf, 0, MAGIC, boot, 0.0, 0, 0)
+
+    def buffers(self, unit_id):
+        """Fábrica de buffers para LockerUnit: (fuente, columnas, capacidad) -> SharedSeries."""
+        def allocate(source, columns, capacity):
+            series = SharedSeries(segment_name(self.name, unit_id, source), columns, capacity, create=True)
+            self.series.append(series)
+            return series
+        return allocate
+
+    def publish(self, state, heartbeat):
+        """Copia la instantánea JSON (bytes) bajo el seqlock y actualiza el latido."""
+        if len(state) > STATE_SIZE:
+            print(f"shm: instantánea de {len(state)} bytes, no cabe en {STATE_SIZE}; no se publica")
+            return
+        buf = self.shm.buf
+        with self._lock:
+            self._seq += 1
+            CONTROL.pack_into(buf, 0, MAGIC, self.boot, heartbeat, self._seq, len(state))
+            buf[CONTROL.size:CONTROL.size + len(state)] = state
+            self._seq += 1
+            CONTROL.pack_into(buf, 0, MAGIC, self.boot, heartbeat, self._seq, len(state))
+
+    def close(self):
+        for series in self.series:
+            series.close()
+        _close(self.shm)
+        self.shm.unlink()
+
+
+class SharedReader:
+    """Lado de la interfaz: lee el segmento de control del daemon."""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self.shm = _attach(name)
+        magic, self.boot, _, _, _ = CONTROL.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            _close(self.shm)
+            raise ValueError(f"{name}: not a teikit shared segment")
+        self._state = (0, None)
+
+    def heartbeat(self):
+        return CONTROL.unpack_from(self.shm.buf, 0)[2]
+
+    def state(self, retries=100):
+        """Última instantánea (dict) o None si el daemon aún no ha publicado ninguna."""
+        buf = self.shm.buf
+        for _ in range(retries):
+            _, _, _, seq, length = CONTROL.unpack_from(buf, 0)
+            if seq == self._state[0]:
+                # Sin cambios desde la última lectura: no se vuelve a decodificar
+                return self._state[1]
+            if seq % 2:
+                continue
+            state = bytes(buf[CONTROL.size:CONTROL.size + length])
+            if CONTROL.unpack_from(buf, 0)[3] == seq:
+                self._state = (seq, json.loads(state))
+                return self._state[1]
+        raise TimeoutError(f"{self.name}: snapshot kept changing while reading")
+
+    def series(self, unit_id, source):
+        return SharedSeries(segment_name(self.name, unit_id, source))
+
+    def close(self):
+        _close(self.shm)
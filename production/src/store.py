@@ -0,0 +1,218 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import traceback
+
+import clock
+from metrics import STAGE_SECONDS
+
+# Formato binario de cada canal: el primer campo siempre es el timestamp (epoch, float64)
+CHANNELS = {
+    'samples': '<dfff',  # timestamp, humedad, temperatura ambiente, temperatura del pad
+    'events': '<dBBB',   # timestamp, pin del actuador, nivel GPIO, origen (actuators.SOURCES)
+    'minute': '<d9f',    # inicio del intervalo, media/mín/máx de humedad, ambiente y pad (rollups.Rollup)
+    'hour': '<d9f',
+    'alarms': '<dHBf',   # timestamp, índice de la regla en lockers.json, 1 disparo / 0 rearme, valor evaluado
+}
+
+
+class SegmentStore:
+    """Almacén de series temporales en segmentos binarios de solo-anexado.
+
+    Las escrituras se acumulan en memoria y se vuelcan en lote (cada `flush_interval`
+    segundos o `flush_bytes` bytes) para no escribir la SD en cada muestra. `append()` solo
+    encola: el volcado (open/write/fsync) lo hace el hilo escritor del almacén, sin el lock
+    tomado, así que una SD lenta no frena a la interfaz, al control ni al muestreador. Cada canal
+    rota a un segmento nuevo cada `segment_seconds` y los segmentos más viejos que
+    `retention_days` se borran. Las consultas leen los segmentos con mmap.
+    """
+
+    def __init__(self, root, channels=CHANNELS, segment_seconds=6 * 3600, retention_days=30,
+                 flush_interval=60, flush_bytes=64 * 1024):
+        self.root = root
+        self.formats = {name: struct.Struct(fmt) for name, fmt in channels.items()}
+        self.segment_seconds = segment_seconds
+        self.retention = retention_days * 86400
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self._pending = {name: [] for name in channels}
+        self._pending_bytes = 0
+        self._last_flush = clock.monotonic()
+        # Registros que se están escribiendo y tamaño previo de cada segmento tocado: las
+        # consultas los leen de memoria y no del archivo a medio escribir
+        self._writing = {name: [] for name in channels}
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._writer = None
+        os.makedirs(root, exist_ok=True)
+
+    # Escritura
+    def append(self, channel, timestamp, *values):
+        record = self.formats[channel].pack(timestamp, *(float('nan') if v is None else v for v in values))
+        with self._lock:
+            self._pending[channel].append((timestamp, record))
+            self._pending_bytes += len(record)
+            due = (self._pending_bytes >= self.flush_bytes
+                   or clock.monotonic() - self._last_flush >= self.flush_interval)
+            if self._writer is None and not self._stop_event.is_set():
+                self._writer = threading.Thread(target=self._run, name='store-writer', daemon=True)
+                self._writer.start()
+        if due:
+            self._wake.set()
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                if not self._pending_bytes:
+                    continue
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"store: no se pudo volcar {self.root}: {e}")
+                except Exception:
+                    # Ningún fallo puede parar el hilo: sin él lo pendiente crecería sin límite
+                    traceback.print_exc()
+        finally:
+            with self._lock:
+                # Si aun así muere fuera de close(), el siguiente append() arranca otro
+                if not self._stop_event.is_set():
+                    self._writer = None
+
+    def flush(self):
+        """Vuelca todos los registros pendientes: una escritura por segmento tocado."""
+        with self._flush_lock, STAGE_SECONDS.time('store_flush'):
+            with self._lock:
+                self._writing = self._pending
+                self._pending = {name: [] for name in self._pending}
+                self._pending_bytes = 0
+                self._last_flush = clock.monotonic()
+            try:
+                for channel, records in self._writing.items():
+                    batches = {}
+                    for timestamp, record in records:
+                        batches.setdefault(self._segment_start(timestamp), []).append(record)
+                    for start, chunk in batches.items():
+                        path = self._segment_path(channel, start)
+                        with open(path, 'ab') as f:
+                            with self._lock:
+                                self._sizes[path] = os.fstat(f.fileno()).st_size
+                            f.write(b''.join(chunk))
+                            f.flush()
+                            os.fsync(f.fileno())
+            finally:
+                with self._lock:
+                    self._writing = {name: [] for name in self._writing}
+                    self._sizes = {}
+
+    def expire(self, now=None):
+        """Borra los segmentos que terminaron antes del periodo de retención."""
+        cutoff = (time.time() if now is None else now) - self.retention
+        removed = 0
+        for channel in self.formats:
+            for start, path in self._segments(channel):
+                if start + self.segment_seconds < cutoff:
+                    os.remove(path)
+                    removed += 1
+        return removed
+
+    def close(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+
+    # Lectura
+    def query(self, channel, t0, t1):
+        """Genera los registros con t0 <= timestamp <= t1 en orden cronológico."""
+        fmt = self.formats[channel]
+        segments, pending = self._snapshot(channel, t0, t1)
+        for path, size in segments:
+            yield from self._scan_segment(path, fmt, t0, t1, size)
+        for record in pending:
+            yield fmt.unpack(record)
+
+    def blocks(self, channel, t0, t1, records=4096):
+        """Como query(), pero en bloques de bytes de hasta `records` registros enteros (para exportar sin desempaquetar)."""
+        fmt = self.formats[channel]
+        segments, pending = self._snapshot(channel, t0, t1)
+        for path, size in segments:
+            with open(path, 'rb') as f:
+                count = size // fmt.size
+                if not count:
+                    continue
+                with mmap.mmap(f.fileno(), count * fmt.size, access=mmap.ACCESS_READ) as mm:
+                    first = self._bisect(mm, fmt, count, t0)
+                    end = self._bisect(mm, fmt, count, math.nextafter(t1, math.inf))
+                    for i in range(first, end, records):
+                        yield mm[i * fmt.size:min(i + records, end) * fmt.size]
+        for i in range(0, len(pending), records):
+            yield b''.join(pending[i:i + records])
+
+    def _snapshot(self, channel, t0, t1):
+        """Segmentos del tramo con el tamaño a leer de cada uno y registros aún en memoria, de una vez.
+
+        Con el lock tomado ningún volcado puede pasar registros de memoria a disco entre
+        medias; lo que se está escribiendo se lee de memoria y su segmento hasta el tamaño previo.
+        """
+        with self._lock:
+            segments = []
+            for start, path in self._segments(channel):
+                if start + self.segment_seconds < t0 or start > t1:
+                    continue
+                size = self._sizes.get(path)
+                segments.append((path, os.stat(path).st_size if size is None else size))
+            pending = [record for timestamp, record in self._writing[channel] + self._pending[channel]
+                       if t0 <= timestamp <= t1]
+        return segments, pending
+
+    def _scan_segment(self, path, fmt, t0, t1, size):
+        with open(path, 'rb') as f:
+            # Un registro incompleto al final (corte de energía) se ignora
+            count = size // fmt.size
+            if not count:
+                return
+            with mmap.mmap(f.fileno(), count * fmt.size, access=mmap.ACCESS_READ) as mm:
+                for i in range(self._bisect(mm, fmt, count, t0), count):
+                    record = fmt.unpack_from(mm, i * fmt.size)
+                    if record[0] > t1:
+                        break
+                    yield record
+
+    @staticmethod
+    def _bisect(mm, fmt, count, t0):
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('<d', mm, mid * fmt.size)[0] < t0:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # Segmentos
+    def _segment_start(self, timestamp):
+        return int(timestamp // self.segment_seconds * self.segment_seconds)
+
+    def _segment_path(self, channel, start):
+        return os.path.join(self.root, f"{channel}-{start}.seg")
+
+    def _segments(self, channel):
+        segments = []
+        prefix = channel + '-'
+        for name in os.listdir(self.root):
+            if name.startswith(prefix) and name.endswith('.seg'):
+                try:
+                    start = int(name[len(prefix):-4])
+                except ValueError:
+                    continue
+                segments.append((start, os.path.join(self.root, name)))
+        return sorted(segments)
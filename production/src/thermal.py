@@ -0,0 +1,571 @@
+"""Modelo térmico concentrado del casillero: ajuste, pronóstico y simulación de políticas.
+
+    dP/dt = a·(A − P) + b·u                    pad (u: fracción del intervalo con el pad encendido)
+    dA/dt = c + d·A + e·(P − A) + f·v          ambiente (v: ventilador); la sala está a −c/d
+
+Lineal en los parámetros: se ajusta por mínimos cuadrados sobre diferencias de FIT_STEP
+segundos. Cada casillero acumula las ecuaciones normales con olvido exponencial (FORGET
+por fila), así el ajuste es incremental: una fila nueva cuesta una suma de matrices 4x4 y
+el modelo sigue los cambios lentos (estación, puerta abierta más a menudo). Al arrancar
+sin modelo guardado se ajusta de una vez con el histórico en disco (vectorizado con numpy).
+numpy se importa con el primer ajuste o al cargar el modelo guardado, no al importar el módulo:
+el daemon arranca el control sin esperarlo.
+
+El pronóstico integra el modelo en pasos de FIT_STEP (cada ecuación con la otra variable
+fija, solución exacta), y `simulate()` repite la lógica del termostato sobre el modelo para
+comparar políticas con meses simulados en segundos:
+
+    python thermal.py fit                                  ajusta con el histórico y lo guarda
+    python thermal.py whatif --days 90 --lead 0 60 120     compara anticipaciones del termostato
+    python thermal.py whatif --setpoint 38 40 --hysteresis 1 2 --swing 3
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+from actuators import ACTUATORS
+
+FIT_STEP = 30.0
+# Peso de una fila respecto a la siguiente: la información se renueva en ~1/(1-FORGET) filas (unas 8 h)
+FORGET = 0.999
+# Filas con el pad encendido y apagado (en más de la mitad del intervalo) para fiarse del ajuste
+MIN_EXCITED = 10
+REFIT_EVERY = 10
+FORECAST_HORIZON = 300.0
+# Paso del termostato simulado en el pronóstico: varios por intervalo mínimo entre conmutaciones
+FORECAST_STEP = 5.0
+BOOTSTRAP_DAYS = 7
+SIM_STEP = 2.0
+MODEL_FILE = 'thermal.json'
+PAD_TERMS = ('ambient-pad', 'pad_on')
+AMBIENT_TERMS = ('1', 'ambient', 'pad-ambient', 'fan_on')
+
+# Registros de 'samples' y 'events' del almacén (store.CHANNELS) como dtypes de numpy
+SAMPLE_DTYPE = [('time', '<f8'), ('humidity', '<f4'), ('temperature', '<f4'), ('pad_temperature', '<f4')]
+EVENT_DTYPE = [('time', '<f8'), ('pin', 'u1'), ('level', 'u1'), ('source', 'u1')]
+
+
+class LeastSquares:
+    """Mínimos cuadrados con olvido exponencial sobre las ecuaciones normales acumuladas."""
+
+    def __init__(self, terms, forget=FORGET):
+        self.terms = terms
+        self.forget = forget
+        # Las ecuaciones normales se crean con la primera fila (arrays de numpy)
+        self.xtx = None
+        self.xty = None
+        self.yty = 0.0
+        self.weight = 0.0
+        self.rows = 0
+        self.coef = [0.0] * len(terms)
+
+    def add(self, X, y):
+        """Añade las filas de X (n×k) con sus y; la última es la más reciente."""
+        import numpy as np
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        n = len(y)
+        if not n:
+            return
+        if self.xtx is None:
+            k = len(self.terms)
+            self.xtx, self.xty = np.zeros((k, k)), np.zeros(k)
+        weights = self.forget ** np.arange(n - 1, -1, -1, dtype=float)
+        decay = self.forget ** n
+        weighted = X * weights[:, None]
+        self.xtx = decay * self.xtx + weighted.T @ X
+        self.xty = decay * self.xty + weighted.T @ y
+        self.yty = decay * self.yty + float(weights @ (y * y))
+        self.weight = decay * self.weight + float(weights.sum())
+        self.rows += n
+
+    def solve(self):
+        import numpy as np
+        # lstsq y no solve: un término sin variación (ventilador siempre apagado) queda en 0 en vez de fallar
+        self.coef = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return self.coef
+
+    def rmse(self):
+        """Error cuadrático medio del ajuste actual (en las unidades de y), ponderado como el ajuste."""
+        if not self.weight:
+            return None
+        sse = self.yty - 2 * self.coef @ self.xty + self.coef @ self.xtx @ self.coef
+        return math.sqrt(max(sse, 0.0) / self.weight)
+
+    def state(self):
+        return {'xtx': self.xtx.tolist(), 'xty': self.xty.tolist(), 'yty': self.yty,
+                'weight': self.weight, 'rows': self.rows}
+
+    def restore(self, state):
+        import numpy as np
+        xtx, xty = np.array(state['xtx'], dtype=float), np.array(state['xty'], dtype=float)
+        k = len(self.terms)
+        if xtx.shape != (k, k) or xty.shape != (k,):
+            raise ValueError(f"saved fit has {len(xty)} terms, expected {len(self.terms)}")
+        self.xtx, self.xty = xtx, xty
+        self.yty, self.weight, self.rows = float(state['yty']), float(state['weight']), int(state['rows'])
+        self.solve()
+
+
+def pad_features(pad, ambient, pad_on):
+    import numpy as np
+    return np.column_stack((np.subtract(ambient, pad), pad_on))
+
+
+def ambient_features(pad, ambient, fan_on):
+    import numpy as np
+    ambient = np.asarray(ambient, dtype=float)
+    return np.column_stack((np.ones_like(ambient), ambient, np.subtract(pad, ambient), fan_on))
+
+
+def settle(x, k, m, seconds):
+    """x tras `seconds` s con dx/dt = m − k·x (m y k fijos); sin relajación (k ≤ 0) se extrapola la pendiente."""
+    if k > 1e-9:
+        target = m / k
+        return target + (x - target) * math.exp(-k * seconds)
+    return x + (m - k * x) * seconds
+
+
+class ThermalModel:
+    """Modelo de un casillero: ajuste incremental con cada muestra, pronóstico y estado en disco (`path`)."""
+
+    def __init__(self, path=None, step=FIT_STEP, forget=FORGET):
+        self.path = path
+        self.step = step
+        self.pad = LeastSquares(PAD_TERMS, forget)
+        self.ambient = LeastSquares(AMBIENT_TERMS, forget)
+        # Filas con el pad mayormente encendido / apagado: sin las dos no se distingue su efecto
+        self.on_rows = 0
+        self.off_rows = 0
+        self.refits = 0
+        self._pending = 0
+        # Inicio del intervalo en curso: (instante, pad, ambiente, segundos acumulados con pad y ventilador)
+        self._anchor = None
+        # Por relé: segundos encendido hasta la última transición, si está encendido y desde cuándo
+        self._relays = {'pad': [0.0, False, None], 'fan': [0.0, False, None]}
+        self._lock = threading.Lock()
+        # Con `path`, hasta que load() termina no se añaden filas ni se pronostica
+        self.loaded = path is None
+
+    # Ajuste
+    def relay(self, name, on, timestamp):
+        """Transición del pad o del ventilador (suscrito al ActuatorBank): da la fracción exacta encendida."""
+        with self._lock:
+            total, was_on, since = self._relays[name]
+            if was_on and since is not None:
+                total += timestamp - since
+            self._relays[name] = [total, on, timestamp]
+
+    def _on_time(self, timestamp):
+        with self._lock:
+            return tuple(total + (timestamp - since if on and since is not None else 0.0)
+                         for total, on, since in self._relays.values())
+
+    def observe(self, timestamp, pad, ambient):
+        """Una muestra: cada FIT_STEP s añade una fila y cada REFIT_EVERY filas reajusta."""
+        if not self.loaded:
+            return
+        if pad is None or ambient is None:
+            # Sin una de las dos lecturas la fila no tiene sentido: se empieza otra
+            self._anchor = None
+            return
+        if self._anchor is None:
+            self._start(timestamp, pad, ambient)
+            return
+        t0, pad0, ambient0, on0 = self._anchor
+        dt = timestamp - t0
+        if dt < self.step:
+            return
+        if dt <= 1.5 * self.step:
+            on = self._on_time(timestamp)
+            self.add_rows([pad0], [ambient0], [pad], [ambient], [(on[0] - on0[0]) / dt], [(on[1] - on0[1]) / dt], [dt])
+        # Un hueco mayor (daemon parado, sensor caído) no se usa: la pendiente mezclaría demasiado
+        self._start(timestamp, pad, ambient)
+
+    def _start(self, timestamp, pad, ambient):
+        self._anchor = (timestamp, pad, ambient, self._on_time(timestamp))
+
+    def add_rows(self, pad0, ambient0, pad1, ambient1, pad_on, fan_on, dt):
+        """Filas de intervalos (arrays): valores al principio y al final, fracción con cada relé y duración."""
+        import numpy as np
+        pad0, ambient0, dt = np.asarray(pad0, float), np.asarray(ambient0, float), np.asarray(dt, float)
+        pad_on = np.asarray(pad_on, float)
+        self.pad.add(pad_features(pad0, ambient0, pad_on), (np.asarray(pad1, float) - pad0) / dt)
+        self.ambient.add(ambient_features(pad0, ambient0, fan_on), (np.asarray(ambient1, float) - ambient0) / dt)
+        self.on_rows += int(np.count_nonzero(pad_on > 0.5))
+        self.off_rows += int(np.count_nonzero(pad_on <= 0.5))
+        self._pending += len(dt)
+        if self._pending >= REFIT_EVERY:
+            self.refit()
+
+    def refit(self):
+        self._pending = 0
+        if self.pad.rows:
+            self.pad.solve()
+            self.ambient.solve()
+            self.refits += 1
+
+    @property
+    def ready(self):
+        """Con datos de las dos situaciones del pad y un pad que se enfría hacia el ambiente (a > 0)."""
+        return bool(self.loaded and self.on_rows >= MIN_EXCITED and self.off_rows >= MIN_EXCITED
+                    and self.pad.coef[0] > 0)
+
+    # Pronóstico
+    def predict(self, pad, ambient, pad_on, fan_on, seconds, room=None):
+        """(pad, ambiente) dentro de `seconds` s con los relés fijos; `room` sustituye a la sala ajustada."""
+        a, b = self.pad.coef
+        c, d, e, f = self.ambient.coef
+        if room is not None:
+            c = -d * room
+        steps = max(1, math.ceil(seconds / self.step))
+        dt = seconds / steps
+        u, v = float(pad_on), float(fan_on)
+        for _ in range(steps):
+            pad, ambient = (settle(pad, a, a * ambient + b * u, dt),
+                            settle(ambient, e - d, c + e * pad + f * v, dt))
+        return pad, ambient
+
+    def forecast(self, pad, ambient, pad_on, fan_on, seconds=FORECAST_HORIZON, params=None):
+        """Pronóstico publicable, o None sin modelo fiable.
+
+        Con `params` (termostato en automático) los relés siguen al termostato simulado; sin
+        ellos se quedan como están.
+        """
+        if not self.ready:
+            return None
+        if params is None:
+            pad_at, ambient_at = self.predict(pad, ambient, pad_on, fan_on, seconds)
+        else:
+            result = simulate(self, params, seconds / 86400, FORECAST_STEP, pad=pad, ambient=ambient,
+                              pad_on=pad_on, fan_on=fan_on)
+            pad_at, ambient_at = result['pad_temperature'], result['temperature']
+        return {'seconds': seconds, 'pad_temperature': round(float(pad_at), 1), 'temperature': round(float(ambient_at), 1)}
+
+    def errors(self):
+        """Error cuadrático medio del ajuste por canal, en °C por intervalo de FIT_STEP s (None sin datos)."""
+        return {channel: None if rmse is None else round(rmse * self.step, 3)
+                for channel, rmse in (('pad_temperature', self.pad.rmse()), ('temperature', self.ambient.rmse()))}
+
+    def summary(self):
+        """Parámetros con sentido físico: constantes de tiempo, subida del pad con el calefactor, sala..."""
+        a, b = (float(x) for x in self.pad.coef)
+        c, d, e, f = (float(x) for x in self.ambient.coef)
+        errors = self.errors()
+        return {
+            'rows': self.pad.rows, 'on_rows': self.on_rows, 'off_rows': self.off_rows, 'ready': self.ready,
+            'pad_tau_s': round(1 / a, 1) if a > 0 else None,
+            'pad_rise_c': round(b / a, 2) if a > 0 else None,
+            'room_c': round(-c / d, 2) if d < 0 else None,
+            'ambient_tau_s': round(-1 / d, 1) if d < 0 else None,
+            'fan_c_per_h': round(f * 3600, 2),
+            'rmse_pad_c': errors['pad_temperature'],
+            'rmse_ambient_c': errors['temperature'],
+        }
+
+    # Histórico en disco
+    def fit_store(self, store, pad, fan, t0, t1):
+        """Ajuste de una vez con las muestras y transiciones de `store` entre t0 y t1; devuelve las filas.
+
+        `pad` y `fan` son (pin, nivel GPIO activo) de cada relé, como se guardan sus transiciones.
+        """
+        import numpy as np
+        samples = np.frombuffer(b''.join(store.blocks('samples', t0, t1)), dtype=SAMPLE_DTYPE)
+        # Las transiciones desde el principio: el estado de un relé es el de su última transición
+        events = np.frombuffer(b''.join(store.blocks('events', 0.0, t1)), dtype=EVENT_DTYPE)
+        rows = history_rows(samples, events, pad, fan, self.step)
+        if rows is None:
+            return 0
+        self.add_rows(*rows)
+        self.refit()
+        return len(rows[0])
+
+    def state(self):
+        return {'step': self.step, 'pad': self.pad.state(), 'ambient': self.ambient.state(),
+                'on_rows': self.on_rows, 'off_rows': self.off_rows}
+
+    def load(self, store=None, relays=None, now=None):
+        """Recupera el ajuste guardado; sin él y con `store`, ajusta con sus últimos BOOTSTRAP_DAYS días.
+
+        `relays` son los (pin, nivel activo) del pad y del ventilador, como en fit_store(). Hasta
+        que termina observe() descarta las muestras, así que se puede llamar con el muestreador
+        en marcha. Devuelve las filas ajustadas con el histórico.
+        """
+        try:
+            self._restore()
+            if store is None or self.pad.rows:
+                return 0
+            now = time.time() if now is None else now
+            return self.fit_store(store, *relays, now - BOOTSTRAP_DAYS * 86400, now)
+        finally:
+            self.loaded = True
+
+    def _restore(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            if not isinstance(state, dict):
+                raise ValueError(f"expected a JSON object, got {type(state).__name__}")
+            if state.get('step') != self.step:
+                return
+            self.pad.restore(state['pad'])
+            self.ambient.restore(state['ambient'])
+            self.on_rows, self.off_rows = int(state['on_rows']), int(state['off_rows'])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"thermal: modelo ilegible en {self.path} ({e}), se empieza de cero")
+            self.pad = LeastSquares(PAD_TERMS, self.pad.forget)
+            self.ambient = LeastSquares(AMBIENT_TERMS, self.ambient.forget)
+            self.on_rows = self.off_rows = 0
+
+    def save(self):
+        if not self.path or not self.loaded or not self.pad.rows:
+            return
+        tmp = self.path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.state(), f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"thermal: no se pudo guardar {self.path}: {e}")
+
+
+def relay_on_time(events, relay, times):
+    """Segundos acumulados con el relé (pin, nivel activo) activo hasta cada instante de `times` (vectorizado)."""
+    import numpy as np
+    pin, active_level = relay
+    mine = events[events['pin'] == pin]
+    if not len(mine):
+        return np.zeros(len(times))
+    at = mine['time']
+    on = (mine['level'] == active_level).astype(float)
+    # Tiempo activo acumulado en cada transición; entre transiciones crece si el relé está activo
+    cumulative = np.concatenate(([0.0], np.cumsum(on[:-1] * np.diff(at))))
+    index = np.searchsorted(at, times, side='right') - 1
+    before = index < 0
+    index = np.maximum(index, 0)
+    result = cumulative[index] + on[index] * (times - at[index])
+    result[before] = 0.0
+    return result
+
+
+def history_rows(samples, events, pad, fan, step=FIT_STEP):
+    """Filas de ajuste a partir de arrays de muestras y transiciones: la primera muestra de cada intervalo de `step` s."""
+    import numpy as np
+    valid = samples[~np.isnan(samples['temperature']) & ~np.isnan(samples['pad_temperature'])]
+    if len(valid) < 2:
+        return None
+    _, first = np.unique(valid['time'] // step, return_index=True)
+    anchors = valid[first]
+    times = anchors['time']
+    dt = np.diff(times)
+    keep = (dt >= 0.5 * step) & (dt <= 1.5 * step)
+    if not keep.any():
+        return None
+    pad_time = np.diff(relay_on_time(events, pad, times))
+    fan_time = np.diff(relay_on_time(events, fan, times))
+    pad, ambient = anchors['pad_temperature'].astype(float), anchors['temperature'].astype(float)
+    return (pad[:-1][keep], ambient[:-1][keep], pad[1:][keep], ambient[1:][keep],
+            pad_time[keep] / dt[keep], fan_time[keep] / dt[keep], dt[keep])
+
+
+# Simulación de políticas
+def simulate(model, params, days, step=SIM_STEP, room=None, swing=0.0, pad=None, ambient=None,
+             pad_on=False, fan_on=False):
+    """Termostato en automático (thermostat.py, con `predictive_lead`) sobre el modelo durante `days` días.
+
+    `room` fija la temperatura de la sala (por defecto la ajustada) y `swing` le suma una
+    oscilación diaria de ±`swing` °C. Se parte de `pad`, `ambient` y los relés dados (por
+    defecto, todo a la temperatura de la sala y apagado). Devuelve las métricas de la
+    política y las temperaturas al final.
+    """
+    a, b = (float(x) for x in model.pad.coef)
+    c, d, e, f = (float(x) for x in model.ambient.coef)
+    if room is not None:
+        c = -d * room
+    elif d < 0:
+        room = -c / d
+    elif pad is None or ambient is None:
+        raise ValueError("the ambient fit has no stable room temperature; pass room and the initial temperatures")
+    setpoint, half_band = params['pad_setpoint'], params['pad_hysteresis'] / 2
+    low, high = setpoint - half_band, setpoint + half_band
+    cutoff, min_switch = params['pad_cutoff'], params['min_switch_interval']
+    fan_high = params['ambient_max']
+    fan_low = fan_high - params['fan_hysteresis']
+    lead = params.get('predictive_lead', 0.0)
+    lead_steps = max(1, math.ceil(lead / model.step)) if lead else 0
+    lead_dt = lead / lead_steps if lead_steps else 0.0
+    k_pad, k_ambient = a, e - d
+    decay_pad = math.exp(-k_pad * step) if k_pad > 1e-9 else None
+    decay_ambient = math.exp(-k_ambient * step) if k_ambient > 1e-9 else None
+    sin, tau = math.sin, 2 * math.pi / 86400
+
+    pad = room if pad is None else pad
+    ambient = room if ambient is None else ambient
+    overtemp = False
+    pad_changed = fan_changed = -math.inf
+    n = int(days * 86400 / step)
+    pad_switches = fan_switches = 0
+    on_steps = fan_steps = in_band = 0
+    abs_error = overshoot = 0.0
+    peak = -math.inf
+    for i in range(n):
+        now = i * step
+        # Termostato: corte de seguridad y banda muerta, sobre el valor previsto a `lead` s si se anticipa
+        if pad >= cutoff:
+            overtemp = True
+        elif pad < setpoint:
+            overtemp = False
+        if overtemp:
+            if pad_on:
+                pad_on, pad_changed = False, now
+                pad_switches += 1
+            seen_pad, seen_ambient = pad, ambient
+        elif lead_steps:
+            seen_pad, seen_ambient = pad, ambient
+            u, v = float(pad_on), float(fan_on)
+            for _ in range(lead_steps):
+                seen_pad, seen_ambient = (settle(seen_pad, a, a * seen_ambient + b * u, lead_dt),
+                                          settle(seen_ambient, k_ambient, c + e * seen_pad + f * v, lead_dt))
+        else:
+            seen_pad, seen_ambient = pad, ambient
+        if not overtemp and now - pad_changed >= min_switch:
+            if not pad_on and seen_pad < low:
+                pad_on, pad_changed = True, now
+                pad_switches += 1
+            elif pad_on and seen_pad > high:
+                pad_on, pad_changed = False, now
+                pad_switches += 1
+        if now - fan_changed >= min_switch:
+            if not fan_on and seen_ambient > fan_high:
+                fan_on, fan_changed = True, now
+                fan_switches += 1
+            elif fan_on and seen_ambient < fan_low:
+                fan_on, fan_changed = False, now
+                fan_switches += 1
+
+        # Planta: cada ecuación con la otra variable fija durante el paso (solución exacta)
+        c_now = c - d * swing * sin(tau * now) if swing else c
+        m_pad = a * ambient + b * pad_on
+        m_ambient = c_now + e * pad + f * fan_on
+        if decay_pad is not None:
+            target = m_pad / k_pad
+            pad = target + (pad - target) * decay_pad
+        else:
+            pad += (m_pad - k_pad * pad) * step
+        if decay_ambient is not None:
+            target = m_ambient / k_ambient
+            ambient = target + (ambient - target) * decay_ambient
+        else:
+            ambient += (m_ambient - k_ambient * ambient) * step
+
+        on_steps += pad_on
+        fan_steps += fan_on
+        error = pad - setpoint
+        abs_error += abs(error)
+        if low <= pad <= high:
+            in_band += 1
+        if error > half_band:
+            overshoot += error - half_band
+        peak = max(peak, pad)
+    n = max(n, 1)
+    return {
+        'pad_error_c': abs_error / n,
+        'in_band': in_band / n,
+        'overshoot_c': overshoot / n,
+        'peak_c': peak,
+        'pad_duty': on_steps / n,
+        'pad_switches_per_day': pad_switches / days,
+        'fan_duty': fan_steps / n,
+        'fan_switches_per_day': fan_switches / days,
+        'pad_temperature': pad,
+        'temperature': ambient,
+    }
+
+
+def fit_history(model, unit, data_dir, days=BOOTSTRAP_DAYS):
+    """Ajusta `model` con los últimos `days` días del almacén del casillero (config de lockers.json)."""
+    from hardware import FakeGPIO
+    from store import SegmentStore
+    # Niveles activos como los guarda el ActuatorBank (los de RPi.GPIO: LOW = 0, HIGH = 1)
+    relays = [(unit[ACTUATORS[name][0]], getattr(FakeGPIO, ACTUATORS[name][1])) for name in ('pad', 'fan')]
+    store = SegmentStore(os.path.join(data_dir, unit['id']))
+    now = time.time()
+    return model.fit_store(store, *relays, now - days * 86400, now)
+
+
+def main(argv=None):
+    from controller import DATA_DIR, load_config
+    from thermostat import DEFAULTS
+
+    parser = argparse.ArgumentParser(description="Modelo térmico de los casilleros: ajuste y simulación de políticas")
+    parser.add_argument('command', choices=('fit', 'whatif'))
+    parser.add_argument('--lockers', help="ids separados por comas (por defecto, todos los de lockers.json)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--history-days', type=float, default=BOOTSTRAP_DAYS, help="días de histórico para ajustar")
+    parser.add_argument('--days', type=float, default=30, help="días simulados por política")
+    parser.add_argument('--step', type=float, default=SIM_STEP, help="segundos por paso de simulación")
+    parser.add_argument('--setpoint', type=float, nargs='+', help="objetivos del pad a comparar")
+    parser.add_argument('--hysteresis', type=float, nargs='+', help="bandas muertas a comparar")
+    parser.add_argument('--min-switch', type=float, nargs='+', help="intervalos mínimos entre conmutaciones a comparar")
+    parser.add_argument('--lead', type=float, nargs='+', help="anticipaciones del termostato (s) a comparar")
+    parser.add_argument('--room', type=float, help="temperatura de la sala (por defecto, la ajustada)")
+    parser.add_argument('--swing', type=float, default=0.0, help="oscilación diaria de la sala (±°C)")
+    args = parser.parse_args(argv)
+
+    units = load_config()['lockers']
+    if args.lockers:
+        wanted = args.lockers.split(',')
+        unknown = set(wanted) - {unit['id'] for unit in units}
+        if unknown:
+            parser.error(f"unknown lockers: {', '.join(sorted(unknown))}")
+        units = [unit for unit in units if unit['id'] in wanted]
+
+    for unit in units:
+        path = os.path.join(args.data_dir, unit['id'], MODEL_FILE)
+        if args.command == 'fit':
+            # Desde cero con el histórico: el modelo guardado se reemplaza
+            model = ThermalModel()
+            model.path = path
+            started = time.perf_counter()
+            rows = fit_history(model, unit, args.data_dir, args.history_days)
+            print(f"{unit['id']}: {rows} filas ajustadas en {time.perf_counter() - started:.2f} s")
+            model.save()
+        else:
+            model = ThermalModel(path)
+            model.load()
+            if not model.pad.rows:
+                fit_history(model, unit, args.data_dir, args.history_days)
+        print(f"{unit['id']}: {json.dumps(model.summary())}")
+        if args.command != 'whatif':
+            continue
+        if not model.ready:
+            print(f"{unit['id']}: sin modelo fiable (faltan intervalos con el pad encendido y apagado)")
+            continue
+        base = {**DEFAULTS, **unit.get('thermostat', {})}
+        grid = itertools.product(args.setpoint or [base['pad_setpoint']], args.hysteresis or [base['pad_hysteresis']],
+                                 args.min_switch or [base['min_switch_interval']], args.lead or [base['predictive_lead']])
+        print(f"{'objetivo':>9}{'banda':>7}{'mín. s':>8}{'antic. s':>9}{'error':>8}{'en banda':>10}{'exceso':>8}"
+              f"{'pico':>7}{'pad %':>7}{'conm./d':>9}{'vent. %':>8}{'tiempo s':>10}")
+        for setpoint, hysteresis, min_switch, lead in grid:
+            params = dict(base, pad_setpoint=setpoint, pad_hysteresis=hysteresis,
+                          min_switch_interval=min_switch, predictive_lead=lead)
+            started = time.perf_counter()
+            result = simulate(model, params, args.days, args.step, args.room, args.swing)
+            print(f"{setpoint:>9.1f}{hysteresis:>7.1f}{min_switch:>8.0f}{lead:>9.0f}{result['pad_error_c']:>8.2f}"
+                  f"{result['in_band'] * 100:>9.1f}%{result['overshoot_c']:>8.3f}{result['peak_c']:>7.1f}"
+                  f"{result['pad_duty'] * 100:>7.1f}{result['pad_switches_per_day']:>9.0f}"
+                  f"{result['fan_duty'] * 100:>8.1f}{time.perf_counter() - started:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
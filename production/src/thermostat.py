@@ -0,0 +1,103 @@
+import clock
+from actuators import ACTUATORS
+
+# Parámetros por defecto; cada casillero puede ajustarlos en lockers.json ("thermostat": {...})
+DEFAULTS = {
+    'auto': False,              # control automático del pad y el ventilador
+    'pad_setpoint': 40.0,       # °C objetivo del pad
+    'pad_hysteresis': 1.0,      # banda muerta total alrededor del objetivo
+    'ambient_max': 30.0,        # °C ambiente a partir del cual se enciende el ventilador
+    'fan_hysteresis': 1.0,
+    'pad_cutoff': 50.0,         # corte de seguridad por sobretemperatura del pad
+    'stale_after': 10.0,        # s sin lectura válida del pad antes de cortar
+    'min_switch_interval': 20.0,  # s mínimos entre conmutaciones de un mismo relé
+    'predictive_lead': 0.0,     # s de anticipación con el modelo térmico (thermal.py); 0 decide con lo medido
+}
+
+
+class Thermostat:
+    """Control por histéresis del pad y el ventilador de un casillero, con cortes de seguridad.
+
+    Los cortes (pad sobre `pad_cutoff` o sin lectura reciente) actúan también en modo manual
+    y apagan el pad sin respetar el intervalo mínimo entre conmutaciones. El corte por
+    sobretemperatura se mantiene hasta que el pad baja de `pad_setpoint`.
+
+    Con `predictive_lead` y un modelo térmico fiable, la banda muerta se aplica a la
+    temperatura prevista dentro de ese tiempo con los relés como están: el pad se apaga
+    antes de pasarse y se enciende antes de quedarse corto. Los cortes usan siempre lo medido.
+    """
+
+    def __init__(self, unit, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown thermostat parameters: {', '.join(sorted(unknown))}")
+        self.unit = unit
+        self.params = {**DEFAULTS, **params}
+        self.auto = self.params['auto']
+        self.fault = None
+        self.suppressed = 0
+        # Conmutaciones que la anticipación adelantó (con lo medido aún no tocaban)
+        self.preemptive = 0
+        self._overtemp = False
+
+    def step(self, now=None):
+        now = clock.monotonic() if now is None else now
+        p = self.params
+        pad = self.unit.reading('pad_temperature', p['stale_after'])
+        ambient = self.unit.reading('temperature', p['stale_after'])
+
+        # Seguridad: siempre activa
+        if pad is not None and pad >= p['pad_cutoff']:
+            self._overtemp = True
+        elif pad is not None and pad < p['pad_setpoint']:
+            self._overtemp = False
+        if pad is None:
+            self.fault = 'sensor del pad sin lecturas'
+        elif self._overtemp:
+            self.fault = f"sobretemperatura del pad (límite {p['pad_cutoff']:.0f}°C)"
+        else:
+            self.fault = None
+        if self.fault:
+            self._switch('pad', False, now, force=True)
+
+        if not self.auto:
+            return
+        seen_pad, seen_ambient = self._anticipate(pad, ambient)
+        if not self.fault:
+            half_band = p['pad_hysteresis'] / 2
+            if seen_pad < p['pad_setpoint'] - half_band:
+                self._switch('pad', True, now, preemptive=pad >= p['pad_setpoint'] - half_band)
+            elif seen_pad > p['pad_setpoint'] + half_band:
+                self._switch('pad', False, now, preemptive=pad <= p['pad_setpoint'] + half_band)
+        if ambient is not None:
+            if seen_ambient > p['ambient_max']:
+                self._switch('fan', True, now, preemptive=ambient <= p['ambient_max'])
+            elif seen_ambient < p['ambient_max'] - p['fan_hysteresis']:
+                self._switch('fan', False, now, preemptive=ambient >= p['ambient_max'] - p['fan_hysteresis'])
+
+    def _anticipate(self, pad, ambient):
+        """(pad, ambiente) sobre los que decidir: lo previsto a `predictive_lead` s o lo medido."""
+        lead = self.params['predictive_lead']
+        model = getattr(self.unit, 'thermal', None)
+        if not lead or model is None or not model.ready or pad is None or ambient is None:
+            return pad, ambient
+        states = self.unit.actuators.states()
+        return model.predict(pad, ambient, states['pad'] == ACTUATORS['pad'][2], states['fan'] == ACTUATORS['fan'][2], lead)
+
+    def _switch(self, name, on, now, force=False, preemptive=False):
+        actuators = self.unit.actuators
+        state = ACTUATORS[name][2] if on else ACTUATORS[name][3]
+        if actuators.state(name) == state:
+            return
+        # Una alarma activa retiene el relé en el estado de su acción (el corte de seguridad coincide: pad apagado)
+        held = self.unit.rule_holds.get(name)
+        if held is not None and held != state:
+            return
+        # La permanencia mínima cuenta cualquier transición del relé, también las manuales
+        last = actuators.changed_at.get(name)
+        if not force and last is not None and now - last < self.params['min_switch_interval']:
+            self.suppressed += 1
+            return
+        if preemptive:
+            self.preemptive += 1
+        actuators.set(name, state, 'thermostat')
@@ -0,0 +1,270 @@
+"""Trazas de sensores y actuadores: grabación en campo y backend para reproducirlas.
+
+Una traza es un gzip con una cabecera (magia + configuración de casilleros en JSON,
+una línea cada una) seguida de registros binarios de tamaño fijo:
+
+    timestamp (d)  kind (B)  unit (B)  status (B)  aux (B)  latency (f)  a (f)  b (f)
+
+    DHT    status 0 ok / 1 error             a = humedad, b = temperatura
+    W1     status 0 ok / 1 error / 2 crc NO / 3 ilegible   a = °C leídos (w1_slave o temperature)
+    ACT    status = índice en SOURCES, aux = índice en ACTUATORS, a = 1.0 si activo
+    CYCLE  fin de un ciclo del muestreador (timestamp de las muestras)
+
+24 bytes por registro antes de comprimir: una semana de un casillero son ~15 MB.
+"""
+import gzip
+import json
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque, namedtuple
+
+from actuators import ACTUATORS, SOURCES
+from hardware import FakeGPIO
+
+MAGIC = b'TEIKIT-TRACE 1\n'
+RECORD = struct.Struct('<dBBBBfff')
+DHT, W1, ACT, CYCLE = range(4)
+OK, ERROR, CRC_ERROR, GARBLED = range(4)
+ACTUATOR_NAMES = tuple(ACTUATORS)
+
+Record = namedtuple('Record', ['timestamp', 'kind', 'unit', 'status', 'aux', 'latency', 'a', 'b'])
+
+_W1_TEMP = re.compile(r't=(-?\d+)')
+
+
+class TraceWriter:
+    """Escribe registros desde cualquier hilo; `close()` vacía el gzip."""
+
+    def __init__(self, path, config):
+        self.path = path
+        self.lockers = config['lockers']
+        self.records = 0
+        self._file = gzip.open(path, 'wb', compresslevel=6)
+        self._file.write(MAGIC)
+        self._file.write(json.dumps({'lockers': self.lockers}).encode() + b'\n')
+        self._lock = threading.Lock()
+
+    def write(self, kind, unit, status=OK, aux=0, latency=0.0, a=0.0, b=0.0, timestamp=None):
+        record = RECORD.pack(time.time() if timestamp is None else timestamp, kind, unit, status, aux,
+                             latency, float('nan') if a is None else a, float('nan') if b is None else b)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(record)
+                self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    """(config, iterador de Record) de una traza grabada."""
+    f = gzip.open(path, 'rb')
+    if f.readline() != MAGIC:
+        f.close()
+        raise ValueError(f"{path}: not a teikit trace")
+    config = json.loads(f.readline())
+
+    def records():
+        with f:
+            while True:
+                chunk = f.read(RECORD.size * 4096)
+                if not chunk:
+                    return
+                if len(chunk) % RECORD.size:
+                    # Traza cortada (corte de luz): se descarta el registro incompleto
+                    chunk = chunk[:len(chunk) - len(chunk) % RECORD.size]
+                for fields in RECORD.iter_unpack(chunk):
+                    yield Record(*fields)
+    return config, records()
+
+
+# Grabación: envoltorio del backend real o simulado
+class _RecordingDHT22:
+    def __init__(self, sensor, trace, unit):
+        self.sensor = sensor
+        self.trace = trace
+        self.unit = unit
+        self._temperature = None
+
+    @property
+    def humidity(self):
+        # Una lectura completa por acceso a humidity, como hace DHT22Reader
+        start = time.perf_counter()
+        try:
+            humidity, self._temperature = self.sensor.humidity, self.sensor.temperature
+        except RuntimeError:
+            self.trace.write(DHT, self.unit, ERROR, latency=time.perf_counter() - start)
+            raise
+        self.trace.write(DHT, self.unit, OK, latency=time.perf_counter() - start, a=humidity, b=self._temperature)
+        return humidity
+
+    @property
+    def temperature(self):
+        return self._temperature
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+
+class RecordingBackend:
+    """Pasa todo al backend `inner` y graba cada lectura de sensor con su latencia y su resultado."""
+
+    def __init__(self, inner, trace):
+        self.inner = inner
+        self.name = inner.name
+        self.GPIO = inner.GPIO
+        self.trace = trace
+        self._dht_units = {locker['dht22']: i for i, locker in enumerate(trace.lockers)}
+        # Rutas de lectura de temperatura (w1_slave, temperature) -> casillero
+        self._w1_units = {}
+        self._serial_units = {locker['ds18b20']: i for i, locker in enumerate(trace.lockers)}
+
+    def bind_unit(self, config):
+        self.inner.bind_unit(config)
+
+    def dht22(self, pin):
+        return _RecordingDHT22(self.inner.dht22(pin), self.trace, self._dht_units[pin])
+
+    def w1_device_path(self, serial, attribute):
+        path = self.inner.w1_device_path(serial, attribute)
+        if attribute in ('w1_slave', 'temperature') and serial in self._serial_units:
+            self._w1_units[path] = self._serial_units[serial]
+        return path
+
+    def w1_master_path(self, bus, attribute):
+        return self.inner.w1_master_path(bus, attribute)
+
+    def w1_slave_path(self, serial):
+        return self.w1_device_path(serial, 'w1_slave')
+
+    def w1_devices(self):
+        return self.inner.w1_devices()
+
+    def write_w1(self, path, text):
+        self.inner.write_w1(path, text)
+
+    def read_w1(self, path):
+        unit = self._w1_units.get(path)
+        if unit is None:
+            return self.inner.read_w1(path)
+        start = time.perf_counter()
+        try:
+            lines = self.inner.read_w1(path)
+        except FileNotFoundError:
+            # Atributo inexistente en este kernel: el driver cambia de método, no es una lectura fallida
+            raise
+        except OSError:
+            self.trace.write(W1, unit, ERROR, latency=time.perf_counter() - start)
+            raise
+        latency = time.perf_counter() - start
+        if os.path.basename(path) == 'temperature':
+            match = re.fullmatch(r'\s*(-?\d+)\s*', lines[0]) if lines else None
+            status = OK
+        else:
+            match = _W1_TEMP.search(lines[1]) if len(lines) > 1 else None
+            status = OK if lines[0].strip().endswith('YES') else CRC_ERROR
+        if match is None:
+            self.trace.write(W1, unit, GARBLED, latency=latency)
+        else:
+            self.trace.write(W1, unit, status, latency=latency, a=int(match.group(1)) / 1000.0)
+        return lines
+
+    def attach(self, controller):
+        """Graba también las transiciones de relés y el final de cada ciclo de muestreo."""
+        for i, unit in enumerate(controller.units):
+            unit.actuators.subscribe(lambda event, i=i: self._record_event(i, event))
+        controller.sampler.listeners.append(
+            lambda samples: self.trace.write(CYCLE, 0, timestamp=samples[0].timestamp) if samples else None)
+
+    def _record_event(self, unit, event):
+        active = event.state == ACTUATORS[event.name][2]
+        self.trace.write(ACT, unit, SOURCES.index(event.source), ACTUATOR_NAMES.index(event.name),
+                         a=1.0 if active else 0.0, timestamp=event.timestamp)
+
+
+# Reproducción: backend sin hardware alimentado por el reproductor
+class ReplayDHT22:
+    """Devuelve el registro que el reproductor deja en `pending` (o lanza RuntimeError si fue un error)."""
+
+    def __init__(self):
+        self.pending = None
+        self._temperature = None
+
+    @property
+    def humidity(self):
+        record, self.pending = self.pending, None
+        if record is None or record.status != OK:
+            raise RuntimeError("replayed DHT22 error")
+        self._temperature = record.b
+        return record.a
+
+    @property
+    def temperature(self):
+        return self._temperature
+
+    def exit(self):
+        pass
+
+
+class ReplayBackend:
+    """Backend sin hardware: GPIO en memoria y sensores que devuelven lo grabado.
+
+    No hay conversión masiva ni resolución que fijar: cada lectura de sonda consume
+    el siguiente registro grabado, ya sea por `temperature` o por `w1_slave`.
+    """
+    name = 'replay'
+
+    def __init__(self, config):
+        self.GPIO = FakeGPIO()
+        self.dht = {locker['dht22']: ReplayDHT22() for locker in config['lockers']}
+        # Lecturas de DS18B20 pendientes por serie; el ciclo siguiente las consume
+        self.w1 = {locker['ds18b20']: deque() for locker in config['lockers']}
+
+    def bind_unit(self, config):
+        pass
+
+    def dht22(self, pin):
+        return self.dht[pin]
+
+    def w1_device_path(self, serial, attribute):
+        return f"{serial}/{attribute}"
+
+    def w1_master_path(self, bus, attribute):
+        return f"{bus}/{attribute}"
+
+    def w1_slave_path(self, serial):
+        return self.w1_device_path(serial, 'w1_slave')
+
+    def w1_devices(self):
+        # Las sondas de la grabación, siempre conectadas
+        return sorted(self.w1)
+
+    def write_w1(self, path, text):
+        if not path.endswith('/resolution'):
+            raise FileNotFoundError(path)
+
+    def read_w1(self, path):
+        serial, _, attribute = path.partition('/')
+        if serial not in self.w1:
+            raise FileNotFoundError(path)
+        pending = self.w1[serial]
+        if not pending:
+            raise OSError(f"no replayed reading for {serial}")
+        record = pending.popleft()
+        if record.status == ERROR:
+            raise OSError(f"replayed read error for {serial}")
+        if attribute == 'temperature':
+            if record.status != OK:
+                raise OSError(f"replayed CRC error for {serial}")
+            return [f"{int(round(record.a * 1000))}\n"]
+        if record.status == GARBLED:
+            return ['00 00 00 00 00 00 00 00 00 : crc=00 NO\n', '\n']
+        crc = 'YES' if record.status == OK else 'NO'
+        return [f'00 00 00 00 00 00 00 00 00 : crc=00 {crc}\n',
+                f'00 00 00 00 00 00 00 00 00 t={int(round(record.a * 1000))}\n']
@@ -0,0 +1,495 @@
+"""Envío de telemetría a un colector HTTP con almacenamiento local (store-and-forward).
+
+    python daemon.py --uplink http://colector:9000/ingest     envía muestras, relés y alarmas
+    python uplink.py collector --listen 127.0.0.1:9000        colector de pruebas (ver Collector)
+
+- El muestreador y los relés solo añaden a una cola en memoria: nunca esperan a la red ni al disco.
+- El hilo 'uplink' junta los registros en lotes (BATCH_RECORDS o BATCH_SECONDS), los numera, los
+  comprime con gzip y los escribe en el spool (segmentos en disco con CRC). Un lote se envía tal
+  como quedó escrito: un reintento manda los mismos bytes y los mismos números de secuencia, y el
+  colector descarta los (dispositivo, época, secuencia) que ya tiene. La época es un número
+  aleatorio que nace con el spool: si se borra el directorio de datos o se cambia la SD las
+  secuencias vuelven a 1, pero con otra época, y el colector no las toma por repetidas.
+- Varios lotes viajan en un mismo POST: miembros gzip concatenados, que siguen siendo un gzip válido
+  de líneas JSON. Tras un fallo se reintenta con espera exponencial (con dispersión) hasta MAX_BACKOFF.
+- Lo confirmado se apunta en `acked`; los segmentos confirmados se borran. Sin red durante días el
+  spool no pasa de `max_bytes`: se descartan los segmentos más viejos y se avisa.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import clock
+import metrics
+
+UPLINK_ENV = 'TEIKIT_UPLINK'
+DEVICE_ENV = 'TEIKIT_DEVICE'
+BATCH_RECORDS = 1000
+BATCH_SECONDS = 30.0
+SEGMENT_BYTES = 1024 * 1024
+MAX_SPOOL_BYTES = 64 * 1024 * 1024
+MAX_POST_BYTES = 256 * 1024
+QUEUE_LIMIT = 100000
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 300.0
+TIMEOUT = 10.0
+LOG_AFTER_FAILURES = 3
+# Marco del spool: magia, primera y última secuencia, longitud y CRC32 del gzip que sigue
+FRAME = struct.Struct('<4sQQII')
+FRAME_MAGIC = b'TKUP'
+
+
+class Spool:
+    """Lotes comprimidos pendientes de confirmar, en segmentos de solo-anexado en `root`.
+
+    Al abrir se validan los marcos: lo que quedó a medias por un corte de energía se recorta.
+    """
+
+    def __init__(self, root, max_bytes=MAX_SPOOL_BYTES, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dropped = 0
+        os.makedirs(root, exist_ok=True)
+        self.epoch = self._load_epoch()
+        self.acked = self._load_acked()
+        # Marcos sin confirmar, en orden: (ruta, desplazamiento, primera, última, longitud total)
+        self.frames = deque()
+        self.segments = {}
+        self.next_seq = self.acked + 1
+        for path in self._segment_paths():
+            self._recover(path)
+        self._cleanup()
+
+    def _load_epoch(self):
+        path = os.path.join(self.root, 'epoch')
+        try:
+            with open(path) as f:
+                epoch = f.read().strip()
+            if epoch:
+                return epoch
+        except FileNotFoundError:
+            pass
+        epoch = os.urandom(8).hex()
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(f"{epoch}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        return epoch
+
+    def _load_acked(self):
+        try:
+            with open(os.path.join(self.root, 'acked')) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _segment_paths(self):
+        return sorted(os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith('.spool'))
+
+    def _recover(self, path):
+        valid = 0
+        with open(path, 'rb') as f:
+            data = f.read()
+        while valid + FRAME.size <= len(data):
+            magic, first, last, length, crc = FRAME.unpack_from(data, valid)
+            end = valid + FRAME.size + length
+            if magic != FRAME_MAGIC or end > len(data) or zlib.crc32(data[valid + FRAME.size:end]) != crc:
+                break
+            if last > self.acked:
+                self.frames.append((path, valid, first, last, end - valid))
+            self.next_seq = max(self.next_seq, last + 1)
+            valid = end
+        if valid < len(data):
+            print(f"uplink: {os.path.basename(path)} recortado de {len(data)} a {valid} bytes (escritura incompleta)")
+            with open(path, 'r+b') as f:
+                f.truncate(valid)
+        self.segments[path] = valid
+
+    def _active(self):
+        return max(self.segments) if self.segments else None
+
+    def size(self):
+        # Copias: las métricas lo leen desde otros hilos
+        return sum(list(self.segments.values()))
+
+    def backlog(self):
+        """Registros escritos y aún sin confirmar."""
+        return sum(last - max(first, self.acked + 1) + 1 for _, _, first, last, _ in list(self.frames))
+
+    def append(self, records):
+        """Numera los registros (dicts), los escribe como un marco y devuelve la última secuencia."""
+        first = self.next_seq
+        lines = ''.join(json.dumps({**record, 'epoch': self.epoch, 'seq': first + i}, separators=(',', ':')) + '\n'
+                        for i, record in enumerate(records))
+        payload = gzip.compress(lines.encode(), compresslevel=6, mtime=0)
+        last = first + len(records) - 1
+        path = self._active()
+        if path is None or self.segments[path] + FRAME.size + len(payload) > self.segment_bytes:
+            path = os.path.join(self.root, f"{first:020d}.spool")
+            self.segments[path] = 0
+        offset = self.segments[path]
+        with open(path, 'ab') as f:
+            f.write(FRAME.pack(FRAME_MAGIC, first, last, len(payload), zlib.crc32(payload)) + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.segments[path] = offset + FRAME.size + len(payload)
+        self.frames.append((path, offset, first, last, FRAME.size + len(payload)))
+        self.next_seq = last + 1
+        self._enforce_limit()
+        return last
+
+    def _enforce_limit(self):
+        # Sin red durante días: se sacrifica lo más viejo, nunca el segmento en curso
+        while self.size() > self.max_bytes and len(self.segments) > 1:
+            oldest = min(self.segments)
+            lost = [frame for frame in self.frames if frame[0] == oldest]
+            if lost:
+                self.dropped += sum(last - max(first, self.acked + 1) + 1 for _, _, first, last, _ in lost)
+                self._ack(lost[-1][3])
+            print(f"uplink: spool por encima de {self.max_bytes // (1024 * 1024)} MiB, se descarta "
+                  f"{os.path.basename(oldest)} ({self.dropped} registros perdidos en total)")
+            self._remove(oldest)
+
+    def pending(self, max_bytes=MAX_POST_BYTES):
+        """Primeros marcos sin confirmar, hasta `max_bytes`: (primera, última, gzip concatenado) o None."""
+        if not self.frames:
+            return None
+        chunks, size, first, last = [], 0, None, None
+        handles = {}
+        try:
+            for path, offset, frame_first, frame_last, length in self.frames:
+                if chunks and size + length > max_bytes:
+                    break
+                if path not in handles:
+                    handles[path] = open(path, 'rb')
+                f = handles[path]
+                f.seek(offset + FRAME.size)
+                chunks.append(f.read(length - FRAME.size))
+                size += length
+                first = frame_first if first is None else first
+                last = frame_last
+        finally:
+            for f in handles.values():
+                f.close()
+        return first, last, b''.join(chunks)
+
+    def ack(self, last):
+        """El colector tiene hasta `last`: se apunta en disco y se borran los segmentos ya enviados."""
+        self._ack(last)
+        self._cleanup()
+
+    def _cleanup(self):
+        active = self._active()
+        for path in list(self.segments):
+            if path != active and not any(frame[0] == path for frame in self.frames):
+                self._remove(path)
+
+    def _ack(self, last):
+        while self.frames and self.frames[0][3] <= last:
+            self.frames.popleft()
+        self.acked = max(self.acked, last)
+        tmp = os.path.join(self.root, 'acked.tmp')
+        with open(tmp, 'w') as f:
+            f.write(f"{self.acked}\n")
+        os.replace(tmp, os.path.join(self.root, 'acked'))
+
+    def _remove(self, path):
+        self.segments.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class Uplink(threading.Thread):
+    """Servicio del daemon (start/stop) que envía la telemetría del controlador a `url`."""
+
+    def __init__(self, controller, url, spool_dir, device=None, max_bytes=MAX_SPOOL_BYTES,
+                 batch_records=BATCH_RECORDS, batch_seconds=BATCH_SECONDS, timeout=TIMEOUT):
+        super().__init__(name='uplink', daemon=True)
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"uplink URL must be http(s)://host[:port]/path, got {url!r}")
+        self.url = parts
+        self.device = device or os.environ.get(DEVICE_ENV) or socket.gethostname()
+        self.spool = Spool(spool_dir, max_bytes)
+        self.batch_records = batch_records
+        self.batch_seconds = batch_seconds
+        self.timeout = timeout
+        self.sent = 0
+        self.failures = 0
+        self.overflow = 0
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._next_attempt = 0.0
+        self._backoff = 0.0
+        # Conexión del envío en curso: stop() la corta para no esperar al colector
+        self._connection = None
+        controller.sampler.listeners.append(self.feed)
+        for unit in controller.units:
+            unit.actuators.subscribe(self._actuator)
+        controller.rules.subscribe(self._alarm)
+        self._register_metrics(controller.metrics)
+
+    def _register_metrics(self, registry):
+        metrics.Counter('teikit_uplink_records_total', "Registros de telemetría enviados, y perdidos por cola "
+                        "llena o por el límite del spool.", ('result',),
+                        lambda: [(('sent',), self.sent), (('dropped',), self.spool.dropped + self.overflow)], registry)
+        metrics.Gauge('teikit_uplink_backlog_records', "Registros en el spool sin confirmar por el colector.",
+                      callback=lambda: [((), self.spool.backlog())], registry=registry)
+        metrics.Gauge('teikit_uplink_spool_bytes', "Tamaño del spool en disco.",
+                      callback=lambda: [((), self.spool.size())], registry=registry)
+
+    # Productores (hilos del muestreador, de control, de la API): solo encolan
+    def _put(self, record):
+        if len(self._queue) >= QUEUE_LIMIT:
+            self.overflow += 1
+            return
+        self._queue.append(record)
+
+    def feed(self, samples):
+        for sample in samples:
+            self._put({'type': 'sample', 'unit': sample.unit, 'timestamp': sample.timestamp,
+                       'humidity': sample.humidity, 'temperature': sample.temperature,
+                       'pad_temperature': sample.pad_temperature})
+
+    def _actuator(self, event):
+        self._put({'type': 'actuator', 'unit': event.unit, 'timestamp': event.timestamp,
+                   'name': event.name, 'state': event.state, 'source': event.source})
+
+    def _alarm(self, event):
+        self._put({'type': 'alarm', 'unit': event.unit, 'timestamp': event.timestamp,
+                   'rule': event.rule, 'active': event.active, 'value': event.value})
+
+    # Hilo
+    def run(self):
+        batch, opened = [], None
+        while not self._stop_event.is_set():
+            wait = 1.0
+            if self.spool.frames:
+                wait = min(wait, max(0.0, self._next_attempt - clock.monotonic()))
+            self._wake.wait(wait)
+            self._wake.clear()
+            while self._queue:
+                batch.append(self._queue.popleft())
+                if opened is None:
+                    opened = clock.monotonic()
+                if len(batch) >= self.batch_records:
+                    self._spool(batch)
+                    batch, opened = [], None
+            if batch and clock.monotonic() - opened >= self.batch_seconds:
+                self._spool(batch)
+                batch, opened = [], None
+            if self.spool.frames and clock.monotonic() >= self._next_attempt:
+                self.ship()
+        # Al parar se guarda lo que quede; se enviará en el próximo arranque
+        batch.extend(self._queue)
+        self._queue.clear()
+        if batch:
+            self._spool(batch)
+
+    def _spool(self, batch):
+        try:
+            self.spool.append(batch)
+        except OSError as e:
+            self.overflow += len(batch)
+            print(f"uplink: no se pudo escribir el spool ({e}), {len(batch)} registros perdidos")
+
+    def ship(self):
+        """Envía el primer tramo pendiente; True si el colector lo confirmó."""
+        pending = self.spool.pending()
+        if pending is None:
+            return True
+        first, last, body = pending
+        try:
+            self._post(first, last, body)
+        except (OSError, http.client.HTTPException) as e:
+            self.failures += 1
+            self._backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self._backoff * 2))
+            # Dispersión: tras un corte de red los casilleros no vuelven todos a la vez
+            self._next_attempt = clock.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+            # En una red inestable un fallo suelto es normal: solo se avisa si se repite
+            if self.failures == LOG_AFTER_FAILURES:
+                print(f"uplink: {self.failures} envíos fallidos seguidos ({e}); se reintenta con espera de hasta {MAX_BACKOFF:.0f} s")
+            return False
+        if self.failures >= LOG_AFTER_FAILURES:
+            print(f"uplink: colector de nuevo accesible tras {self.failures} intentos fallidos")
+        self.failures = 0
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self.spool.ack(last)
+        self.sent += last - first + 1
+        if self.spool.frames:
+            # Queda atraso: el siguiente tramo sale sin esperar al próximo lote
+            self._wake.set()
+        return True
+
+    def _post(self, first, last, body):
+        if self.url.scheme == 'https':
+            connection = http.client.HTTPSConnection(self.url.hostname, self.url.port, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.url.hostname, self.url.port, timeout=self.timeout)
+        self._connection = connection
+        try:
+            connection.request('POST', self.url.path or '/', body=body, headers={
+                'Content-Type': 'application/x-ndjson', 'Content-Encoding': 'gzip',
+                'X-Teikit-Device': self.device, 'X-Teikit-Epoch': self.spool.epoch, 'X-Teikit-Seq': f"{first}-{last}"})
+            response = connection.getresponse()
+            response.read()
+        finally:
+            self._connection = None
+            connection.close()
+        if response.status // 100 != 2:
+            raise OSError(f"HTTP {response.status}")
+
+    def stop(self, timeout=None):
+        """Para el hilo, que antes de salir guarda en el spool el lote y la cola en memoria.
+
+        Un envío en curso se corta: su tramo queda sin confirmar y se reenvía al arrancar (el
+        colector descarta lo repetido). La espera nunca es menor que el plazo de la petición,
+        que es lo que puede durar si el corte llega mientras conecta.
+        """
+        self._stop_event.set()
+        self._wake.set()
+        connection = self._connection
+        sock = connection.sock if connection is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.is_alive():
+            self.join(None if timeout is None else max(timeout, self.timeout + 1.0))
+
+
+# Colector de pruebas
+class Collector:
+    """Colector HTTP mínimo: descomprime, descarta (dispositivo, época, secuencia) repetidos y guarda líneas JSON.
+
+    `fail_rate` rechaza esa fracción de peticiones con 503, `lost_reply_rate` guarda el lote
+    pero responde 503 (como si se perdiera la respuesta: el reintento llega duplicado) y
+    `delay` las retrasa, para probar reintentos y esperas sin una red real.
+    """
+
+    def __init__(self, address='127.0.0.1:9000', out=None, fail_rate=0.0, delay=0.0, lost_reply_rate=0.0):
+        self.records = []
+        self.accepted = self.duplicates = self.requests = self.rejected = 0
+        self.fail_rate = fail_rate
+        self.lost_reply_rate = lost_reply_rate
+        self.delay = delay
+        self.out = open(out, 'a') if out else None
+        self._seen = set()
+        self._lock = threading.Lock()
+        host, _, port = address.rpartition(':')
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, reply = collector.ingest(self.headers, body)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        self.address = f"{self.server.server_address[0]}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name='collector', daemon=True)
+
+    def ingest(self, headers, body):
+        self.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            self.rejected += 1
+            return 503, b'{"error": "simulated failure"}'
+        try:
+            data = gzip.decompress(body) if headers.get('Content-Encoding') == 'gzip' else body
+            records = [json.loads(line) for line in data.splitlines() if line]
+        except (OSError, ValueError) as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+        device = headers.get('X-Teikit-Device', '?')
+        # Lotes escritos antes de que el spool tuviera época: la de la cabecera
+        epoch = headers.get('X-Teikit-Epoch', '')
+        new = duplicates = 0
+        with self._lock:
+            for record in records:
+                key = (device, record.setdefault('epoch', epoch), record['seq'])
+                if key in self._seen:
+                    duplicates += 1
+                    continue
+                self._seen.add(key)
+                record['device'] = device
+                self.records.append(record)
+                if self.out:
+                    self.out.write(json.dumps(record) + '\n')
+                new += 1
+            self.accepted += new
+            self.duplicates += duplicates
+            if self.out:
+                self.out.flush()
+        if random.random() < self.lost_reply_rate:
+            self.rejected += 1
+            return 503, b'{"error": "simulated lost reply"}'
+        return 200, json.dumps({'accepted': new, 'duplicates': duplicates}).encode()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join(timeout)
+        if self.out:
+            self.out.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Colector de telemetría de pruebas para el uplink del casillero")
+    sub = parser.add_subparsers(dest='command', required=True)
+    collector = sub.add_parser('collector', help="recibir lotes y guardarlos como líneas JSON")
+    collector.add_argument('--listen', default='127.0.0.1:9000')
+    collector.add_argument('--out', help="archivo donde anexar los registros recibidos")
+    collector.add_argument('--fail-rate', type=float, default=0.0, help="fracción de peticiones rechazadas con 503")
+    collector.add_argument('--lost-reply-rate', type=float, default=0.0,
+                           help="fracción de lotes guardados pero respondidos con 503 (prueba de duplicados)")
+    collector.add_argument('--delay', type=float, default=0.0, help="segundos de espera por petición")
+    args = parser.parse_args(argv)
+
+    server = Collector(args.listen, args.out, args.fail_rate, args.delay, args.lost_reply_rate)
+    server.start()
+    print(f"colector escuchando en http://{server.address}/ingest", flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print(f"colector: {server.accepted} registros, {server.duplicates} duplicados, "
+                  f"{server.rejected}/{server.requests} peticiones rechazadas", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
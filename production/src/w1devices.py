@@ -0,0 +1,129 @@
+"""Registro de sondas 1-wire: qué sonda (número de serie) cumple cada función.
+
+- Cada función ('<casillero>.pad') se resuelve al arrancar: la serie de lockers.json si está
+  conectada, si no la que quedó guardada en `w1_devices.json` del directorio de datos.
+- `poll()` vuelve a listar el directorio de dispositivos cada `interval` segundos (un listdir,
+  sin abrir archivos de las sondas). Si falta la sonda de una función y hay una sola sonda
+  que nadie usa, la función pasa a ella sin reiniciar: el driver ya creado se reapunta y
+  las lecturas nunca buscan la sonda. Con varias candidatas no se adivina, se avisa.
+- sysfs no actualiza el mtime del directorio ni genera eventos de inotify al conectar o
+  desconectar sondas; de ahí el sondeo.
+"""
+import json
+import os
+
+import clock
+
+# Familia 1-wire de la DS18B20 (prefijo del número de serie)
+DS18B20_FAMILY = '28'
+POLL_INTERVAL = 5.0
+
+
+def discover(hw, family=DS18B20_FAMILY):
+    """Series de las sondas de `family` conectadas ahora (para scripts sueltos; el daemon usa DeviceRegistry)."""
+    return [serial for serial in hw.w1_devices() if serial.startswith(family + '-')]
+
+
+class DeviceRegistry:
+    """Funciones -> números de serie, con caché en disco y cambio en caliente de sondas."""
+
+    def __init__(self, hw, path, interval=POLL_INTERVAL, family=DS18B20_FAMILY):
+        self.hw = hw
+        self.path = path
+        self.interval = interval
+        self.family = family
+        self.roles = {}
+        self.rebinds = 0
+        self.present = set()
+        self._configured = {}
+        self._callbacks = {}
+        self._missing = {}
+        self._ambiguous = None
+        self._last_poll = None
+        self._cached = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return dict(json.load(f).get('roles', {}))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"w1: caché de sondas ilegible ({e}), se descarta")
+            return {}
+
+    def _save(self):
+        if self.roles == self._cached:
+            return
+        tmp = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump({'roles': self.roles}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"w1: no se pudo guardar {self.path}: {e}")
+            return
+        self._cached = dict(self.roles)
+
+    def scan(self):
+        self.present = set(discover(self.hw, self.family))
+        return self.present
+
+    def resolve(self, role, configured):
+        """Serie con la que arranca `role`: la configurada si está, si no la guardada; si ninguna, la configurada."""
+        self._configured[role] = configured
+        present = self.scan()
+        cached = self._cached.get(role)
+        serial = configured
+        if configured not in present and cached in present and cached not in self.roles.values():
+            print(f"w1: {role} usa la sonda guardada {cached} (la configurada {configured} no está)")
+            serial = cached
+        self.roles[role] = serial
+        return serial
+
+    def watch(self, role, callback):
+        """`callback(serie)` se llama (en el hilo de poll) cuando `role` pasa a otra sonda."""
+        self._callbacks[role] = callback
+
+    def missing(self):
+        return sorted(role for role, serial in self.roles.items() if serial not in self.present)
+
+    def poll(self, force=False):
+        """Vuelve a listar las sondas si ha pasado `interval` y reasigna las funciones que se quedaron sin sonda."""
+        now = clock.monotonic()
+        if not force and self._last_poll is not None and now - self._last_poll < self.interval:
+            return
+        self._last_poll = now
+        self.scan()
+        for role in self.missing():
+            # Vuelve la sonda configurada o la guardada: se recupera sin más
+            for serial in (self._configured.get(role), self._cached.get(role)):
+                if serial in self.present and serial not in self.roles.values():
+                    self._rebind(role, serial)
+                    break
+        missing = self.missing()
+        unused = sorted(self.present - set(self.roles.values()))
+        if len(missing) == 1 and len(unused) == 1:
+            self._rebind(missing[0], unused[0])
+            missing = []
+        elif missing and unused and (missing, unused) != self._ambiguous:
+            print(f"w1: sin sonda para {', '.join(missing)} y varias candidatas ({', '.join(unused)}); "
+                  f"fija las series en lockers.json")
+        self._ambiguous = (missing, unused) if missing and unused else None
+        for role in set(missing) - set(self._missing):
+            print(f"w1: no está la sonda {self.roles[role]} de {role}")
+        for role, serial in self._missing.items():
+            if role not in missing and self.roles[role] == serial:
+                print(f"w1: vuelve la sonda {serial} de {role}")
+        self._missing = {role: self.roles[role] for role in missing}
+        self._save()
+
+    def _rebind(self, role, serial):
+        old = self.roles[role]
+        self.roles[role] = serial
+        self.rebinds += 1
+        print(f"w1: {role} pasa de la sonda {old} a {serial}")
+        callback = self._callbacks.get(role)
+        if callback is not None:
+            callback(serial)
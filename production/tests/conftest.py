@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de production/src se importan por nombre, igual que en el daemon
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import clock  # noqa: E402
+
+
+@pytest.fixture
+def virtual_clock():
+    """Reloj virtual instalado durante la prueba (monotonic y time parten de 1000 s)."""
+    virtual = clock.VirtualClock(1000.0)
+    clock.use(virtual)
+    yield virtual
+    clock.use(None)
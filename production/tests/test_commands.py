@@ -0,0 +1,148 @@
+import random
+
+import pytest
+
+from actuators import ActuatorBank
+from commands import CommandQueue, TimerWheel
+from hardware import FakeGPIO
+
+
+def test_timers_never_fire_early_and_at_most_one_tick_late():
+    rng = random.Random(3)
+    wheel = TimerWheel(tick=0.05, slots=16, now=0.0)
+    fired = []
+    # Plazos de hasta varias vueltas de la rueda (16 huecos de 50 ms = 0.8 s)
+    deadlines = sorted(rng.uniform(0.0, 5.0) for _ in range(300))
+    for when in deadlines:
+        wheel.schedule(when, lambda when=when: when)
+    now = 0.0
+    while now < 5.2:
+        now += 0.01
+        fired.extend((callback(), now) for callback in wheel.advance(now))
+    assert [when for when, _ in fired] == deadlines
+    assert all(when <= at <= when + 0.05 + 0.01 for when, at in fired)
+    assert wheel.active == 0
+
+
+def test_cancelled_timers_do_not_fire_and_jumps_reschedule():
+    wheel = TimerWheel(tick=0.1, slots=8, now=0.0)
+    keep = wheel.schedule(0.5, lambda: 'keep')
+    wheel.schedule(0.3, lambda: 'cancelled').cancel()
+    far = wheel.schedule(100.0, lambda: 'far')
+    assert [callback() for callback in wheel.advance(1.0)] == ['keep']
+    assert keep.rounds == 0
+    # Salto de muchas vueltas (reproducción de trazas): vence lo que toca y el resto sigue en la rueda
+    wheel.schedule(40.0, lambda: 'mid')
+    assert [callback() for callback in wheel.advance(50.0)] == ['mid']
+    assert not far.cancelled and wheel.active == 1
+    assert [callback() for callback in wheel.advance(100.1)] == ['far']
+
+
+@pytest.fixture
+def queue(virtual_clock):
+    # Sin arrancar el hilo: step() con el reloj virtual, como replay.py
+    return CommandQueue(dwell={'fan': 2.0, 'lock': 0.5, 'pad': 5.0}, tick=0.05)
+
+
+@pytest.fixture
+def bank(virtual_clock):
+    bank = ActuatorBank(FakeGPIO(), 'casillero-1', {'fan': 1, 'lock': 2, 'pad': 3})
+    for name, state in (('fan', 'off'), ('lock', 'closed'), ('pad', 'off')):
+        bank.set(name, state, 'init')
+    bank.events = []
+    bank.subscribe(bank.events.append)
+    return bank
+
+
+def run(queue, virtual_clock, until, step=0.05):
+    while virtual_clock.now < until - 1e-9:
+        virtual_clock.advance_to(virtual_clock.now + step)
+        queue.step()
+
+
+def test_pending_commands_for_a_relay_coalesce(queue, bank, virtual_clock):
+    virtual_clock.advance_to(1010.0)
+    first = queue.submit(bank, 'fan', 'on', 'ui')
+    second = queue.submit(bank, 'fan', 'off', 'ui')
+    third = queue.submit(bank, 'fan', 'on', 'api')
+    assert first.done.is_set() and second.done.is_set() and not third.done.is_set()
+    queue.step()
+    assert third.applied and not first.applied
+    assert [(e.name, e.state, e.source) for e in bank.events] == [('fan', 'on', 'api')]
+    assert (queue.submitted, queue.coalesced) == (3, 2)
+
+
+def test_dwell_defers_a_change_until_it_is_met(queue, bank, virtual_clock):
+    virtual_clock.advance_to(1010.0)
+    bank.set('pad', 'on', 'thermostat')
+    virtual_clock.advance_to(1011.0)
+    command = queue.submit(bank, 'pad', 'off', 'ui')
+    queue.step()
+    assert not command.done.is_set() and queue.deferred == 1 and bank.state('pad') == 'on'
+    run(queue, virtual_clock, 1014.9)
+    assert bank.state('pad') == 'on'
+    run(queue, virtual_clock, 1015.05)
+    assert command.applied and bank.state('pad') == 'off'
+    # Una orden al estado actual no espera la permanencia (ni mueve el relé)
+    virtual_clock.advance_to(1016.0)
+    same = queue.submit(bank, 'pad', 'off', 'ui')
+    queue.step()
+    assert same.done.is_set() and not same.applied
+
+
+def test_pulse_reverts_after_its_duration(queue, bank, virtual_clock):
+    virtual_clock.advance_to(1010.0)
+    queue.submit(bank, 'lock', 'open', 'ui', seconds=3)
+    queue.step()
+    assert bank.state('lock') == 'open'
+    run(queue, virtual_clock, 1012.9)
+    assert bank.state('lock') == 'open'
+    run(queue, virtual_clock, 1013.1)
+    assert bank.state('lock') == 'closed'
+    assert [e.state for e in bank.events] == ['open', 'closed']
+
+
+def test_duty_cycle_repeats_until_a_manual_command(queue, bank, virtual_clock):
+    virtual_clock.advance_to(1010.0)
+    with pytest.raises(ValueError):
+        queue.cycle(bank, 'fan', 'on', 10, 10, 'ui')
+    queue.cycle(bank, 'fan', 'on', 3, 10, 'ui')
+    run(queue, virtual_clock, 1035.5)
+    on_at = [round(e.timestamp) for e in bank.events if e.state == 'on']
+    off_at = [round(e.timestamp) for e in bank.events if e.state == 'off']
+    assert on_at == [1010, 1020, 1030] and off_at == [1013, 1023, 1033]
+    # Una orden manual cancela el ciclo y su vuelta pendiente
+    queue.submit(bank, 'fan', 'off', 'ui')
+    run(queue, virtual_clock, 1060.0)
+    assert bank.state('fan') == 'off'
+    assert [round(e.timestamp) for e in bank.events if e.state == 'on'] == [1010, 1020, 1030]
+
+
+def test_relays_held_by_an_alarm_refuse_conflicting_commands(bank, virtual_clock):
+    holds = {}
+    queue = CommandQueue(dwell={'pad': 5.0}, tick=0.05, holds=lambda unit_id: holds)
+    virtual_clock.advance_to(1010.0)
+    queue.cycle(bank, 'pad', 'on', 3, 10, 'ui')
+    run(queue, virtual_clock, 1021.0)
+    # La alarma apaga el pad en mitad de un ciclo (como RulesEngine) y lo retiene apagado
+    bank.set('pad', 'off', 'rule')
+    holds['pad'] = 'off'
+    run(queue, virtual_clock, 1045.0)
+    # (la primera vuelta espera a la permanencia de 5 s; los periodos de 1030 y 1040 se rechazan)
+    assert [(round(e.timestamp), e.state, e.source) for e in bank.events] == [
+        (1010, 'on', 'ui'), (1015, 'off', 'ui'), (1020, 'on', 'ui'), (1021, 'off', 'rule')]
+    assert queue.refused == 2
+    # Rearmada la alarma, el ciclo sigue en su siguiente periodo
+    holds.clear()
+    run(queue, virtual_clock, 1051.0)
+    assert bank.state('pad') == 'on'
+    # Con el relé retenido de nuevo, una orden manual contraria se rechaza y lo dice en la orden
+    holds['pad'] = 'off'
+    bank.set('pad', 'off', 'rule')
+    virtual_clock.advance_to(1060.0)
+    manual = queue.submit(bank, 'pad', 'on', 'api')
+    queue.step()
+    assert manual.done.is_set() and not manual.applied and manual.refused == 'hold'
+    allowed = queue.submit(bank, 'fan', 'on', 'api')
+    queue.step()
+    assert allowed.applied and allowed.refused is None
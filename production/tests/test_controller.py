@@ -0,0 +1,37 @@
+import threading
+import time
+
+import hardware
+from controller import DEFAULT_CONFIG, LockerController
+
+
+def test_start_does_not_wait_for_the_thermal_model(tmp_path, monkeypatch):
+    hw = hardware.SimBackend(dht_error_rate=0.0, dht_latency=0.0, w1_conversion_delay=0.0, seed=1,
+                             w1_root=str(tmp_path / 'w1'))
+    controller = LockerController(hw=hw, data_dir=str(tmp_path / 'data'), config=DEFAULT_CONFIG)
+    unit = controller.units[0]
+    release = threading.Event()
+    load = unit.thermal.load
+
+    def slow_load(*args):
+        # Un ajuste largo con el histórico (numpy, días de muestras)
+        release.wait(5)
+        return load(*args)
+    monkeypatch.setattr(unit.thermal, 'load', slow_load)
+    try:
+        started = time.perf_counter()
+        controller.start()
+        assert time.perf_counter() - started < 1.0
+        # Mientras carga: el casillero funciona con el modelo vacío y sin pronóstico
+        assert controller.sampler.first_sample.wait(5)
+        assert not unit.thermal.loaded and unit.forecast() is None
+        release.set()
+        deadline = time.monotonic() + 5
+        while not unit.thermal.loaded and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert unit.thermal.loaded
+    finally:
+        release.set()
+        controller.stop()
+        hw.close()
+    assert not controller._thermal_loader.is_alive()
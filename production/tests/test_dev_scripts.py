@@ -0,0 +1,21 @@
+import importlib.util
+import os
+
+DEVELOPMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'development')
+
+
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(f"dev_{name}", os.path.join(DEVELOPMENT, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_temperature_script_reads_the_pad_probe_under_sim(monkeypatch):
+    monkeypatch.setenv('TEIKIT_HW', 'sim')
+    monkeypatch.setenv('TEIKIT_SIM_W1_DELAY', '0')
+    script = load_script('temperature')
+    assert script.hw.name == 'sim'
+    assert script.serial in script.hw.w1_devices()
+    temperature = script.read_temp()
+    assert temperature is not None and 0.0 < temperature < 60.0
@@ -0,0 +1,116 @@
+import os
+import time
+
+import pytest
+
+import ds18b20
+import hardware
+from ds18b20 import CRCError, DS18B20, DS18B20Bus, parse_w1_slave
+
+SERIAL = '28-3de10457e49d'
+
+
+def test_parse_w1_slave():
+    lines = ['72 01 4b 46 7f ff 0e 10 57 : crc=57 YES\n', '72 01 4b 46 7f ff 0e 10 57 t=23125\n']
+    assert parse_w1_slave(lines) == 23.125
+    negative = ['5e ff 4b 46 7f ff 02 10 56 : crc=56 YES\n', '5e ff 4b 46 7f ff 02 10 56 t=-10125\n']
+    assert parse_w1_slave(negative) == -10.125
+
+
+def test_parse_w1_slave_rejects_bad_crc_and_garbage():
+    with pytest.raises(CRCError):
+        parse_w1_slave(['72 01 4b 46 7f ff 0e 10 57 : crc=00 NO\n', '72 01 4b 46 7f ff 0e 10 57 t=23125\n'])
+    for lines in ([], ['only one line\n'], ['x : crc=00 YES\n', 'no temperature here\n']):
+        with pytest.raises(ValueError):
+            parse_w1_slave(lines)
+
+
+def test_conversion_time_halves_per_bit():
+    assert [ds18b20.conversion_time(bits) for bits in (9, 10, 11, 12)] == [0.09375, 0.1875, 0.375, 0.75]
+    with pytest.raises(ValueError):
+        DS18B20(None, SERIAL, resolution=8)
+
+
+@pytest.fixture
+def hw(tmp_path):
+    backend = hardware.SimBackend(w1_conversion_delay=0.0, seed=1, w1_root=str(tmp_path))
+    backend.w1.add_device(SERIAL)
+    return backend
+
+
+def test_reads_the_temperature_attribute_and_sets_the_resolution(hw):
+    probe = DS18B20Bus(hw, 'w1_bus_master1').add(SERIAL, resolution=10)
+    assert probe.read() == 22.0
+    assert hw.w1.resolution[SERIAL] == 10
+    assert probe.conversion_time == ds18b20.conversion_time(10)
+
+
+def test_falls_back_to_w1_slave_only_when_the_attribute_is_missing(hw):
+    probe = DS18B20(hw, SERIAL)
+    # Sonda desconectada: falla la lectura pero no cambia el modo
+    hw.w1.remove_device(SERIAL)
+    assert probe.read() is None
+    hw.w1.add_device(SERIAL)
+    assert probe.read() == 22.0 and probe._use_temperature
+    # Kernel sin `temperature`: directorio presente sin el atributo
+    os.remove(probe.temperature_path)
+    assert probe.read() == 22.0 and not probe._use_temperature
+    # Otra sonda que sí lo tiene: rebind vuelve a decidir
+    hw.w1.add_device('28-000000000002')
+    probe.rebind('28-000000000002')
+    assert probe._use_temperature
+
+
+def test_crc_errors_and_power_on_reset_read_as_none(hw, monkeypatch):
+    probe = DS18B20(hw, SERIAL)
+    os.remove(probe.temperature_path)
+    hw.w1.crc_error_rate = 1.0
+    assert probe.read() is None and probe.crc_errors == 1
+    hw.w1.crc_error_rate = 0.0
+    monkeypatch.setattr(hw.w1, '_convert', lambda serial: 85.0)
+    assert probe.read() is None
+
+
+def test_bulk_conversion_failures(hw, monkeypatch):
+    bus = DS18B20Bus(hw, 'w1_bus_master1')
+    bus.add(SERIAL)
+    hw.w1.add_device('28-000000000002')
+    bus.add('28-000000000002')
+    assert bus.convert() is True
+    # Lectura vacía del maestro: se cuenta y se sigue con conversión masiva
+    read_w1 = hw.read_w1
+    monkeypatch.setattr(hw, 'read_w1', lambda path: [] if path == bus.bulk_path else read_w1(path))
+    assert bus.convert() is False
+    assert bus.bulk and bus.convert_errors == 1
+    # Sin therm_bulk_read: cada sonda convierte por separado desde ahora
+    os.remove(bus.bulk_path)
+    assert bus.convert() is False
+    assert not bus.bulk
+
+
+def test_conversions_run_on_the_logic_clock(virtual_clock, tmp_path):
+    backend = hardware.SimBackend(w1_conversion_delay=0.75, seed=1, w1_root=str(tmp_path))
+    bus = DS18B20Bus(backend, 'w1_bus_master1')
+    for serial in (SERIAL, '28-000000000002'):
+        backend.w1.attach(serial, backend.plant)
+        backend.w1.add_device(serial)
+        bus.add(serial, resolution=12)
+    started, begin = time.perf_counter(), virtual_clock.now
+    # Conversión masiva y lecturas: con el reloj virtual pasa el tiempo simulado, no el real
+    assert bus.convert()
+    assert virtual_clock.now - begin == pytest.approx(0.75)
+    assert [probe.read() for probe in bus.probes] == [22.0, 22.0]
+    assert virtual_clock.now - begin == pytest.approx(0.75)
+    assert bus.probes[0].read() == 22.0
+    assert virtual_clock.now - begin == pytest.approx(1.5)
+    assert time.perf_counter() - started < 0.5
+
+
+def test_the_temporary_bus_directory_is_removed_on_close():
+    backend = hardware.SimBackend(seed=1)
+    root = backend.w1_dir
+    backend.w1.add_device(SERIAL)
+    assert os.path.isdir(root)
+    backend.close()
+    assert not os.path.exists(root)
+    backend.close()
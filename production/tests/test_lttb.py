@@ -0,0 +1,42 @@
+import math
+
+import numpy as np
+
+from lttb import downsample, lttb_indices
+
+
+def test_short_series_and_small_thresholds_are_returned_whole():
+    x = np.arange(10.0)
+    assert list(lttb_indices(x, x, 20)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+    xs, ys = downsample([0, 1, 2], [5, 6, 7], 10)
+    assert list(xs) == [0, 1, 2] and list(ys) == [5, 6, 7]
+
+
+def test_keeps_the_endpoints_and_the_spikes():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[333], y[777] = 50.0, -40.0
+    keep = lttb_indices(x, y, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 333 in keep and 777 in keep
+
+
+def test_gaps_become_a_single_nan_between_the_points_they_separate():
+    x = np.arange(600.0)
+    y = np.sin(x / 50)
+    y[200:300] = np.nan
+    xs, ys = downsample(x, y, 60)
+    gaps = np.flatnonzero(np.isnan(ys))
+    assert len(gaps) == 1
+    gap = gaps[0]
+    # El NaN va entre el último punto antes del hueco y el primero después
+    assert xs[gap - 1] < 200 and xs[gap + 1] >= 300
+    assert len(xs) == 61
+
+
+def test_a_series_without_values_downsamples_to_nothing():
+    xs, ys = downsample(np.arange(100.0), [math.nan] * 100, 10)
+    assert len(xs) == len(ys) == 0
@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from remote import APIClient, RemoteThermostat
+
+
+class SlowAPI(BaseHTTPRequestHandler):
+    delay = 0.3
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests.append((self.path, body))
+        time.sleep(self.delay)
+        if body.get('state') == 'on':
+            status, payload = 409, {'error': 'pad is held off by an active alarm'}
+        else:
+            status, payload = 200, {'path': self.path, **body}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def client():
+    SlowAPI.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = APIClient(f"127.0.0.1:{server.server_address[1]}", timeout=2.0)
+    yield client
+    client.close(timeout=2.0)
+    server.shutdown()
+    server.server_close()
+
+
+def wait_delivered(client, results, count, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while len(results) < count and time.monotonic() < deadline:
+        client.deliver()
+        time.sleep(0.01)
+
+
+def test_send_returns_at_once_and_delivers_in_order_on_the_calling_thread(client):
+    results = []
+    started = time.perf_counter()
+    client.send('/lockers/a/lock', {'state': 'open'}, lambda r: results.append((threading.current_thread(), r)))
+    client.send('/lockers/a/pad', {'state': 'on'}, None, lambda e: results.append((threading.current_thread(), e)))
+    client.send('/lockers/a/fan', {'state': 'off'}, lambda r: results.append((threading.current_thread(), r)))
+    # La interfaz no espera a la API (0.3 s por orden en este servidor)
+    assert time.perf_counter() - started < 0.05
+    client.deliver()
+    assert results == []
+    wait_delivered(client, results, 3)
+    assert [thread for thread, _ in results] == [threading.current_thread()] * 3
+    assert results[0][1]['path'] == '/lockers/a/lock'
+    assert isinstance(results[1][1], OSError) and 'held off' in str(results[1][1])
+    assert results[2][1]['state'] == 'off'
+    assert [path for path, _ in SlowAPI.requests] == ['/lockers/a/lock', '/lockers/a/pad', '/lockers/a/fan']
+
+
+def test_an_unreachable_daemon_is_reported_without_blocking():
+    client = APIClient('127.0.0.1:9', timeout=0.5)
+    errors = []
+    client.send('/lockers/a/lock', {'state': 'open'}, None, errors.append)
+    wait_delivered(client, errors, 1)
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
+    client.close(timeout=1.0)
+
+
+def test_the_thermostat_mode_is_posted_in_the_background(client):
+    applied = []
+    unit = type('Unit', (), {'id': 'a', 'client': client, 'apply': applied.append})()
+    thermostat = RemoteThermostat(unit)
+    started = time.perf_counter()
+    thermostat.auto = True
+    assert time.perf_counter() - started < 0.05
+    wait_delivered(client, applied, 1)
+    assert applied == [{'path': '/lockers/a/thermostat', 'auto': True}]
@@ -0,0 +1,96 @@
+import math
+import threading
+
+import pytest
+
+from ringbuffer import SeriesBuffer
+
+
+def rows(buffer):
+    return [tuple(column) for column in zip(*buffer.all())]
+
+
+def test_keeps_the_last_capacity_rows_in_order_after_wrapping():
+    buffer = SeriesBuffer(('time', 'value'), 4)
+    for i in range(10):
+        buffer.append(float(i), i * 10.0)
+    assert len(buffer) == 4
+    assert rows(buffer) == [(6.0, 60.0), (7.0, 70.0), (8.0, 80.0), (9.0, 90.0)]
+    assert buffer.latest() == (9.0, 90.0)
+
+
+def test_windows_are_contiguous_views_without_copies():
+    buffer = SeriesBuffer(('time', 'value'), 5)
+    for i in range(7):
+        buffer.append(float(i), float(i))
+    times, values = buffer.all()
+    # El espejo hace contigua la ventana aunque cruce el final del array
+    assert isinstance(times, memoryview) and times.contiguous
+    assert list(times) == [2.0, 3.0, 4.0, 5.0, 6.0]
+    assert list(values) == list(times)
+
+
+def test_between_and_window_locate_rows_by_time():
+    buffer = SeriesBuffer(('time', 'value'), 100)
+    for i in range(50):
+        buffer.append(i * 2.0, float(i))
+    assert list(buffer.between(10.0, 20.0)[0]) == [10.0, 12.0, 14.0, 16.0, 18.0, 20.0]
+    assert list(buffer.between(11.0, 11.5)[0]) == []
+    assert list(buffer.window(6.0)[0]) == [92.0, 94.0, 96.0, 98.0]
+
+
+def test_empty_buffer():
+    buffer = SeriesBuffer(('time', 'value'), 3)
+    assert buffer.latest() is None
+    assert [list(column) for column in buffer.window(60)] == [[], []]
+
+
+def test_missing_values_are_stored_as_nan():
+    buffer = SeriesBuffer(('time', 'a', 'b'), 2)
+    buffer.append(1.0, None, 2.5)
+    _, a, b = buffer.latest()
+    assert math.isnan(a) and b == 2.5
+
+
+def test_rejects_bad_arity_and_capacity():
+    buffer = SeriesBuffer(('time', 'value'), 2)
+    with pytest.raises(ValueError):
+        buffer.append(1.0)
+    with pytest.raises(ValueError):
+        SeriesBuffer(('time',), 0)
+
+
+def test_columns_can_live_in_external_memory():
+    columns = ('time', 'value')
+    memory = bytearray(SeriesBuffer.nbytes(columns, 3))
+    buffer = SeriesBuffer(columns, 3, memory)
+    for i in range(5):
+        buffer.append(float(i), i + 0.5)
+    assert rows(buffer) == [(2.0, 2.5), (3.0, 3.5), (4.0, 4.5)]
+    # Los datos están en `memory` y no en arrays propios (así se comparten con la UI)
+    assert {2.0, 3.0, 4.0, 2.5, 3.5, 4.5} <= set(memoryview(memory).cast('d'))
+
+
+def test_copy_window_is_consistent_while_another_thread_appends():
+    buffer = SeriesBuffer(('time', 'a', 'b'), 8)
+    for i in range(8):
+        buffer.append(float(i), float(i), float(i))
+    failures, stop = [], threading.Event()
+
+    def writer():
+        t = 8.0
+        while not stop.is_set():
+            buffer.append(t, t, t)
+            t += 1.0
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(20000):
+            times, a, b = buffer.copy_window(5.0)
+            # Seis filas seguidas, la última es la muestra de referencia y las columnas van juntas
+            if times != a or times != b or times != [times[-1] - k for k in range(5, -1, -1)]:
+                failures.append(times)
+    finally:
+        stop.set()
+        thread.join()
+    assert not failures
@@ -0,0 +1,45 @@
+import math
+
+from rollups import Rollup, rollup_columns
+
+
+def rows(rollup):
+    return [tuple(column) for column in zip(*rollup.buffer.all())]
+
+
+def test_columns_are_means_then_minimums_then_maximums():
+    assert rollup_columns(('temperature', 'humidity')) == (
+        'time', 'temperature', 'humidity', 'temperature_min', 'humidity_min', 'temperature_max', 'humidity_max')
+
+
+def test_an_interval_closes_with_the_first_sample_of_the_next():
+    rollup = Rollup(('temperature',), 60, 10)
+    assert rollup.add(0.0, 20.0) is None
+    assert rollup.add(30.0, 24.0) is None
+    assert rollup.add(59.0, 22.0) is None
+    assert rollup.add(60.0, 30.0) == (0.0, 22.0, 20.0, 24.0)
+    # En el buffer el tiempo es el centro del intervalo
+    assert rows(rollup) == [(30.0, 22.0, 20.0, 24.0)]
+
+
+def test_missing_values_are_skipped_and_empty_intervals_are_not_stored():
+    rollup = Rollup(('temperature', 'humidity'), 60, 10)
+    rollup.add(0.0, 20.0, None)
+    rollup.add(10.0, 22.0, math.nan)
+    row = rollup.add(60.0, None, None)
+    assert row[:2] == (0.0, 21.0) and math.isnan(row[2])
+    assert rollup.add(120.0, 20.0, 50.0) is None
+    assert len(rollup.buffer) == 1
+
+
+def test_intervals_already_closed_are_not_counted_twice():
+    rollup = Rollup(('temperature',), 60, 10, offset=1200.0)
+    # Fila leída del disco al arrancar; luego se releen muestras crudas del mismo intervalo
+    rollup.load((1200.0, 21.0, 20.0, 22.0))
+    assert rollup.add(1210.0, 99.0) is None
+    assert rollup.add(1260.0, 25.0) is None
+    assert rollup.add(1275.0, 27.0) is None
+    # Un reloj que retrocede tampoco reabre el intervalo anterior
+    assert rollup.add(1250.0, 99.0) is None
+    assert rollup.add(1320.0, 20.0) == (1260.0, 26.0, 25.0, 27.0)
+    assert rows(rollup) == [(30.0, 21.0, 20.0, 22.0), (90.0, 26.0, 25.0, 27.0)]
@@ -0,0 +1,132 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from actuators import ActuatorBank
+from hardware import FakeGPIO
+from rules import RollingWindow, Rule, RulesEngine
+from sampler import Sample
+
+
+def brute_force(samples, seconds):
+    latest = samples[-1][0]
+    window = [(t, v) for t, v in samples if t >= latest - seconds]
+    values = [v for _, v in window]
+    n = len(window)
+    mean_t = sum(t for t, _ in window) / n
+    mean_v = sum(values) / n
+    var = sum((t - mean_t) ** 2 for t, _ in window)
+    rate = sum((t - mean_t) * (v - mean_v) for t, v in window) / var * 60 if n >= 3 and var > 0 else None
+    return n, mean_v, min(values), max(values), rate
+
+
+def test_rolling_window_matches_a_brute_force_recomputation():
+    rng = random.Random(7)
+    window = RollingWindow(60)
+    samples, t = [], 1.7e9
+    for _ in range(2000):
+        # Intervalos irregulares y valores con tendencia, ruido y picos
+        t += rng.choice((0.5, 2.0, 2.0, 3.0, 25.0))
+        value = 20 + 0.01 * len(samples) + rng.gauss(0, 0.5) + (30 if rng.random() < 0.01 else 0)
+        samples.append((t, value))
+        window.add(t, value)
+        n, mean, low, high, rate = brute_force(samples, 60)
+        assert len(window) == n
+        assert window.mean() == pytest.approx(mean, abs=1e-9)
+        assert (window.min(), window.max()) == (low, high)
+        if rate is None:
+            assert window.rate() is None
+        else:
+            assert window.rate() == pytest.approx(rate, rel=1e-6, abs=1e-9)
+
+
+def test_rolling_window_needs_three_samples_for_a_rate():
+    window = RollingWindow(60)
+    assert (window.mean(), window.min(), window.max(), window.rate()) == (None, None, None, None)
+    window.add(0.0, 1.0)
+    window.add(30.0, 2.0)
+    assert window.rate() is None
+    window.add(60.0, 3.0)
+    assert window.rate() == pytest.approx(2.0)
+
+
+def test_rule_validation():
+    with pytest.raises(ValueError, match='channel'):
+        Rule('r', 'pressure', '>', 1)
+    with pytest.raises(ValueError, match='window'):
+        Rule('r', 'temperature', '>', 1, stat='mean')
+    with pytest.raises(ValueError, match='op'):
+        Rule('r', 'temperature', '=>', 1)
+    with pytest.raises(ValueError, match='action'):
+        Rule('r', 'temperature', '>', 1, actions={'pad': 'open'})
+    with pytest.raises(ValueError, match='unknown keys'):
+        Rule.from_config({'name': 'r', 'channel': 'temperature', 'op': '>', 'threshold': 1, 'severity': 'high'})
+    with pytest.raises(ValueError, match='missing threshold'):
+        Rule.from_config({'name': 'r', 'channel': 'temperature', 'op': '>'})
+    rule = Rule.from_config({'name': 'r', 'channel': 'temperature', 'op': '>', 'threshold': 30, 'for': 10})
+    assert (rule.hold, rule.clear) == (10.0, 30.0)
+
+
+def make_unit(unit_id='casillero-1'):
+    gpio = FakeGPIO()
+    bank = ActuatorBank(gpio, unit_id, {'fan': 1, 'lock': 2, 'pad': 3})
+    for name, state in (('fan', 'off'), ('lock', 'closed'), ('pad', 'on')):
+        bank.set(name, state, 'init')
+    store = SimpleNamespace(records=[])
+    store.append = lambda channel, *values: store.records.append((channel,) + values)
+    return SimpleNamespace(id=unit_id, actuators=bank, store=store, alarms=(), rule_holds={})
+
+
+def sample(t, pad=None, unit='casillero-1'):
+    return Sample(t, None, None, pad, unit)
+
+
+def test_rule_holds_fires_once_and_clears_with_hysteresis():
+    unit = make_unit()
+    rule = {'name': 'pad-hot', 'channel': 'pad_temperature', 'op': '>', 'threshold': 45, 'clear': 42,
+            'for': 10, 'actions': {'pad': 'off', 'fan': 'on'}}
+    engine = RulesEngine([rule], [unit])
+    events = []
+    engine.subscribe(events.append)
+
+    engine.feed([sample(0, 46), sample(5, 47)])
+    assert unit.alarms == () and unit.actuators.state('pad') == 'on'
+    engine.feed([sample(10, 47), sample(12, 48)])
+    assert unit.alarms == ('pad-hot',)
+    assert unit.rule_holds == {'pad': 'off', 'fan': 'on'}
+    assert (unit.actuators.state('pad'), unit.actuators.state('fan')) == ('off', 'on')
+    # Sin lectura no avanza ni se rearma; por debajo del umbral pero encima de `clear` sigue activa
+    engine.feed([sample(14), sample(16, 43)])
+    assert unit.alarms == ('pad-hot',)
+    engine.feed([sample(18, 41.5)])
+    assert unit.alarms == () and unit.rule_holds == {}
+    assert [(e.active, e.value) for e in events] == [(True, 47), (False, 41.5)]
+    assert engine.raised == 1
+    assert unit.store.records == [('alarms', 10, 0, 1, 47), ('alarms', 18, 0, 0, 41.5)]
+
+
+def test_a_dip_below_the_threshold_restarts_the_hold():
+    unit = make_unit()
+    engine = RulesEngine([{'name': 'r', 'channel': 'pad_temperature', 'op': '>', 'threshold': 45, 'for': 10}], [unit])
+    engine.feed([sample(0, 46), sample(8, 44), sample(9, 46), sample(17, 46)])
+    assert unit.alarms == ()
+    engine.feed([sample(19, 46)])
+    assert unit.alarms == ('r',)
+
+
+def test_rules_share_windows_and_respect_lockers():
+    units = [make_unit('a'), make_unit('b')]
+    rules = [
+        {'name': 'mean', 'channel': 'pad_temperature', 'stat': 'mean', 'window': 60, 'op': '>', 'threshold': 40},
+        {'name': 'max', 'channel': 'pad_temperature', 'stat': 'max', 'window': 60, 'op': '>', 'threshold': 40},
+        {'name': 'only-b', 'channel': 'pad_temperature', 'op': '<', 'threshold': 5, 'lockers': ['b']},
+    ]
+    engine = RulesEngine(rules, units)
+    # Una ventana por (casillero, canal, segundos): las dos primeras reglas comparten la suya
+    assert engine.windows() == 2
+    engine.feed([sample(0, 30, 'a'), sample(1, 60, 'a'), sample(2, 1, 'b')])
+    assert units[0].alarms == ('mean', 'max')
+    assert units[1].alarms == ('only-b',)
+    with pytest.raises(ValueError, match='duplicate'):
+        RulesEngine([rules[0], rules[0]], units)
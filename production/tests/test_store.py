@@ -0,0 +1,203 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+
+import store
+from store import SegmentStore
+
+
+@pytest.fixture
+def segments(tmp_path):
+    s = SegmentStore(str(tmp_path), segment_seconds=100, retention_days=1, flush_interval=3600)
+    yield s
+    s.close()
+
+
+def sample_times(s, t0=0.0, t1=1e12):
+    return [record[0] for record in s.query('samples', t0, t1)]
+
+
+def test_query_returns_pending_and_flushed_records_in_order(segments):
+    for t in range(0, 250, 10):
+        segments.append('samples', float(t), 50.0, 20.0, None)
+    assert sample_times(segments)[:3] == [0.0, 10.0, 20.0]
+    segments.flush()
+    for t in range(250, 300, 10):
+        segments.append('samples', float(t), 50.0, 20.0, 30.0)
+    assert sample_times(segments) == [float(t) for t in range(0, 300, 10)]
+    # Un segmento por cada `segment_seconds`
+    assert sorted(os.listdir(segments.root)) == ['samples-0.seg', 'samples-100.seg', 'samples-200.seg']
+
+
+def test_query_bounds_are_inclusive_and_cross_segments(segments):
+    for t in range(0, 300, 5):
+        segments.append('samples', float(t), 1.0, 2.0, 3.0)
+    segments.flush()
+    assert sample_times(segments, 95.0, 105.0) == [95.0, 100.0, 105.0]
+    assert sample_times(segments, 96.0, 99.0) == []
+    record = next(segments.query('samples', 42.0, 42.0), None)
+    assert record is None
+    h, t, pad = next(segments.query('samples', 45.0, 45.0))[1:]
+    assert (h, t, pad) == (1.0, 2.0, 3.0)
+
+
+def test_missing_values_round_trip_as_nan(segments):
+    segments.append('samples', 1.0, None, 20.0, None)
+    segments.flush()
+    _, h, t, pad = next(segments.query('samples', 0, 10))
+    assert h != h and t == 20.0 and pad != pad
+
+
+def test_blocks_yield_whole_records(segments):
+    size = segments.formats['samples'].size
+    for t in range(0, 200):
+        segments.append('samples', float(t), 1.0, 2.0, 3.0)
+    segments.flush()
+    for t in range(200, 210):
+        segments.append('samples', float(t), 1.0, 2.0, 3.0)
+    blocks = list(segments.blocks('samples', 50.0, 205.0, records=32))
+    assert all(len(block) % size == 0 and len(block) <= 32 * size for block in blocks)
+    data = b''.join(blocks)
+    times = [struct.unpack_from('<d', data, i)[0] for i in range(0, len(data), size)]
+    assert times == [float(t) for t in range(50, 206)]
+
+
+def test_torn_tail_record_is_ignored(segments):
+    for t in range(5):
+        segments.append('samples', float(t), 1.0, 2.0, 3.0)
+    segments.flush()
+    # Corte de energía a mitad de un registro
+    with open(os.path.join(segments.root, 'samples-0.seg'), 'ab') as f:
+        f.write(b'\x00' * 7)
+    assert sample_times(segments) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_expire_removes_segments_past_retention(segments):
+    day = 86400
+    for t in (0.0, 150.0, day + 150.0, 2 * day + 10.0):
+        segments.append('events', t, 1, 0, 0)
+    segments.flush()
+    # Retención de un día: se borran los segmentos que terminaron antes de `now` - 1 día
+    assert segments.expire(now=day + 250.0) == 2
+    assert [record[0] for record in segments.query('events', 0, 1e12)] == [day + 150.0, 2 * day + 10.0]
+
+
+def test_append_wakes_the_writer_thread_at_the_byte_threshold(tmp_path):
+    s = SegmentStore(str(tmp_path), flush_interval=3600, flush_bytes=200)
+    try:
+        for t in range(20):
+            s.append('samples', float(t), 1.0, 2.0, 3.0)
+        deadline = time.monotonic() + 5
+        while not os.listdir(str(tmp_path)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert s._writer is not None and s._writer.name == 'store-writer'
+        assert os.listdir(str(tmp_path))
+    finally:
+        s.close()
+    assert not s._writer.is_alive()
+    assert sample_times(s) == [float(t) for t in range(20)]
+
+
+def test_append_does_not_wait_for_a_slow_fsync(tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_fsync(fd):
+        started.set()
+        release.wait(5)
+    monkeypatch.setattr(store.os, 'fsync', slow_fsync)
+    s = SegmentStore(str(tmp_path), flush_interval=3600, flush_bytes=10 ** 9)
+    s.append('samples', 0.0, 1.0, 2.0, 3.0)
+    flusher = threading.Thread(target=s.flush)
+    flusher.start()
+    assert started.wait(5)
+    try:
+        begin = time.perf_counter()
+        s.append('samples', 1.0, 1.0, 2.0, 3.0)
+        # Con el volcado atascado en fsync: la consulta ve lo que se está escribiendo sin duplicarlo
+        assert sample_times(s) == [0.0, 1.0]
+        assert time.perf_counter() - begin < 1.0
+    finally:
+        release.set()
+        flusher.join()
+        s.close()
+    assert sample_times(s) == [0.0, 1.0]
+
+
+def test_queries_never_miss_records_during_concurrent_flushes(tmp_path):
+    s = SegmentStore(str(tmp_path), segment_seconds=50, flush_interval=0.01, flush_bytes=400)
+    written, failures, stop = [0], [], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            before = written[0]
+            times = sample_times(s)
+            if len(times) < before or times != sorted(set(times)):
+                failures.append((before, len(times)))
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for t in range(3000):
+            s.append('samples', float(t), 1.0, 2.0, 3.0)
+            written[0] = t + 1
+    finally:
+        stop.set()
+        thread.join()
+        s.close()
+    assert not failures
+    assert sample_times(s) == [float(t) for t in range(3000)]
+
+
+def test_the_writer_survives_unexpected_errors(tmp_path, monkeypatch):
+    s = SegmentStore(str(tmp_path), flush_interval=3600, flush_bytes=100)
+    real_path, failures = s._segment_path, []
+
+    def broken_once(channel, start):
+        if not failures:
+            failures.append(start)
+            raise ValueError("I/O operation on closed file")
+        return real_path(channel, start)
+    monkeypatch.setattr(s, '_segment_path', broken_once)
+    try:
+        for t in range(5):
+            s.append('samples', float(t), 1.0, 2.0, 3.0)
+        deadline = time.monotonic() + 5
+        while not failures and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer = s._writer
+        # El lote del fallo se pierde, pero el hilo sigue volcando los siguientes
+        for t in range(5, 10):
+            s.append('samples', float(t), 1.0, 2.0, 3.0)
+        while not os.listdir(str(tmp_path)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert failures and writer.is_alive() and s._writer is writer
+        assert os.listdir(str(tmp_path))
+    finally:
+        s.close()
+    assert sample_times(s) == [float(t) for t in range(5, 10)]
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_a_dead_writer_is_restarted_by_the_next_append(tmp_path, monkeypatch):
+    s = SegmentStore(str(tmp_path), flush_interval=3600, flush_bytes=100)
+    died = threading.Event()
+
+    def fatal(*args):
+        died.set()
+        raise SystemExit
+    monkeypatch.setattr(s, 'flush', fatal)
+    for t in range(5):
+        s.append('samples', float(t), 1.0, 2.0, 3.0)
+    assert died.wait(5)
+    first = s._writer
+    if first is not None:
+        first.join(5)
+    monkeypatch.undo()
+    try:
+        s.append('samples', 5.0, 1.0, 2.0, 3.0)
+        assert s._writer is not None and s._writer is not first and s._writer.is_alive()
+    finally:
+        s.close()
+    assert sample_times(s) == [float(t) for t in range(6)]
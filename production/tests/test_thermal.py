@@ -0,0 +1,130 @@
+import json
+
+import numpy as np
+import pytest
+
+from thermal import AMBIENT_TERMS, FIT_STEP, MIN_EXCITED, PAD_TERMS, LeastSquares, ThermalModel
+
+# Casillero sintético: pad con τ = 150 s que sube 8 °C con el calefactor; sala a 20 °C con τ = 2000 s
+PAD = (1 / 150, 8 / 150)
+AMBIENT = (20 / 2000, -1 / 2000, 1 / 4000, -0.0005)
+
+
+def synthetic_rows(n, seed=0):
+    """Filas de FIT_STEP s que cumplen exactamente las ecuaciones del modelo."""
+    rng = np.random.default_rng(seed)
+    pad0 = rng.uniform(18, 32, n)
+    ambient0 = rng.uniform(16, 26, n)
+    pad_on = rng.uniform(0, 1, n).round()
+    fan_on = rng.uniform(0, 1, n)
+    dt = np.full(n, FIT_STEP)
+    a, b = PAD
+    c, d, e, f = AMBIENT
+    pad1 = pad0 + dt * (a * (ambient0 - pad0) + b * pad_on)
+    ambient1 = ambient0 + dt * (c + d * ambient0 + e * (pad0 - ambient0) + f * fan_on)
+    return pad0, ambient0, pad1, ambient1, pad_on, fan_on, dt
+
+
+def fitted(n=200):
+    model = ThermalModel()
+    model.add_rows(*synthetic_rows(n))
+    model.refit()
+    return model
+
+
+def test_least_squares_recovers_the_coefficients_and_weights_recent_rows_more():
+    fit = LeastSquares(('x', '1'), forget=0.5)
+    X = np.column_stack((np.arange(20.0), np.ones(20)))
+    fit.add(X, 3 * X[:, 0] + 1)
+    assert np.allclose(fit.solve(), [3, 1])
+    assert fit.rmse() == pytest.approx(0, abs=1e-6)
+    # Con olvido fuerte las filas nuevas mandan sobre las viejas
+    fit.add(X, -2 * X[:, 0] + 4)
+    assert np.allclose(fit.solve(), [-2, 4], atol=1e-3)
+
+
+def test_the_fit_recovers_the_physical_parameters():
+    model = fitted()
+    assert np.allclose(model.pad.coef, PAD) and np.allclose(model.ambient.coef, AMBIENT)
+    summary = model.summary()
+    assert summary['pad_tau_s'] == 150.0 and summary['pad_rise_c'] == 8.0
+    assert summary['room_c'] == 20.0 and summary['ambient_tau_s'] == 2000.0
+    assert summary['rmse_pad_c'] == pytest.approx(0, abs=1e-3)
+    assert model.ready
+
+
+def test_without_both_pad_states_there_is_no_forecast():
+    rows = list(synthetic_rows(50))
+    rows[4] = np.zeros(50)
+    model = ThermalModel()
+    model.add_rows(*rows)
+    model.refit()
+    assert model.on_rows == 0 and model.off_rows == 50 >= MIN_EXCITED
+    assert not model.ready
+    assert model.forecast(25.0, 20.0, False, False) is None
+
+
+def test_the_forecast_settles_towards_the_heated_equilibrium():
+    model = fitted()
+    # En 300 s (2 τ) el pad recorre ~86 % de los 8 °C; el ambiente apenas se mueve
+    forecast = model.forecast(20.0, 20.0, True, False)
+    assert forecast['seconds'] == 300.0
+    assert 26.5 < forecast['pad_temperature'] < 27.5
+    assert 20.0 <= forecast['temperature'] < 20.5
+    # Equilibrio acoplado: el pad calienta la sala hasta 24 °C y queda 8 °C por encima
+    pad, ambient = model.predict(20.0, 20.0, True, False, 100000)
+    assert (pad, ambient) == (pytest.approx(32.0, abs=0.01), pytest.approx(24.0, abs=0.01))
+    # Con la sala a 16 °C (4 °C menos) el equilibrio baja lo mismo
+    pad, ambient = model.predict(20.0, 20.0, True, False, 100000, room=16.0)
+    assert (pad, ambient) == (pytest.approx(28.0, abs=0.01), pytest.approx(20.0, abs=0.01))
+
+
+def test_observe_adds_one_row_per_step_and_skips_gaps():
+    model = ThermalModel()
+    model.relay('pad', True, 0.0)
+    model.observe(0.0, 25.0, 20.0)
+    model.observe(10.0, 25.1, 20.0)
+    model.observe(FIT_STEP, 25.5, 20.0)
+    assert model.pad.rows == 1 and model.on_rows == 1
+    # Un hueco de más de 1,5 pasos no da fila; se empieza otro intervalo
+    model.observe(FIT_STEP + 100, 26.0, 20.0)
+    assert model.pad.rows == 1
+    model.observe(FIT_STEP + 100 + FIT_STEP, 26.2, 20.0)
+    assert model.pad.rows == 2
+
+
+def test_samples_are_ignored_until_the_saved_model_is_loaded(tmp_path):
+    model = ThermalModel(str(tmp_path / 'thermal.json'))
+    model.observe(0.0, 25.0, 20.0)
+    model.observe(FIT_STEP, 25.5, 20.0)
+    assert model.pad.rows == 0 and not model.loaded
+    assert model.load() == 0 and model.loaded
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'thermal.json')
+    model = fitted()
+    model.path = path
+    model.save()
+    restored = ThermalModel(path)
+    restored.load()
+    assert np.allclose(restored.pad.coef, PAD) and np.allclose(restored.ambient.coef, AMBIENT)
+    assert (restored.on_rows, restored.off_rows) == (model.on_rows, model.off_rows)
+    assert restored.ready
+    # Un ajuste con otro paso no vale: las pendientes no son comparables
+    other = ThermalModel(path, step=FIT_STEP * 2)
+    other.load()
+    assert other.pad.rows == 0
+
+
+@pytest.mark.parametrize('content', ['{not json', '[1, 2]', '{"step": 30.0, "pad": []}',
+                                     json.dumps({'step': 30.0, 'pad': {'xtx': [[1.0]], 'xty': [1.0], 'yty': 0,
+                                                                       'weight': 1, 'rows': 1}})])
+def test_a_malformed_state_file_starts_from_scratch(tmp_path, content):
+    path = tmp_path / 'thermal.json'
+    path.write_text(content)
+    model = ThermalModel(str(path))
+    model.load()
+    assert model.loaded and model.pad.rows == 0 and model.ambient.rows == 0
+    assert model.pad.terms == PAD_TERMS and model.ambient.terms == AMBIENT_TERMS
+    assert not model.ready
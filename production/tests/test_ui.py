@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from actuators import ActuatorBank
+from hardware import FakeGPIO
+from sampler import Sample
+from UI import ACTUATOR_TEXT, Readout
+
+
+def make_unit(unit_id):
+    bank = ActuatorBank(FakeGPIO(), unit_id, {'fan': 1, 'lock': 2, 'pad': 3})
+    for name, state in (('fan', 'off'), ('lock', 'closed'), ('pad', 'off')):
+        bank.set(name, state, 'init')
+    return SimpleNamespace(id=unit_id, actuators=bank, alarms=(), thermostat=SimpleNamespace(fault=None),
+                           forecast=lambda: None)
+
+
+def test_readout_shows_only_the_texts_that_change():
+    units = [make_unit('a'), make_unit('b')]
+    pending = []
+    controller = SimpleNamespace(units=units, unit={u.id: u for u in units}.get,
+                                 poll=lambda: [pending.pop() for _ in range(len(pending))])
+    shown = []
+    readout = Readout(controller, lambda unit_id, key, text: shown.append((unit_id, key, text)))
+    readout.refresh()
+    assert ('a', 'pad', ACTUATOR_TEXT['pad', 'off']) in shown and ('b', 'fault', '') in shown
+    shown.clear()
+
+    pending.append(Sample(1.0, 55.0, None, 30.0, 'a'))
+    assert readout.drain() == {'a'}
+    # Un canal sin lectura no borra su etiqueta; el pronóstico vacío aparece una vez
+    assert shown == [('a', 'hum', "[55.0%] Humedad"), ('a', 'padtemp', "[30.0°C] Almohadilla"), ('a', 'forecast', "")]
+    shown.clear()
+
+    pending.append(Sample(2.0, 55.0, 21.0, 30.0, 'a'))
+    units[1].actuators.set('pad', 'on', 'ui')
+    units[0].alarms = ('pad-caliente',)
+    readout.drain()
+    assert shown == [('a', 'amb', "[21.0°C] Ambiente"), ('b', 'pad', ACTUATOR_TEXT['pad', 'on']),
+                     ('a', 'fault', "⚠️ alarma pad-caliente")]
+    assert readout.drain() == set()
@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import metrics
+from uplink import FRAME, Collector, Spool, Uplink
+
+
+def records(n, kind='sample'):
+    return [{'type': kind, 'n': i} for i in range(n)]
+
+
+def decode(body):
+    return [json.loads(line) for line in gzip.decompress(body).splitlines()]
+
+
+def test_records_are_numbered_and_sent_until_acked(tmp_path):
+    spool = Spool(str(tmp_path))
+    assert spool.pending() is None
+    assert spool.append(records(3)) == 3
+    assert spool.append(records(2)) == 5
+    first, last, body = spool.pending()
+    assert (first, last) == (1, 5)
+    # Marcos gzip concatenados: un único gzip válido con todas las líneas
+    assert [r['seq'] for r in decode(body)] == [1, 2, 3, 4, 5]
+    assert {r['epoch'] for r in decode(body)} == {spool.epoch}
+    assert spool.backlog() == 5
+    spool.ack(3)
+    assert spool.pending()[:2] == (4, 5) and spool.backlog() == 2
+
+
+def test_pending_is_bounded_by_max_bytes(tmp_path):
+    spool = Spool(str(tmp_path))
+    for _ in range(5):
+        spool.append(records(50))
+    two_frames = spool.frames[0][4] + spool.frames[1][4]
+    first, last, _ = spool.pending(max_bytes=two_frames)
+    assert (first, last) == (1, 100)
+    # Un marco mayor que el límite sale solo, nunca se queda atascado
+    assert spool.pending(max_bytes=1)[:2] == (1, 50)
+
+
+def test_reopening_resumes_sequences_and_unacked_frames(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(records(4))
+    spool.append(records(4))
+    spool.ack(4)
+    reopened = Spool(str(tmp_path))
+    assert reopened.epoch == spool.epoch
+    assert reopened.acked == 4 and reopened.next_seq == 9
+    assert reopened.pending()[:2] == (5, 8)
+
+
+@pytest.mark.parametrize('damage', ['torn', 'crc'])
+def test_damaged_tail_is_truncated_on_open(tmp_path, damage):
+    spool = Spool(str(tmp_path))
+    spool.append(records(2))
+    spool.append(records(2))
+    path, offset = spool.frames[1][0], spool.frames[1][1]
+    with open(path, 'r+b') as f:
+        if damage == 'torn':
+            f.truncate(offset + FRAME.size + 3)
+        else:
+            f.seek(offset + FRAME.size + 5)
+            f.write(b'\xff\xff')
+    reopened = Spool(str(tmp_path))
+    assert os.path.getsize(path) == offset
+    assert reopened.pending()[:2] == (1, 2)
+    # Las secuencias del marco perdido se reutilizan: el colector nunca las confirmó
+    assert reopened.append(records(1)) == 3
+
+
+def test_acked_segments_are_removed_and_the_size_limit_drops_the_oldest(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=10 ** 9, segment_bytes=400)
+    for _ in range(6):
+        spool.append(records(20))
+    assert len(spool.segments) > 2
+    spool.ack(spool.frames[-2][3])
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.spool')]) == 1
+
+    limited = Spool(str(tmp_path / 'limited'), max_bytes=1000, segment_bytes=400)
+    for _ in range(10):
+        limited.append(records(20))
+    assert limited.size() <= 1000 + 400
+    assert limited.dropped > 0
+    assert limited.backlog() + limited.dropped == 200
+    first, _, body = limited.pending()
+    assert decode(body)[0]['seq'] == first == limited.acked + 1
+
+
+def test_a_wiped_spool_gets_a_new_epoch_and_is_not_deduplicated(tmp_path):
+    collector = Collector('127.0.0.1:0')
+    try:
+        root = str(tmp_path / 'spool')
+        sent = []
+        for _ in range(2):
+            spool = Spool(root)
+            spool.append(records(3))
+            first, last, body = spool.pending()
+            headers = {'Content-Encoding': 'gzip', 'X-Teikit-Device': 'pi-1', 'X-Teikit-Epoch': spool.epoch}
+            assert collector.ingest(headers, body)[0] == 200
+            # El reintento de un lote ya guardado (respuesta perdida) sí es un duplicado
+            assert json.loads(collector.ingest(headers, body)[1]) == {'accepted': 0, 'duplicates': 3}
+            sent.append(spool.epoch)
+            shutil.rmtree(root)
+        assert sent[0] != sent[1]
+        assert collector.accepted == 6 and collector.duplicates == 6
+    finally:
+        collector.server.server_close()
+
+
+def test_stopping_during_a_stalled_post_keeps_every_record(tmp_path):
+    collector = Collector('127.0.0.1:0', delay=30.0)
+    collector.start()
+    controller = SimpleNamespace(sampler=SimpleNamespace(listeners=[]), units=[],
+                                 rules=SimpleNamespace(subscribe=lambda callback: None), metrics=metrics.Registry())
+    root = str(tmp_path / 'uplink')
+    uplink = Uplink(controller, f"http://{collector.address}/ingest", root, device='pi-1', batch_records=10)
+    uplink.start()
+    try:
+        for i in range(10):
+            uplink._put({'type': 'sample', 'n': i})
+        uplink._wake.set()
+        deadline = time.monotonic() + 5
+        while not collector.requests and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collector.requests == 1
+        # Con el envío atascado llegan más registros: unos van al lote abierto y otros se quedan en la cola
+        for i in range(10, 15):
+            uplink._put({'type': 'sample', 'n': i})
+        started = time.monotonic()
+        uplink.stop(timeout=0.5)
+        assert time.monotonic() - started < 2.0
+        assert not uplink.is_alive()
+    finally:
+        collector.server.shutdown()
+        collector.server.server_close()
+    # El tramo cortado sigue sin confirmar y lo nuevo está en el spool: nada se pierde
+    first, last, body = Spool(root).pending()
+    assert (first, last) == (1, 15)
+    assert [record['n'] for record in decode(body)] == list(range(15))